@@ -1,40 +1,118 @@
 """
 Civisense Model Training Script
 Trains TF-IDF + Logistic Regression classifier for complaint categorization
+
+Extras for larger corpora:
+- TF-IDF features are cached on disk as sparse .npz files keyed by a hash
+  of the training texts and the vectorizer config, so re-runs skip refits.
+- --search runs a parallel hyperparameter search (all cores) over
+  vectorizer and classifier settings with stratified cross-validation.
+- --db reads training data from the complaints + feedback tables and
+  their archived copies in chunks, in addition to (or instead of) the CSV.
 """
 
 import pandas as pd
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import StratifiedKFold, train_test_split
 from sklearn.metrics import classification_report, confusion_matrix, accuracy_score
+from scipy import sparse
+import hashlib
+import itertools
 import joblib
 import json
+import os
+import sklearn
 from datetime import datetime
 
+DEFAULT_VECTORIZER_PARAMS = {
+    'max_features': 500,
+    'ngram_range': (1, 2),  # Unigrams and bigrams
+    'min_df': 2,
+    'stop_words': 'english',
+    'lowercase': True,
+}
+
+DEFAULT_CLASSIFIER_PARAMS = {
+    'max_iter': 1000,
+    'solver': 'lbfgs',
+    'random_state': 42,
+    'C': 1.0,
+}
+
+# Search space for --search
+VECTORIZER_GRID = {
+    'max_features': [500, 2000, 10000],
+    'ngram_range': [(1, 1), (1, 2)],
+    'min_df': [1, 2],
+    'sublinear_tf': [False, True],
+}
+CLASSIFIER_GRID = {
+    'C': [0.3, 1.0, 3.0, 10.0],
+}
+
+CACHE_DIR = os.getenv('FEATURE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.feature_cache'))
+
+
+class FeatureCache:
+    """
+    On-disk cache of fitted TF-IDF vectorizers and their sparse train-set
+    matrices, keyed by a hash of (texts, vectorizer config, sklearn version).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(texts, vectorizer_params):
+        h = hashlib.sha256()
+        h.update(sklearn.__version__.encode())
+        h.update(json.dumps(vectorizer_params, sort_keys=True, default=str).encode())
+        for t in texts:
+            h.update(str(t).encode('utf-8'))
+            h.update(b'\x1f')
+        return h.hexdigest()[:32]
+
+    def fit_transform(self, texts, vectorizer_params):
+        """Return (fitted vectorizer, sparse matrix), loading from cache if possible."""
+        if not self.enabled:
+            vectorizer = TfidfVectorizer(**vectorizer_params)
+            return vectorizer, vectorizer.fit_transform(texts)
+
+        key = self.key(texts, vectorizer_params)
+        matrix_path = os.path.join(self.cache_dir, f'{key}.npz')
+        vectorizer_path = os.path.join(self.cache_dir, f'{key}.vectorizer.joblib')
+
+        if os.path.exists(matrix_path) and os.path.exists(vectorizer_path):
+            return joblib.load(vectorizer_path), sparse.load_npz(matrix_path)
+
+        vectorizer = TfidfVectorizer(**vectorizer_params)
+        X = vectorizer.fit_transform(texts)
+        # Write to temp names first so a crash never leaves a half-written entry
+        sparse.save_npz(matrix_path + '.tmp.npz', X.tocsr())
+        joblib.dump(vectorizer, vectorizer_path + '.tmp')
+        os.replace(matrix_path + '.tmp.npz', matrix_path)
+        os.replace(vectorizer_path + '.tmp', vectorizer_path)
+        return vectorizer, X
+
+
 class CivisenseModel:
     """
     Civisense ML Model for complaint classification
     Uses TF-IDF for feature extraction and Logistic Regression for classification
     """
     
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(
-            max_features=500,
-            ngram_range=(1, 2),  # Unigrams and bigrams
-            min_df=2,
-            stop_words='english',
-            lowercase=True
-        )
-        
-        self.classifier = LogisticRegression(
-            max_iter=1000,
-            solver='lbfgs',
-            random_state=42,
-            C=1.0
-        )
+    def __init__(self, vectorizer_params=None, classifier_params=None, cache=None):
+        self.vectorizer_params = {**DEFAULT_VECTORIZER_PARAMS, **(vectorizer_params or {})}
+        self.classifier_params = {**DEFAULT_CLASSIFIER_PARAMS, **(classifier_params or {})}
+        self.cache = cache
 
+        self.vectorizer = TfidfVectorizer(**self.vectorizer_params)
+        self.classifier = LogisticRegression(**self.classifier_params)
         
         self.categories = None
         self.feature_names = None
@@ -42,7 +120,10 @@ class CivisenseModel:
     def train(self, X_train, y_train):
         """Train the model"""
         print("Training TF-IDF vectorizer...")
-        X_train_tfidf = self.vectorizer.fit_transform(X_train)
+        if self.cache is not None:
+            self.vectorizer, X_train_tfidf = self.cache.fit_transform(list(X_train), self.vectorizer_params)
+        else:
+            X_train_tfidf = self.vectorizer.fit_transform(X_train)
         self.feature_names = self.vectorizer.get_feature_names_out()
         
         print(f"Feature space: {X_train_tfidf.shape[1]} features")
@@ -92,11 +173,13 @@ class CivisenseModel:
             'trained_at': datetime.now().isoformat(),
             'categories': self.categories.tolist() if self.categories is not None else None,
             'num_features': len(self.feature_names) if self.feature_names is not None else 0,
-            'model_type': 'TF-IDF + Logistic Regression'
+            'model_type': 'TF-IDF + Logistic Regression',
+            'vectorizer_params': self.vectorizer_params,
+            'classifier_params': self.classifier_params,
         }
         
         with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+            json.dump(metadata, f, indent=2, default=list)
         
         print(f"\nModel saved to {model_path}")
         print(f"Metadata saved to {metadata_path}")
@@ -115,7 +198,132 @@ class CivisenseModel:
         return model
 
 
-def train_model(data_path='training_data.csv', test_size=0.2, random_state=42):
+_DB_QUERY = """
+    SELECT c.text AS complaint_text,
+           COALESCE(
+               (SELECT f.correct_category FROM {feedback} f
+                WHERE f.complaint_id = c.id AND f.correct_category IS NOT NULL
+                ORDER BY f.id DESC LIMIT 1),
+               c.category
+           ) AS category
+    FROM {complaints} c
+    WHERE c.text IS NOT NULL
+"""
+
+
+def load_from_db(database_url, chunk_size=50000):
+    """
+    Read (complaint_text, category) pairs from the complaints table and the
+    archive (complaints_archive / feedback_archive, see backend/archive.py)
+    in chunks. An officer's latest feedback correction wins over the stored
+    category.
+    """
+    from sqlalchemy import create_engine, inspect
+
+    engine = create_engine(database_url)
+    parts = [_DB_QUERY.format(complaints="complaints", feedback="feedback")]
+    if inspect(engine).has_table("complaints_archive"):
+        parts.append(_DB_QUERY.format(complaints="complaints_archive", feedback="feedback_archive"))
+    query = "\nUNION ALL\n".join(parts)
+
+    chunks = []
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql_query(query, conn, chunksize=chunk_size):
+            chunks.append(chunk.dropna(subset=['category']))
+            print(f"  read {sum(len(c) for c in chunks)} rows from database...")
+    engine.dispose()
+
+    if not chunks:
+        return pd.DataFrame(columns=['complaint_text', 'category'])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def load_training_data(data_path='training_data.csv', database_url=None):
+    """Training data from the CSV, the database, or both."""
+    frames = []
+    if data_path:
+        print(f"\nLoading training data from {data_path}...")
+        frames.append(pd.read_csv(data_path)[['complaint_text', 'category']])
+    if database_url:
+        print("\nLoading training data from database...")
+        frames.append(load_from_db(database_url))
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.dropna(subset=['complaint_text', 'category'])
+
+    # Stratified splits need at least 2 samples per class
+    counts = df['category'].value_counts()
+    rare = counts[counts < 2].index
+    if len(rare):
+        print(f"Dropping categories with fewer than 2 samples: {', '.join(rare)}")
+        df = df[~df['category'].isin(rare)]
+    return df.reset_index(drop=True)
+
+
+def _evaluate_fold(X, y, train_idx, val_idx, vectorizer_params, classifier_grid, cache_dir, use_cache):
+    """Fit one vectorizer config on one CV fold and score every classifier config."""
+    cache = FeatureCache(cache_dir, enabled=use_cache)
+    vectorizer, X_tr = cache.fit_transform(list(X[train_idx]), vectorizer_params)
+    X_va = vectorizer.transform(X[val_idx])
+
+    scores = []
+    for classifier_params in classifier_grid:
+        clf = LogisticRegression(**{**DEFAULT_CLASSIFIER_PARAMS, **classifier_params})
+        clf.fit(X_tr, y[train_idx])
+        scores.append(accuracy_score(y[val_idx], clf.predict(X_va)))
+    return scores
+
+
+def _grid(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def search_hyperparameters(X_train, y_train, n_splits=3, n_jobs=-1, cache_dir=CACHE_DIR, use_cache=True):
+    """
+    Parallel grid search over VECTORIZER_GRID x CLASSIFIER_GRID.
+
+    Each (vectorizer config, fold) is one job, so features are built once
+    per job and shared by every classifier config; with the cache, re-runs
+    skip vectorizer fits entirely.
+    """
+    vectorizer_grid = [{**DEFAULT_VECTORIZER_PARAMS, **p} for p in _grid(VECTORIZER_GRID)]
+    classifier_grid = _grid(CLASSIFIER_GRID)
+
+    min_class = int(pd.Series(y_train).value_counts().min())
+    n_splits = max(2, min(n_splits, min_class))
+    folds = list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42).split(X_train, y_train))
+
+    jobs = [(v, f) for v in range(len(vectorizer_grid)) for f in range(len(folds))]
+    print(f"Searching {len(vectorizer_grid)} vectorizer x {len(classifier_grid)} classifier configs "
+          f"over {n_splits} folds ({len(jobs)} parallel jobs)...")
+
+    results = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_evaluate_fold)(
+            X_train, y_train, folds[f][0], folds[f][1],
+            vectorizer_grid[v], classifier_grid, cache_dir, use_cache,
+        )
+        for v, f in jobs
+    )
+
+    mean_scores = np.zeros((len(vectorizer_grid), len(classifier_grid)))
+    for (v, _), scores in zip(jobs, results):
+        mean_scores[v] += np.array(scores) / len(folds)
+
+    best_v, best_c = np.unravel_index(np.argmax(mean_scores), mean_scores.shape)
+    best = {
+        'vectorizer_params': vectorizer_grid[best_v],
+        'classifier_params': classifier_grid[best_c],
+        'cv_accuracy': float(mean_scores[best_v, best_c]),
+    }
+    print(f"Best CV accuracy {best['cv_accuracy']:.4f} with "
+          f"vectorizer={ {k: best['vectorizer_params'][k] for k in VECTORIZER_GRID} } "
+          f"classifier={best['classifier_params']}")
+    return best
+
+
+def train_model(data_path='training_data.csv', test_size=0.2, random_state=42,
+                database_url=None, search=False, n_jobs=-1, use_cache=True, cache_dir=CACHE_DIR):
     """
     Complete training pipeline
     """
@@ -124,8 +332,7 @@ def train_model(data_path='training_data.csv', test_size=0.2, random_state=42):
     print("="*60)
     
     # Load data
-    print(f"\nLoading training data from {data_path}...")
-    df = pd.read_csv(data_path)
+    df = load_training_data(data_path, database_url)
     print(f"Loaded {len(df)} samples")
     
     # Display data info
@@ -133,8 +340,8 @@ def train_model(data_path='training_data.csv', test_size=0.2, random_state=42):
     print(df['category'].value_counts())
     
     # Prepare features and labels
-    X = df['complaint_text'].values
-    y = df['category'].values
+    X = df['complaint_text'].to_numpy(dtype=object)
+    y = df['category'].to_numpy(dtype=object)
     
     # Split data
     print(f"\nSplitting data (test_size={test_size})...")
@@ -144,9 +351,21 @@ def train_model(data_path='training_data.csv', test_size=0.2, random_state=42):
     print(f"Training samples: {len(X_train)}")
     print(f"Testing samples: {len(X_test)}")
     
+    cache = FeatureCache(cache_dir) if use_cache else None
+
+    # Optional hyperparameter search
+    vectorizer_params, classifier_params = None, None
+    if search:
+        print("\n" + "="*60)
+        print("HYPERPARAMETER SEARCH")
+        print("="*60)
+        best = search_hyperparameters(X_train, y_train, n_jobs=n_jobs, cache_dir=cache_dir, use_cache=use_cache)
+        vectorizer_params = best['vectorizer_params']
+        classifier_params = best['classifier_params']
+
     # Train model
     print("\n" + "="*60)
-    model = CivisenseModel()
+    model = CivisenseModel(vectorizer_params, classifier_params, cache=cache)
     model.train(X_train, y_train)
     
     # Evaluate on training set
@@ -211,4 +430,22 @@ def train_model(data_path='training_data.csv', test_size=0.2, random_state=42):
 
 
 if __name__ == '__main__':
-    model = train_model('training_data.csv')
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train the Civisense complaint classifier.')
+    parser.add_argument('--data', default='training_data.csv', help="Training CSV ('' to skip).")
+    parser.add_argument('--db', default=None, help='SQLAlchemy URL to also read complaints + feedback from.')
+    parser.add_argument('--search', action='store_true', help='Run a parallel hyperparameter search first.')
+    parser.add_argument('--jobs', type=int, default=-1, help='Parallel jobs for the search (-1 = all cores).')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the on-disk feature cache.')
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    model = train_model(
+        args.data or None,
+        database_url=args.db,
+        search=args.search,
+        n_jobs=args.jobs,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+    )
@@ -0,0 +1,206 @@
+"""
+Civisense Gemini Admission Control
+==================================
+Token buckets in front of the Gemini path, so a surge of complaints
+cannot spend the whole LLM quota on whoever arrives first.
+
+- A global bucket (GEMINI_RPM per minute, GEMINI_BURST tokens) models the
+  API quota; a per-client bucket (GEMINI_CLIENT_RPM) stops one client or
+  SMS gateway from taking everything.
+- Two lanes: "priority" (seniorCitizen / disability / lowIncome flags or
+  high compute_urgency) and "standard". Priority requests are always
+  served first and may use the whole bucket. Standard requests leave the
+  last GEMINI_PRIORITY_RESERVE fraction of it for the priority lane.
+- A request that cannot get a token waits in its lane, up to the lane's
+  wait budget and queue limit. If it still has no token, it overflows to
+  the local sklearn + rules pipeline rather than failing.
+- Buckets live in process memory. serve.py calls share() in each of its
+  N pre-forked workers so every worker gets 1/N of the global and client
+  rates and bursts, and together they stay within the quota. A burst is
+  never below one token, and the reserve always leaves the standard lane
+  one token of it.
+- stats() exports queue depth and admitted / overflow counts per lane.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from priority import compute_urgency
+
+
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))
+GEMINI_BURST = float(os.getenv("GEMINI_BURST", str(GEMINI_RPM)))
+GEMINI_CLIENT_RPM = float(os.getenv("GEMINI_CLIENT_RPM", "5"))
+GEMINI_CLIENT_BURST = float(os.getenv("GEMINI_CLIENT_BURST", str(GEMINI_CLIENT_RPM)))
+GEMINI_PRIORITY_RESERVE = float(os.getenv("GEMINI_PRIORITY_RESERVE", "0.25"))
+PRIORITY_URGENCY = float(os.getenv("GEMINI_PRIORITY_URGENCY", "0.8"))
+LANE_WAIT_SECONDS = {
+    "priority": float(os.getenv("GEMINI_PRIORITY_WAIT_MS", "1500")) / 1000.0,
+    "standard": float(os.getenv("GEMINI_STANDARD_WAIT_MS", "200")) / 1000.0,
+}
+LANE_QUEUE_LIMIT = int(os.getenv("GEMINI_QUEUE_LIMIT", "100"))
+MAX_CLIENTS = 10000
+
+LANES = ("priority", "standard")
+VULNERABILITY_FLAGS = ("seniorCitizen", "disability", "lowIncome")
+
+
+class TokenBucket:
+    """Not thread-safe on its own; GeminiAdmission serialises access."""
+
+    def __init__(self, rate_per_minute: float, burst: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, keep: float = 0.0) -> bool:
+        """Take one token if at least `keep` tokens would remain."""
+        self._refill()
+        if self.tokens - 1.0 >= keep - 1e-9:
+            self.tokens -= 1.0
+            return True
+        return False
+
+    def give_back(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1.0)
+
+    def seconds_until(self, tokens: float) -> float:
+        self._refill()
+        missing = tokens - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else math.inf
+
+
+def lane_for(processed_text: str, vulnerability_flags: Optional[dict]) -> str:
+    flags = vulnerability_flags or {}
+    if any(flags.get(f) for f in VULNERABILITY_FLAGS):
+        return "priority"
+    if compute_urgency(processed_text) >= PRIORITY_URGENCY:
+        return "priority"
+    return "standard"
+
+
+class GeminiAdmission:
+    def __init__(
+        self,
+        rpm: float = GEMINI_RPM,
+        burst: float = GEMINI_BURST,
+        client_rpm: float = GEMINI_CLIENT_RPM,
+        client_burst: float = GEMINI_CLIENT_BURST,
+        reserve: float = GEMINI_PRIORITY_RESERVE,
+    ):
+        self._cond = threading.Condition()
+        self._limits = (rpm, burst, client_rpm, client_burst, reserve)
+        self._fraction = 1.0
+        self._configure()
+        self._clients: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lanes: Dict[str, deque] = {lane: deque() for lane in LANES}
+        self._max_depth = Counter()
+        self._admitted = Counter()
+        self._overflow = Counter()  # (lane, reason)
+
+    def _configure(self) -> None:
+        rpm, burst, client_rpm, client_burst, reserve = self._limits
+        # A bucket below one token never admits, and the standard lane needs
+        # one token above the reserve.
+        self._global = TokenBucket(rpm * self._fraction, max(1.0, burst * self._fraction))
+        self._reserve = min(self._global.capacity * reserve, self._global.capacity - 1.0)
+        self._client_rpm = client_rpm * self._fraction
+        self._client_burst = max(1.0, client_burst * self._fraction)
+
+    def share(self, workers: int) -> None:
+        """Scale this process's buckets to 1/`workers` of the configured limits."""
+        with self._cond:
+            self._fraction = 1.0 / max(1, workers)
+            self._configure()
+            self._clients = OrderedDict()
+            self._cond.notify_all()
+
+    def _client_bucket(self, client: str) -> TokenBucket:
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self._client_rpm, self._client_burst)
+            while len(self._clients) > MAX_CLIENTS:
+                self._clients.popitem(last=False)
+        self._clients.move_to_end(client)
+        return bucket
+
+    def _turn(self, lane: str, ticket: object) -> bool:
+        if self._lanes[lane][0] is not ticket:
+            return False
+        return lane == "priority" or not self._lanes["priority"]
+
+    def _reject(self, lane: str, reason: str) -> Tuple[bool, str]:
+        self._overflow[(lane, reason)] += 1
+        return False, reason
+
+    def admit(self, client: Optional[str], lane: str) -> Tuple[bool, str]:
+        """
+        Wait (bounded) for a Gemini token. Returns (admitted, reason); when
+        not admitted the caller should use the local pipeline.
+        """
+        deadline = time.monotonic() + LANE_WAIT_SECONDS[lane]
+        keep = 0.0 if lane == "priority" else self._reserve
+
+        with self._cond:
+            client_bucket = self._client_bucket(client or "anonymous")
+            if not client_bucket.try_take():
+                return self._reject(lane, "client_limit")
+
+            queue = self._lanes[lane]
+            if len(queue) >= LANE_QUEUE_LIMIT:
+                client_bucket.give_back()
+                return self._reject(lane, "queue_full")
+
+            ticket = object()
+            queue.append(ticket)
+            self._max_depth[lane] = max(self._max_depth[lane], len(queue))
+            try:
+                while True:
+                    my_turn = self._turn(lane, ticket)
+                    if my_turn and self._global.try_take(keep=keep):
+                        self._admitted[lane] += 1
+                        return True, "admitted"
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        client_bucket.give_back()
+                        return self._reject(lane, "global_limit")
+                    if my_turn:  # sleep until the next token is due
+                        remaining = min(remaining, max(0.005, self._global.seconds_until(keep + 1.0)))
+                    self._cond.wait(remaining)
+            finally:
+                queue.remove(ticket)
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            self._global._refill()
+            return {
+                "tokens_available": round(self._global.tokens, 2),
+                "capacity": self._global.capacity,
+                "rate_per_minute": round(self._global.rate * 60.0, 2),
+                "share": self._fraction,
+                "priority_reserve": round(self._reserve, 2),
+                "queue_depth": {lane: len(q) for lane, q in self._lanes.items()},
+                "max_queue_depth": {lane: self._max_depth[lane] for lane in LANES},
+                "admitted": {lane: self._admitted[lane] for lane in LANES},
+                "overflow": {
+                    lane: {reason: n for (l, reason), n in self._overflow.items() if l == lane}
+                    for lane in LANES
+                },
+                "clients": len(self._clients),
+            }
+
+
+gemini_admission = GeminiAdmission()
@@ -0,0 +1,215 @@
+"""
+Civisense Archival Job
+======================
+Moves complaints resolved more than a retention window ago out of the hot
+`complaints` table into `complaints_archive`, so dashboard aggregates,
+population counts and the priority ORDER BY only scan live work. The
+window counts from `resolved_at` (from `timestamp` for complaints closed
+before it was recorded).
+
+Aggregate counters stay correct through `archive_stats`, which keeps a
+running count per (area, area_id, category, status) of everything
+archived.
+
+Run manually with:  python archive.py [--days 180] [--tenant chennai]
+(this also prunes the change log, see changes.py)
+"""
+
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from changes import log_selected, prune as prune_changes
+from db import (
+    CLOSED_STATUSES,
+    ArchivedComplaint,
+    ArchivedFeedback,
+    ArchiveStat,
+    Complaint,
+    Feedback,
+)
+
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+_COMPLAINT_COLUMNS = [
+    "id", "text", "category", "confidence", "urgency", "population_impact",
+    "vulnerability", "priority_score", "scheme", "area", "area_id", "status", "timestamp",
+    "explanation", "resolved_at",
+]
+_FEEDBACK_COLUMNS = ["id", "complaint_id", "correct_category", "correct_scheme", "notes", "timestamp"]
+
+
+def _bump_stats(db: Session, counts: Counter) -> None:
+    """Add archived row counts to the per-(area, area_id, category, status) rollup."""
+    for (area, area_id, category, status), n in counts.items():
+        stat = (
+            db.query(ArchiveStat)
+            .filter(
+                ArchiveStat.area.is_(None) if area is None else ArchiveStat.area == area,
+                ArchiveStat.area_id.is_(None) if area_id is None else ArchiveStat.area_id == area_id,
+                ArchiveStat.category.is_(None) if category is None else ArchiveStat.category == category,
+                ArchiveStat.status == status,
+            )
+            .first()
+        )
+        if stat:
+            stat.count += n
+        else:
+            db.add(ArchiveStat(area=area, area_id=area_id, category=category, status=status, count=n))
+
+
+def archive_resolved(
+    db: Session,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+) -> int:
+    """
+    Move complaints resolved/closed more than `older_than_days` ago (and
+    their feedback) into the archive tables. Works in batches, committing after
+    each one, so it can run against a live database.
+
+    Returns the number of complaints archived.
+    """
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=days)
+
+    complaint_cols = [getattr(Complaint, c) for c in _COMPLAINT_COLUMNS]
+    feedback_cols = [getattr(Feedback, c) for c in _FEEDBACK_COLUMNS]
+
+    archived = 0
+    while True:
+        rows = (
+            db.query(Complaint.id, Complaint.area, Complaint.area_id, Complaint.category, Complaint.status)
+            .filter(
+                func.lower(Complaint.status).in_(CLOSED_STATUSES),
+                func.coalesce(Complaint.resolved_at, Complaint.timestamp) < cutoff,
+            )
+            .order_by(Complaint.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+
+        ids = [r.id for r in rows]
+
+        db.execute(
+            insert(ArchivedComplaint).from_select(
+                _COMPLAINT_COLUMNS,
+                select(*complaint_cols).where(Complaint.id.in_(ids)),
+            )
+        )
+        db.execute(
+            insert(ArchivedFeedback).from_select(
+                _FEEDBACK_COLUMNS,
+                select(*feedback_cols).where(Feedback.complaint_id.in_(ids)),
+            )
+        )
+        _bump_stats(db, Counter((r.area, r.area_id, r.category, r.status) for r in rows))
+
+        log_selected(db, "archived", Complaint.id.in_(ids))
+        db.execute(delete(Feedback).where(Feedback.complaint_id.in_(ids)))
+        db.execute(delete(Complaint).where(Complaint.id.in_(ids)))
+        db.commit()
+
+        archived += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    return archived
+
+
+# ==========================
+# READ HELPERS
+# ==========================
+
+def archived_counts(db: Session, column: str) -> Dict[Optional[str], int]:
+    """Archived complaint counts grouped by `area_id`, `category` or `status`."""
+    col = getattr(ArchiveStat, column)
+    rows = db.query(col, func.sum(ArchiveStat.count)).group_by(col).all()
+    return {key: int(n or 0) for key, n in rows}
+
+
+def archived_total(db: Session) -> int:
+    return int(db.query(func.coalesce(func.sum(ArchiveStat.count), 0)).scalar() or 0)
+
+
+def archived_cohort_count(
+    db: Session, area: Optional[str], category: str, area_id: Optional[int] = None
+) -> int:
+    """Archived complaints for one (area, category), for population impact."""
+    area_filter = ArchiveStat.area_id == area_id if area_id is not None else ArchiveStat.area == area
+    n = (
+        db.query(func.sum(ArchiveStat.count))
+        .filter(area_filter, ArchiveStat.category == category)
+        .scalar()
+    )
+    return int(n or 0)
+
+
+def query_archive(
+    db: Session,
+    area_id: Optional[int] = None,
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[dict]:
+    q = db.query(ArchivedComplaint)
+    if area_id is not None:
+        q = q.filter(ArchivedComplaint.area_id == area_id)
+    if category:
+        q = q.filter(ArchivedComplaint.category == category)
+    if since:
+        q = q.filter(ArchivedComplaint.timestamp >= since)
+    if until:
+        q = q.filter(ArchivedComplaint.timestamp < until)
+
+    rows = q.order_by(ArchivedComplaint.timestamp.desc()).offset(offset).limit(limit).all()
+    return [
+        {
+            "id": c.id,
+            "text": c.text,
+            "area": c.area,
+            "category": c.category,
+            "priority_score": c.priority_score,
+            "scheme": c.scheme,
+            "status": c.status,
+            "timestamp": c.timestamp,
+            "archived_at": c.archived_at,
+        }
+        for c in rows
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from db import SessionLocal, create_all
+    from tenancy import add_tenant_argument, cli_tenant_context
+
+    parser = argparse.ArgumentParser(description="Archive resolved Civisense complaints.")
+    parser.add_argument("--days", type=int, default=None, help="Archive complaints resolved more than this many days ago.")
+    parser.add_argument("--batch-size", type=int, default=None)
+    add_tenant_argument(parser)
+    args = parser.parse_args()
+
+    with cli_tenant_context(parser, args.tenant):
+        create_all()
+        session = SessionLocal()
+        try:
+            n = archive_resolved(session, older_than_days=args.days, batch_size=args.batch_size)
+            print(f"✅ Archived {n} resolved complaints")
+            pruned = prune_changes(session)
+            session.commit()
+            print(f"✅ Pruned {pruned} change-log entries")
+        finally:
+            session.close()
@@ -0,0 +1,338 @@
+"""
+Civisense Area Registry
+=======================
+Canonicalises free-text `area` strings ("T Nagar", "T.Nagar", "t nagar")
+to one integer `area_id`, so grouping, population impact and indexes run on
+integers instead of spelling variants.
+
+- Each raw string is resolved once (exact normalised key, then fuzzy match,
+  else a new ward) and remembered in `area_aliases` plus an in-memory cache.
+  The cache only learns a new area or alias once the session that wrote it
+  commits, so a rolled-back transaction never leaves a dangling id behind.
+- Areas form a ward → zone → district tree; `complaint_count` on every node
+  is a precomputed rollup of all complaints beneath it.
+"""
+
+import difflib
+import re
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db import Area, AreaAlias, ArchivedComplaint, ArchiveStat, Complaint
+from tenancy import TenantLocal
+
+
+LEVELS = ("ward", "zone", "district")
+FUZZY_CUTOFF = 0.88
+
+_PENDING = "area_cache_pending"  # Session.info key: cache updates waiting for commit
+
+
+def normalize_area(raw: str) -> str:
+    """Matching key for an area string: lower-case, punctuation and spaces removed."""
+    t = (raw or "").lower()
+    t = re.sub(r"[^\w]+", " ", t, flags=re.UNICODE)
+    return re.sub(r"\s+", "", t)
+
+
+def _digits(key: str) -> str:
+    return "".join(ch for ch in key if ch.isdigit())
+
+
+class AreaRegistry:
+    """Process-wide raw-string → area_id resolver backed by the `areas` tables."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_raw: Dict[str, int] = {}
+        self._by_key: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._parents: Dict[int, Optional[int]] = {}
+        self._loaded = False
+
+    # ---------- LOADING ----------
+
+    def load(self, db: Session) -> None:
+        with self._lock:
+            self._by_raw.clear()
+            self._by_key.clear()
+            self._names.clear()
+            self._parents.clear()
+            for area in db.query(Area).all():
+                self._remember_area(area)
+            for alias in db.query(AreaAlias).all():
+                self._by_raw[alias.raw] = alias.area_id
+            self._loaded = True
+
+    def _remember_area(self, area: Area) -> None:
+        self._by_key[area.key] = area.id
+        self._names[area.id] = area.name
+        self._parents[area.id] = area.parent_id
+
+    def _remember_after_commit(self, db: Session, area: Area) -> None:
+        area_id, key, name, parent_id = area.id, area.key, area.name, area.parent_id
+
+        def update():
+            self._by_key[key] = area_id
+            self._names[area_id] = name
+            self._parents[area_id] = parent_id
+        self._after_commit(db, update)
+
+    def _after_commit(self, db: Session, update) -> None:
+        """Apply a cache update once `db` commits; it is dropped on rollback."""
+        def apply():
+            with self._lock:
+                update()
+        db.info.setdefault(_PENDING, []).append(apply)
+
+    def _ensure_loaded(self, db: Session) -> None:
+        if not self._loaded:
+            self.load(db)
+
+    # ---------- LOOKUPS ----------
+
+    def name(self, area_id: Optional[int]) -> Optional[str]:
+        return self._names.get(area_id) if area_id is not None else None
+
+    def ancestors(self, area_id: int) -> List[int]:
+        """The area itself followed by its zone, district, ... up to the root."""
+        chain = []
+        while area_id is not None and area_id not in chain:
+            chain.append(area_id)
+            area_id = self._parents.get(area_id)
+        return chain
+
+    def descendants(self, area_id: int) -> List[int]:
+        """The area itself and every ward, zone, ... below it."""
+        return [a for a in list(self._parents) if area_id in self.ancestors(a)] or [area_id]
+
+    # ---------- RESOLUTION ----------
+
+    def lookup(self, db: Session, raw: Optional[str]) -> Optional[int]:
+        """Like resolve(), but never creates an area or stores an alias."""
+        if not raw or not raw.strip():
+            return None
+        raw = raw.strip()[:150]
+
+        self._ensure_loaded(db)
+        area_id = self._by_raw.get(raw)
+        if area_id is not None:
+            return area_id
+
+        key = normalize_area(raw)
+        with self._lock:
+            area_id = self._by_key.get(key)
+            if area_id is None and key:
+                close = difflib.get_close_matches(key, list(self._by_key), n=1, cutoff=FUZZY_CUTOFF)
+                # "Ward 15" and "Ward 16" are close strings but different places
+                if close and _digits(close[0]) == _digits(key):
+                    area_id = self._by_key[close[0]]
+        return area_id
+
+    def resolve(self, db: Session, raw: Optional[str]) -> Optional[int]:
+        """Map a raw area string to a canonical area id, creating a ward if new."""
+        if not raw or not raw.strip():
+            return None
+        raw = raw.strip()[:150]
+
+        area_id = self.lookup(db, raw)
+        if area_id is not None and raw in self._by_raw:
+            return area_id
+
+        key = normalize_area(raw)
+        if not key:
+            return None
+        if area_id is None:
+            area_id = self._create_area(db, name=raw, key=key)
+
+        try:
+            with db.begin_nested():
+                db.add(AreaAlias(raw=raw, area_id=area_id))
+        except IntegrityError:
+            pass  # another worker stored the same alias first
+
+        self._after_commit(db, lambda: self._by_raw.__setitem__(raw, area_id))
+        return area_id
+
+    def _create_area(
+        self,
+        db: Session,
+        name: str,
+        key: str,
+        level: str = "ward",
+        parent_id: Optional[int] = None,
+    ) -> int:
+        try:
+            with db.begin_nested():
+                area = Area(name=name, key=key, level=level, parent_id=parent_id, complaint_count=0)
+                db.add(area)
+        except IntegrityError:
+            area = db.query(Area).filter(Area.key == key).one()
+
+        self._remember_after_commit(db, area)
+        return area.id
+
+    # ---------- HIERARCHY ----------
+
+    def upsert(
+        self,
+        db: Session,
+        name: str,
+        level: str = "ward",
+        parent_id: Optional[int] = None,
+    ) -> Area:
+        """Register an area (or re-parent an existing one) and refresh rollups."""
+        if level not in LEVELS:
+            raise ValueError(f"level must be one of {', '.join(LEVELS)}")
+        if parent_id is not None and db.get(Area, parent_id) is None:
+            raise ValueError("parent area not found")
+
+        self._ensure_loaded(db)
+        key = normalize_area(name)
+        area = db.query(Area).filter(Area.key == key).first()
+        if area is None:
+            area = db.get(Area, self._create_area(db, name=name.strip(), key=key, level=level, parent_id=parent_id))
+        else:
+            area.level = level
+            area.parent_id = parent_id
+        db.flush()
+
+        self._remember_after_commit(db, area)
+        db.commit()
+        # Rollups walk the cached hierarchy, which now includes this area.
+        refresh_rollups(db)
+        db.commit()
+        return area
+
+    def record_complaint(self, db: Session, area_id: Optional[int], delta: int = 1) -> None:
+        """Bump the precomputed rollup count of an area and all its ancestors."""
+        if area_id is None:
+            return
+        db.execute(
+            update(Area)
+            .where(Area.id.in_(self.ancestors(area_id)))
+            .values(complaint_count=Area.complaint_count + delta)
+        )
+
+
+area_registry = TenantLocal(AreaRegistry)  # one per tenant
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    if session.in_nested_transaction():  # a savepoint was released; the outer transaction may still roll back
+        return
+    for apply in session.info.pop(_PENDING, []):
+        apply()
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_pending(session: Session, transaction) -> None:
+    if transaction.parent is None:  # the outer transaction ended without a commit
+        session.info.pop(_PENDING, None)
+
+
+def refresh_rollups(db: Session) -> None:
+    """Recompute every area's `complaint_count` from complaints + archive stats."""
+    direct: Dict[int, int] = {}
+    hot = db.query(Complaint.area_id, func.count(Complaint.id)).filter(Complaint.area_id.isnot(None)).group_by(Complaint.area_id)
+    cold = db.query(ArchiveStat.area_id, func.sum(ArchiveStat.count)).filter(ArchiveStat.area_id.isnot(None)).group_by(ArchiveStat.area_id)
+    for area_id, n in list(hot) + list(cold):
+        direct[area_id] = direct.get(area_id, 0) + int(n or 0)
+
+    totals: Dict[int, int] = {}
+    for area_id, n in direct.items():
+        for node in area_registry.ancestors(area_id):
+            totals[node] = totals.get(node, 0) + n
+
+    db.query(Area).update({Area.complaint_count: 0}, synchronize_session=False)
+    for area_id, n in totals.items():
+        db.query(Area).filter(Area.id == area_id).update({Area.complaint_count: n}, synchronize_session=False)
+
+
+def backfill_area_ids(db: Session) -> int:
+    """
+    Resolve `area_id` for rows written before the registry existed, one
+    set-based UPDATE per distinct raw area string. Returns rows updated.
+    """
+    area_registry.load(db)
+    updated = 0
+    for model in (Complaint, ArchivedComplaint):
+        raws = [
+            r[0]
+            for r in db.query(model.area)
+            .filter(model.area_id.is_(None), model.area.isnot(None))
+            .distinct()
+            .all()
+        ]
+        for raw in raws:
+            area_id = area_registry.resolve(db, raw)
+            if area_id is None:
+                continue
+            updated += (
+                db.query(model)
+                .filter(model.area == raw, model.area_id.is_(None))
+                .update({model.area_id: area_id}, synchronize_session=False)
+            )
+
+    updated += _backfill_archive_stats(db)
+
+    if updated:
+        refresh_rollups(db)
+    db.commit()
+    return updated
+
+
+def _backfill_archive_stats(db: Session) -> int:
+    """
+    Give `archive_stats` rows their area_id, folding each into an existing
+    row with the same (area, area_id, category, status) key if there is one.
+    """
+    updated = 0
+    for stat in db.query(ArchiveStat).filter(ArchiveStat.area_id.is_(None), ArchiveStat.area.isnot(None)).all():
+        area_id = area_registry.resolve(db, stat.area)
+        if area_id is None:
+            continue
+        target = (
+            db.query(ArchiveStat)
+            .filter(
+                ArchiveStat.area == stat.area,
+                ArchiveStat.area_id == area_id,
+                ArchiveStat.category.is_(None) if stat.category is None else ArchiveStat.category == stat.category,
+                ArchiveStat.status == stat.status,
+            )
+            .first()
+        )
+        if target:
+            target.count += stat.count
+            db.delete(stat)
+        else:
+            stat.area_id = area_id
+        db.flush()
+        updated += 1
+    return updated
+
+
+def rollup(db: Session, level: str = "ward") -> List[dict]:
+    """Precomputed complaint counts for every area at one hierarchy level."""
+    rows = (
+        db.query(Area)
+        .filter(Area.level == level)
+        .order_by(Area.complaint_count.desc(), Area.name)
+        .all()
+    )
+    return [
+        {
+            "id": a.id,
+            "name": a.name,
+            "level": a.level,
+            "parent_id": a.parent_id,
+            "parent": area_registry.name(a.parent_id),
+            "count": a.complaint_count,
+        }
+        for a in rows
+    ]
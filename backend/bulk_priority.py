@@ -0,0 +1,186 @@
+"""
+Civisense Bulk Priority Engine
+==============================
+NumPy-vectorised version of priority.compute_priority_score for whole
+tables at once:
+
+- load_score_columns() streams the score columns out of the DB in chunks
+  into contiguous float arrays.
+- simulate() re-scores every row under proposed weights with one
+  matrix-vector product and reports how the queue would reorder.
+- apply_weights() makes approved weights live (for every worker, through
+  the weights file) and re-scores the open complaints with a single
+  set-based UPDATE, logged to the change feed.
+
+Complaints scored by Gemini keep Gemini's priority: the weights only
+describe compute_priority_score, so simulate() and apply_weights() leave
+those rows' scores as they are.
+"""
+
+from typing import Dict
+
+import numpy as np
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from changes import log_selected
+from complaint_cache import complaint_cache
+from db import CLOSED_STATUSES, Complaint
+from priority import DEFAULT_WEIGHTS, normalize_weights, priority_weights, save_weights
+
+
+# Column order of the score matrix; matches the DEFAULT_WEIGHTS keys.
+FEATURES = ("urgency", "population_impact", "vulnerability", "confidence")
+CHUNK_SIZE = 100_000
+
+# Start of the compact explanation stored for Gemini-scored complaints.
+_GEMINI_EXPLANATION = '{"version":"gemini",'
+
+
+def _open_filter():
+    return func.lower(func.coalesce(Complaint.status, "new")).notin_(CLOSED_STATUSES)
+
+
+def _weighted_filter():
+    """Complaints whose stored score came from the weights (not from Gemini)."""
+    return or_(Complaint.explanation.is_(None), ~Complaint.explanation.startswith(_GEMINI_EXPLANATION, autoescape=True))
+
+
+def load_score_columns(db: Session, open_only: bool = True, chunk_size: int = CHUNK_SIZE) -> Dict[str, np.ndarray]:
+    """
+    Read id, the four score inputs and the stored priority for every
+    (open) complaint, chunk by chunk, into NumPy arrays.
+
+    Returns {"id": int64[n], "features": float64[n, 4], "priority_score": float64[n],
+    "weighted": bool[n]} where `weighted` is False for Gemini-scored rows.
+    """
+    stmt = select(
+        Complaint.id,
+        *(func.coalesce(getattr(Complaint, f), 0.0) for f in FEATURES),
+        case((_weighted_filter(), 1.0), else_=0.0),
+        func.coalesce(Complaint.priority_score, 0.0),
+    )
+    if open_only:
+        stmt = stmt.where(_open_filter())
+
+    chunks = []
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        chunks.append(np.asarray(partition, dtype=np.float64))
+
+    data = np.concatenate(chunks) if chunks else np.empty((0, len(FEATURES) + 3))
+    return {
+        "id": data[:, 0].astype(np.int64),
+        "features": np.ascontiguousarray(data[:, 1:1 + len(FEATURES)]),
+        "weighted": data[:, -2] > 0,
+        "priority_score": data[:, -1].copy(),
+    }
+
+
+def score(features: np.ndarray, weights: Dict[str, float]) -> np.ndarray:
+    """Vectorised compute_priority_score for an (n, 4) feature matrix."""
+    w = np.array([weights[f] for f in FEATURES], dtype=np.float64)
+    return np.clip(features @ w, 0.0, 1.0)
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """0-based queue position of every row (highest score first, ties by input order)."""
+    order = np.argsort(-scores, kind="stable")
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(order.size)
+    return ranks
+
+
+def simulate(
+    db: Session,
+    weights: Dict[str, float],
+    top_k: int = 50,
+    open_only: bool = True,
+    movers: int = 10,
+) -> dict:
+    """
+    Compare the current queue order (stored priority_score) with the order
+    the proposed weights would produce.
+    """
+    proposed = normalize_weights(weights)
+    cols = load_score_columns(db, open_only=open_only)
+    n = cols["id"].size
+    if n == 0:
+        return {"weights": proposed, "complaints": 0}
+
+    current_rank = _ranks(cols["priority_score"])
+    new_scores = np.where(cols["weighted"], score(cols["features"], proposed), cols["priority_score"])
+    new_rank = _ranks(new_scores)
+    delta = current_rank - new_rank  # positive: moves up the queue
+    abs_delta = np.abs(delta)
+
+    k = min(top_k, n)
+    current_top = current_rank < k
+    new_top = new_rank < k
+
+    # Spearman rank correlation (ranks have no ties by construction)
+    if n > 1:
+        spearman = 1.0 - 6.0 * float(np.sum(delta.astype(np.float64) ** 2)) / (n * (n * n - 1.0))
+    else:
+        spearman = 1.0
+
+    def _movers(idx) -> list:
+        return [
+            {
+                "id": int(cols["id"][i]),
+                "from_rank": int(current_rank[i]) + 1,
+                "to_rank": int(new_rank[i]) + 1,
+                "new_priority_score": round(float(new_scores[i]), 4),
+            }
+            for i in idx
+        ]
+
+    m = min(movers, n)
+    return {
+        "weights": proposed,
+        "complaints": int(n),
+        "spearman": round(spearman, 4),
+        "mean_abs_rank_change": round(float(abs_delta.mean()), 2),
+        "median_abs_rank_change": float(np.median(abs_delta)),
+        "max_abs_rank_change": int(abs_delta.max()),
+        "unchanged_rank_fraction": round(float(np.mean(delta == 0)), 4),
+        "top_k": {
+            "k": int(k),
+            "retained": int(np.sum(current_top & new_top)),
+            "entered": int(np.sum(new_top & ~current_top)),
+        },
+        "biggest_risers": _movers(np.argsort(-delta, kind="stable")[:m]),
+        "biggest_fallers": _movers(np.argsort(delta, kind="stable")[:m]),
+    }
+
+
+def apply_weights(db: Session, weights: Dict[str, float], open_only: bool = True) -> Dict[str, object]:
+    """
+    Make `weights` the current tenant's live priority weights (persisted
+    to its priority.weights_path() file, which the other workers reload)
+    and re-score the weighted complaints with one set-based UPDATE, logged
+    to the change feed.
+    """
+    approved = normalize_weights(weights)
+
+    raw = sum(approved[f] * func.coalesce(getattr(Complaint, f), 0.0) for f in FEATURES)
+    new_score = case((raw > 1.0, 1.0), (raw < 0.0, 0.0), else_=raw)
+    where = [_weighted_filter()] + ([_open_filter()] if open_only else [])
+
+    log_selected(db, "rescored", *where, priority_score=new_score, weights=approved)
+    result = db.execute(
+        update(Complaint)
+        .where(*where)
+        .values(priority_score=new_score)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+    save_weights(approved)
+    complaint_cache.clear()
+    return {"weights": approved, "updated": result.rowcount or 0}
+
+
+def current_weights() -> Dict[str, float]:
+    weights = priority_weights()
+    return {f: weights[f] for f in DEFAULT_WEIGHTS}
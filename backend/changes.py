@@ -0,0 +1,253 @@
+"""
+Civisense Change Feed
+=====================
+Append-only log of complaint changes, so dashboards and downstream
+systems (CM helpline, analytics jobs) sync in O(changes) instead of
+re-reading /dashboard.
+
+- Every intake, status change, feedback correction, late Gemini
+  re-analysis, cohort rescore and archival adds a `change_log` row in the
+  same transaction as the change itself, so a change is visible in the
+  feed exactly when it is committed.
+- The row id is the consumer's cursor: GET /changes?since=<cursor> returns
+  the rows after it, in id order. On PostgreSQL, ids are handed out before
+  commit, so a lower id can commit after a higher one; a page stops before
+  an id gap younger than CHANGES_GAP_WAIT_SECONDS, and the missing row is
+  returned by the next call.
+- Long-poll (`wait=`) and SSE (/changes/stream) wake up on commits in this
+  process, and re-check the table every CHANGES_POLL_SECONDS for commits
+  made by other workers.
+- Rows older than CHANGES_RETENTION_DAYS are pruned by the archive job; a
+  cursor that fell behind the retained log gets a 410 and must reload.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, event, insert, literal, select
+from sqlalchemy.orm import Session
+
+from db import ChangeEvent, Complaint
+from responses import dumps
+from tenancy import current_tenant
+
+
+CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", "1000"))
+CHANGES_MAX_WAIT_SECONDS = float(os.getenv("CHANGES_MAX_WAIT_SECONDS", "30"))
+CHANGES_POLL_SECONDS = float(os.getenv("CHANGES_POLL_SECONDS", "1"))
+CHANGES_GAP_WAIT_SECONDS = float(os.getenv("CHANGES_GAP_WAIT_SECONDS", "2"))
+CHANGES_HEARTBEAT_SECONDS = 15.0
+
+_LOGGED = "change_log_written"  # Session.info flag, see _notify_on_commit()
+
+
+class CursorExpired(Exception):
+    """The requested cursor is older than the retained change log."""
+
+
+def _details(details: Optional[dict]) -> Optional[str]:
+    details = {k: v for k, v in (details or {}).items() if v is not None}
+    return json.dumps(details, ensure_ascii=False, separators=(",", ":")) if details else None
+
+
+# ---------- WRITING (caller commits) ----------
+
+def log_change(db: Session, complaint: Complaint, kind: str, **details) -> None:
+    """Record the current state of `complaint` after a change of `kind`."""
+    if complaint.id is None:
+        db.flush()  # new complaint: the event needs its id
+    db.add(ChangeEvent(
+        complaint_id=complaint.id,
+        kind=kind,
+        status=complaint.status,
+        category=complaint.category,
+        priority_score=complaint.priority_score,
+        area=complaint.area,
+        area_id=complaint.area_id,
+        details=_details(details),
+        created_at=datetime.utcnow(),
+    ))
+    db.info[_LOGGED] = True
+
+
+def log_created_rows(db: Session, rows: List[dict]) -> None:
+    """Record complaints inserted in bulk (dicts that include their `id`)."""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    db.execute(insert(ChangeEvent), [
+        {
+            "complaint_id": r["id"],
+            "kind": "created",
+            "status": r.get("status"),
+            "category": r.get("category"),
+            "priority_score": r.get("priority_score"),
+            "area": r.get("area"),
+            "area_id": r.get("area_id"),
+            "created_at": now,
+        }
+        for r in rows
+    ])
+    db.info[_LOGGED] = True
+
+
+def log_selected(db: Session, kind: str, *where, priority_score=None, **details) -> None:
+    """
+    Record every complaint matching `where` with one INSERT ... SELECT,
+    for set-based changes. Run it before an UPDATE and pass the new
+    `priority_score` expression, or before a DELETE.
+    """
+    columns = ["complaint_id", "kind", "status", "category", "priority_score", "area", "area_id", "details", "created_at"]
+    db.execute(insert(ChangeEvent).from_select(columns, select(
+        Complaint.id,
+        literal(kind),
+        Complaint.status,
+        Complaint.category,
+        Complaint.priority_score if priority_score is None else priority_score,
+        Complaint.area,
+        Complaint.area_id,
+        literal(_details(details)),
+        literal(datetime.utcnow()),
+    ).where(*where)))
+    db.info[_LOGGED] = True
+
+
+def prune(db: Session, older_than_days: Optional[int] = None) -> int:
+    """Delete change-log rows older than the retention window (caller commits)."""
+    days = CHANGES_RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    return db.execute(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff)).rowcount or 0
+
+
+# ---------- READING ----------
+
+def _event(row: ChangeEvent) -> dict:
+    return {
+        "cursor": row.id,
+        "complaint_id": row.complaint_id,
+        "kind": row.kind,
+        "at": row.created_at,
+        "status": row.status,
+        "category": row.category,
+        "priority_score": row.priority_score,
+        "area": row.area,
+        "area_id": row.area_id,
+        "details": json.loads(row.details) if row.details else {},
+    }
+
+
+def read_changes(db: Session, since: int = 0, limit: int = 100) -> dict:
+    """Up to `limit` changes after cursor `since`, and the cursor to pass next."""
+    limit = max(1, min(limit, CHANGES_MAX_LIMIT))
+    rows = (
+        db.query(ChangeEvent)
+        .filter(ChangeEvent.id > since)
+        .order_by(ChangeEvent.id)
+        .limit(limit)
+        .all()
+    )
+    if since > 0 and rows and rows[0].id > since + 1:
+        # Nothing left at or before the cursor: the rows after it were pruned.
+        if db.query(ChangeEvent.id).filter(ChangeEvent.id <= since).first() is None:
+            raise CursorExpired(f"Cursor {since} is older than the retained change log; reload and restart from 0.")
+
+    settled = datetime.utcnow() - timedelta(seconds=CHANGES_GAP_WAIT_SECONDS)
+    changes = []
+    cursor = since
+    for row in rows:
+        if cursor and row.id != cursor + 1 and row.created_at > settled:
+            break  # a lower id may still be committing
+        changes.append(_event(row))
+        cursor = row.id
+    return {
+        "changes": changes,
+        "next_cursor": cursor,
+        "has_more": len(changes) < len(rows) or len(rows) == limit,
+    }
+
+
+# ---------- WAKE-UPS ----------
+
+class _Subscription:
+    def __init__(self, feed: "ChangeFeed", tenant: str):
+        self._feed = feed
+        self.tenant = tenant
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+
+    def _wake(self) -> None:
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:  # loop closed
+            pass
+
+    async def wait(self, timeout: float) -> bool:
+        """True if a change was committed in this process since the last wait."""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._event.clear()
+
+    def __enter__(self) -> "_Subscription":
+        self._feed._add(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._feed._remove(self)
+
+
+class ChangeFeed:
+    """Wakes long-poll and SSE readers of a tenant when its change log grows."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, Set[_Subscription]] = defaultdict(set)
+
+    def subscribe(self, tenant: Optional[str] = None) -> _Subscription:
+        """Use as `with feed.subscribe() as sub:` from async code, before reading."""
+        return _Subscription(self, tenant or current_tenant.get())
+
+    def _add(self, sub: _Subscription) -> None:
+        with self._lock:
+            self._subscribers[sub.tenant].add(sub)
+
+    def _remove(self, sub: _Subscription) -> None:
+        with self._lock:
+            self._subscribers[sub.tenant].discard(sub)
+
+    def notify(self, tenant: Optional[str] = None) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(tenant or current_tenant.get(), ()))
+        for sub in subscribers:
+            sub._wake()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {tenant: len(subs) for tenant, subs in self._subscribers.items() if subs}
+
+
+change_feed = ChangeFeed()
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_on_commit(session: Session) -> None:
+    if session.info.pop(_LOGGED, False):
+        change_feed.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session: Session) -> None:
+    session.info.pop(_LOGGED, None)
+
+
+def sse_event(change: dict) -> bytes:
+    return b"id: %d\nevent: change\ndata: %s\n\n" % (change["cursor"], dumps(change))
@@ -0,0 +1,141 @@
+"""
+Civisense Complaint Cache
+=========================
+Persisted explanations and a read-through cache for single-complaint
+lookups (citizen status-tracking pages).
+
+- compact_explanation() keeps only what the complaint row does not already
+  hold: the engine version and the per-field notes. expand_explanation()
+  rebuilds the full explanation from those notes and the current column
+  values, so rescoring and feedback corrections show up without rewriting
+  the stored JSON.
+- ComplaintCache is a bounded LRU of rendered complaints. Entries are
+  dropped on status, feedback and re-analysis changes in this process and
+  expire after COMPLAINT_CACHE_TTL seconds, which bounds staleness from
+  other workers and from cohort rescoring.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Union
+
+from db import ArchivedComplaint, Complaint
+from tenancy import TenantLocal
+
+
+COMPLAINT_CACHE_SIZE = int(os.getenv("COMPLAINT_CACHE_SIZE", "10000"))
+COMPLAINT_CACHE_TTL = float(os.getenv("COMPLAINT_CACHE_TTL", "30"))
+
+# Explanation fields backed by a complaint column of the same name.
+EXPLAINED_FIELDS = ("category", "urgency", "population_impact", "vulnerability", "priority_score", "scheme")
+LEGACY_NOTES = "Recorded before explanations were stored."
+
+
+def compact_explanation(explanation: dict, version: Optional[str] = None) -> str:
+    notes = {field: entry.get("notes", "") for field, entry in explanation.items() if isinstance(entry, dict)}
+    return json.dumps({"version": version, "notes": notes}, ensure_ascii=False, separators=(",", ":"))
+
+
+def with_notes(stored: Optional[str], **notes: str) -> str:
+    """Return `stored` with the given per-field notes replaced."""
+    data = json.loads(stored) if stored else {"version": None, "notes": {}}
+    data["notes"].update(notes)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def expand_explanation(complaint: Union[Complaint, ArchivedComplaint]) -> dict:
+    data = json.loads(complaint.explanation) if complaint.explanation else {"notes": {}}
+    notes = data.get("notes", {})
+
+    explanation = {}
+    for field in EXPLAINED_FIELDS:
+        value = getattr(complaint, field)
+        if field == "scheme":
+            value = value or ""
+        elif field != "category":
+            value = value or 0.0
+        explanation[field] = {"value": value, "notes": notes.get(field, LEGACY_NOTES)}
+    explanation["category"]["confidence"] = complaint.confidence or 0.0
+
+    for field, text in notes.items():  # notes without a column, e.g. hedging
+        if field not in explanation:
+            explanation[field] = {"notes": text}
+    if data.get("version"):
+        explanation["engine"] = {"value": data["version"]}
+    return explanation
+
+
+def render(complaint: Union[Complaint, ArchivedComplaint]) -> dict:
+    return {
+        "id": complaint.id,
+        "text": complaint.text,
+        "area": complaint.area,
+        "category": complaint.category,
+        "confidence": complaint.confidence or 0.0,
+        "urgency": complaint.urgency or 0.0,
+        "population_impact": complaint.population_impact or 0.0,
+        "vulnerability": complaint.vulnerability or 0.0,
+        "priority_score": complaint.priority_score or 0.0,
+        "scheme": complaint.scheme or "",
+        "status": complaint.status,
+        "timestamp": complaint.timestamp,
+        "explanation": expand_explanation(complaint),
+    }
+
+
+class ComplaintCache:
+    def __init__(self, size: int = COMPLAINT_CACHE_SIZE, ttl: float = COMPLAINT_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # complaint id -> (expires_at, rendered complaint), least recently used first
+        self._entries: "OrderedDict[int, Tuple[float, dict]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, complaint_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(complaint_id)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[complaint_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(complaint_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, complaint_id: int, rendered: dict) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[complaint_id] = (time.monotonic() + self.ttl, rendered)
+            self._entries.move_to_end(complaint_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, complaint_id: int) -> None:
+        with self._lock:
+            self._entries.pop(complaint_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "capacity": self.size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+
+complaint_cache = TenantLocal(ComplaintCache)  # one per tenant
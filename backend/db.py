@@ -1,37 +1,47 @@
-import os
 from datetime import datetime
 from typing import Generator
 
-from dotenv import load_dotenv
 from sqlalchemy import (
+    Boolean,
     Column,
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
+    MetaData,
     String,
     Text,
-    create_engine,
+    UniqueConstraint,
     func,
+    inspect,
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
+from sqlalchemy.schema import CreateTable
 
+from tenancy import DEFAULT_TENANT, current_tenant, tenants
 
-load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./civisense.db")
+# The default tenant's engine; other tenants' engines come from tenancy.tenants.
+engine = tenants.engine(DEFAULT_TENANT)
+_Session = sessionmaker(autocommit=False, autoflush=False)
 
-# For SQLite, needed for multithreading in FastAPI
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def SessionLocal() -> Session:
+    """A session on the current tenant's database (see tenancy.current_tenant)."""
+    return _Session(bind=tenants.engine())
+
 
 Base = declarative_base()
 
+# Statuses (compared lower-cased) after which a complaint needs no more work.
+CLOSED_STATUSES = ("resolved", "closed")
+
 
 class Complaint(Base):
     __tablename__ = "complaints"
+    # Never reuse ids: archived complaints keep theirs in `complaints_archive`.
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     text = Column(Text, nullable=False)
@@ -43,8 +53,11 @@ class Complaint(Base):
     priority_score = Column(Float, index=True)
     scheme = Column(String(150))
     area = Column(String(150), index=True)
+    area_id = Column(Integer, ForeignKey("areas.id"), index=True, nullable=True)
     status = Column(String(50), default="new", index=True)
     timestamp = Column(DateTime, default=datetime.utcnow, server_default=func.now())
+    explanation = Column(Text, nullable=True)  # compact JSON, see complaint_cache.py
+    resolved_at = Column(DateTime, nullable=True)  # first move to a closed status
 
     feedback = relationship("Feedback", back_populates="complaint", cascade="all, delete-orphan")
 
@@ -53,7 +66,7 @@ class Feedback(Base):
     __tablename__ = "feedback"
 
     id = Column(Integer, primary_key=True, index=True)
-    complaint_id = Column(Integer, ForeignKey("complaints.id", ondelete="CASCADE"), nullable=False)
+    complaint_id = Column(Integer, ForeignKey("complaints.id", ondelete="CASCADE"), nullable=False, index=True)
     correct_category = Column(String(100), nullable=True)
     correct_scheme = Column(String(150), nullable=True)
     notes = Column(Text, nullable=True)
@@ -62,9 +75,317 @@ class Feedback(Base):
     complaint = relationship("Complaint", back_populates="feedback")
 
 
+class Area(Base):
+    """Canonical locality in the ward → zone → district hierarchy."""
+
+    __tablename__ = "areas"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(150), nullable=False)
+    key = Column(String(150), unique=True, nullable=False)  # normalised spelling used for matching
+    level = Column(String(20), nullable=False, default="ward")  # ward | zone | district
+    parent_id = Column(Integer, ForeignKey("areas.id"), nullable=True, index=True)
+    complaint_count = Column(Integer, nullable=False, default=0)  # includes all descendants
+
+
+class AreaAlias(Base):
+    """Raw area string as typed by a citizen, resolved once to a canonical area."""
+
+    __tablename__ = "area_aliases"
+
+    raw = Column(String(150), primary_key=True)
+    area_id = Column(Integer, ForeignKey("areas.id"), nullable=False, index=True)
+
+
+class ArchivedComplaint(Base):
+    """Cold copy of a resolved complaint moved out of the hot `complaints` table."""
+
+    __tablename__ = "complaints_archive"
+
+    id = Column(Integer, primary_key=True)
+    text = Column(Text, nullable=False)
+    category = Column(String(100), index=True)
+    confidence = Column(Float)
+    urgency = Column(Float)
+    population_impact = Column(Float)
+    vulnerability = Column(Float)
+    priority_score = Column(Float)
+    scheme = Column(String(150))
+    area = Column(String(150), index=True)
+    area_id = Column(Integer, index=True, nullable=True)
+    status = Column(String(50))
+    timestamp = Column(DateTime, index=True)
+    explanation = Column(Text, nullable=True)
+    resolved_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
+
+
+class ArchivedFeedback(Base):
+    __tablename__ = "feedback_archive"
+
+    id = Column(Integer, primary_key=True)
+    complaint_id = Column(Integer, index=True, nullable=False)
+    correct_category = Column(String(100), nullable=True)
+    correct_scheme = Column(String(150), nullable=True)
+    notes = Column(Text, nullable=True)
+    timestamp = Column(DateTime)
+
+
+class ArchiveStat(Base):
+    """Running counts of archived complaints so aggregates stay correct."""
+
+    __tablename__ = "archive_stats"
+    # area_id is part of the key: two raw spellings may share a name but not an area.
+    __table_args__ = (UniqueConstraint("area", "area_id", "category", "status", name="uq_archive_stats_key"),)
+
+    id = Column(Integer, primary_key=True)
+    area = Column(String(150), index=True)
+    area_id = Column(Integer, index=True, nullable=True)
+    category = Column(String(100), index=True)
+    status = Column(String(50))
+    count = Column(Integer, nullable=False, default=0)
+
+
+class HourlyRollup(Base):
+    """Complaints created per hour, by area, category and current status (see rollups.py)."""
+
+    __tablename__ = "rollup_hourly"
+    __table_args__ = (
+        UniqueConstraint("hour", "area_id", "category", "status", name="uq_rollup_hourly_key"),
+        # Covering index: day-level queries never touch the table itself.
+        Index("ix_rollup_hourly_day", "day", "area_id", "category", "status", "count"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, nullable=False, index=True)
+    day = Column(DateTime, nullable=False)  # hour truncated to the day, for coarse queries
+    area_id = Column(Integer, nullable=False, default=0)  # 0 = no area
+    category = Column(String(100), nullable=False, default="")
+    status = Column(String(50), nullable=False, default="new")
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ResolutionRollup(Base):
+    """Complaints resolved per hour, by area, category and time-to-resolution bucket."""
+
+    __tablename__ = "rollup_resolution_hourly"
+    __table_args__ = (
+        UniqueConstraint("hour", "area_id", "category", "duration_bucket", name="uq_rollup_resolution_key"),
+        Index("ix_rollup_resolution_day", "day", "area_id", "category", "duration_bucket", "count"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    hour = Column(DateTime, nullable=False, index=True)
+    day = Column(DateTime, nullable=False)
+    area_id = Column(Integer, nullable=False, default=0)
+    category = Column(String(100), nullable=False, default="")
+    duration_bucket = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class ChangeEvent(Base):
+    """Append-only log of complaint changes, read by GET /changes (see changes.py)."""
+
+    __tablename__ = "change_log"
+    # The id is the consumers' cursor, so it must never be reused.
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    complaint_id = Column(Integer, nullable=False, index=True)
+    kind = Column(String(20), nullable=False)  # created, status, feedback, reanalysed, archived
+    # The complaint's state after the change.
+    status = Column(String(50))
+    category = Column(String(100))
+    priority_score = Column(Float)
+    area = Column(String(150))
+    area_id = Column(Integer, nullable=True)
+    details = Column(Text, nullable=True)  # compact JSON, e.g. the previous status
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class ImportCheckpoint(Base):
+    """Progress of a bulk import job, committed together with each batch."""
+
+    __tablename__ = "import_checkpoints"
+
+    job = Column(String(255), primary_key=True)
+    rows_done = Column(Integer, nullable=False, default=0)
+    # JSON [[area, area_id, category], ...]: cohorts to settle when the job ends.
+    cohorts = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ShadowSample(Base):
+    """One sampled request re-run on a candidate engine in shadow mode."""
+
+    __tablename__ = "shadow_samples"
+
+    id = Column(Integer, primary_key=True)
+    complaint_id = Column(Integer, index=True, nullable=True)
+    live_version = Column(String(100))
+    candidate_version = Column(String(100), index=True)
+    live_category = Column(String(100))
+    candidate_category = Column(String(100), nullable=True)
+    candidate_confidence = Column(Float, nullable=True)
+    agree = Column(Boolean, nullable=True)  # NULL when the candidate failed
+    latency_ms = Column(Float)
+    error = Column(Text, nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    """Result of a POST /complaint made with an Idempotency-Key header."""
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request body
+    complaint_id = Column(Integer, nullable=True)
+    response = Column(Text, nullable=True)  # NULL while the first request is in flight
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+def _add_missing_columns() -> None:
+    """
+    create_all() never alters existing tables, so add nullable columns and
+    indexes that were introduced after a database file was first created.
+    """
+    bind = tenants.engine()
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}')
+                if column.index:
+                    conn.exec_driver_sql(
+                        f'CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} '
+                        f'ON {table.name} ("{column.name}")'
+                    )
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _rebuild_sqlite_table(conn, table, extra_sql=()) -> None:
+    """
+    Recreate a SQLite table from its current model definition, keeping its
+    rows and triggers. SQLite cannot alter constraints or add AUTOINCREMENT
+    in place. `extra_sql` runs after the copy, before the swap.
+    """
+    new_name = f"{table.name}__rebuilt"
+    metadata = MetaData()
+    for other in Base.metadata.sorted_tables:
+        other.to_metadata(metadata)  # so foreign keys resolve
+    new_table = table.to_metadata(metadata, name=new_name)
+    for index in list(new_table.indexes):
+        new_table.indexes.discard(index)
+    triggers = [
+        sql for (sql,) in conn.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (table.name,)
+        )
+    ]
+    existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+    columns = ", ".join(f'"{c.name}"' for c in table.columns if c.name in existing)
+
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS "{new_name}"')
+    conn.execute(CreateTable(new_table))
+    conn.exec_driver_sql(f'INSERT INTO "{new_name}" ({columns}) SELECT {columns} FROM "{table.name}"')
+    for sql in extra_sql:
+        conn.exec_driver_sql(sql)
+    conn.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    conn.exec_driver_sql(f'ALTER TABLE "{new_name}" RENAME TO "{table.name}"')
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+    for sql in triggers:
+        conn.exec_driver_sql(sql)
+
+
+def _migrate_constraints() -> None:
+    """
+    Bring tables created by older versions up to the current constraints:
+    - `complaints` gets AUTOINCREMENT on SQLite, with its sequence started
+      past every archived id, so archived ids are never handed out again;
+    - `archive_stats` is keyed by (area, area_id, category, status).
+    """
+    bind = tenants.engine()
+    inspector = inspect(bind)
+    sqlite = bind.dialect.name == "sqlite"
+
+    rebuild = []
+    if sqlite and inspector.has_table(Complaint.__tablename__):
+        with bind.connect() as conn:
+            ddl = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (Complaint.__tablename__,)
+            ).scalar() or ""
+        if "AUTOINCREMENT" not in ddl.upper():
+            archived_max = (
+                f"(SELECT MAX(id) FROM {ArchivedComplaint.__tablename__})"
+                if inspector.has_table(ArchivedComplaint.__tablename__) else "NULL"
+            )
+            # The copy has already set the sequence to the hot table's max id.
+            rebuild.append((Complaint.__table__, [
+                f"INSERT INTO sqlite_sequence (name, seq) SELECT '{Complaint.__tablename__}__rebuilt', 0 "
+                f"WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = '{Complaint.__tablename__}__rebuilt')",
+                f"UPDATE sqlite_sequence SET seq = MAX(seq, COALESCE({archived_max}, 0)) "
+                f"WHERE name = '{Complaint.__tablename__}__rebuilt'",
+            ]))
+
+    stats = ArchiveStat.__table__
+    stats_key = next(
+        (u for u in inspector.get_unique_constraints(stats.name) if u["name"] == "uq_archive_stats_key"),
+        None,
+    ) if inspector.has_table(stats.name) else None
+    if stats_key and "area_id" not in stats_key["column_names"]:
+        if sqlite:
+            rebuild.append((stats, []))
+        else:
+            with bind.begin() as conn:
+                conn.exec_driver_sql(f"ALTER TABLE {stats.name} DROP CONSTRAINT uq_archive_stats_key")
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {stats.name} ADD CONSTRAINT uq_archive_stats_key "
+                    "UNIQUE (area, area_id, category, status)"
+                )
+
+    if not rebuild:
+        return
+    with bind.connect() as conn:
+        # Foreign keys must be off while a referenced table is swapped out,
+        # and the pragma is ignored inside a transaction, so set it first.
+        previous = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        conn.commit()
+        try:
+            # pysqlite does not open a transaction for DDL; make the swap atomic.
+            conn.exec_driver_sql("BEGIN")
+            for table, extra_sql in rebuild:
+                _rebuild_sqlite_table(conn, table, extra_sql)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.exec_driver_sql(f"PRAGMA foreign_keys = {int(previous or 0)}")
+            conn.commit()
+    for table, _ in rebuild:
+        print(f"✅ Rebuilt {table.name} with the current constraints")
+
+
 def create_all() -> None:
-    """Create database tables."""
-    Base.metadata.create_all(bind=engine)
+    """Create database tables (in the current tenant's database or schema)."""
+    bind = tenants.engine()
+    _, schema = tenants.location(current_tenant.get())
+    if schema:
+        with bind.begin() as conn:
+            conn.exec_driver_sql(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+    Base.metadata.create_all(bind=bind)
+    _add_missing_columns()
+    _migrate_constraints()
 
 
 def get_db() -> Generator[Session, None, None]:
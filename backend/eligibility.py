@@ -0,0 +1,249 @@
+"""
+Civisense Scheme Eligibility
+============================
+Checks citizen profiles against every scheme in data/schemes.json, using
+the `eligibility_rules`, `age_limits` and `income_limits` that only the
+Gemini prompt used to read.
+
+- The catalogue is compiled into NumPy arrays: a scheme x tag matrix for
+  target groups, one for exclusions, one for accepted income groups, and
+  per-scheme age bounds and income caps. It is recompiled when the file
+  changes (checked by mtime on each call).
+- A batch of profiles becomes a profile x tag matrix; eligibility of
+  every (profile, scheme) pair is three matrix products and a few
+  broadcast comparisons, so the cost per profile stays in microseconds
+  as the catalogue grows.
+- Tags are the rule names, normalised: "Income_Tax_Payer (Since Oct 1,
+  2022)" -> "income_tax_payer". A profile lists its tags, and a few are
+  derived from its fields (female + 18 or older -> "adult_woman",
+  income_group "bpl" -> "bpl_household", residence "rural" ->
+  "rural_household", ...).
+- Rules: a scheme with target groups needs at least one of them, any
+  exclusion disqualifies, and a missing age or income fails a scheme that
+  limits it. Income limits like "8 Lakh" or the EWS/LIG/MIG bands become
+  a yearly cap in rupees; a band name given as `income_group` also
+  qualifies.
+- The simpler backend/schemes.json format (min_age, max_age,
+  income_groups) compiles the same way.
+"""
+
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOGUE_PATHS = [
+    os.getenv("SCHEME_CATALOGUE_PATH") or os.path.join(_BASE_DIR, "..", "data", "schemes.json"),
+    os.path.join(_BASE_DIR, "schemes.json"),
+]
+ELIGIBILITY_MAX_PROFILES = int(os.getenv("ELIGIBILITY_MAX_PROFILES", "10000"))
+
+# Rule names that mean the same tag.
+_ALIASES = {
+    "urban_residents": "urban_resident",
+    "apl": "apl_household",
+    "bpl": "bpl_household",
+}
+_NOT_A_RULE = {"", "n/a", "na", "none"}
+
+_AMOUNT = re.compile(r"(\d+(?:\.\d+)?)\s*(lakh|crore|k)?", re.IGNORECASE)
+_MULTIPLIER = {"lakh": 100_000, "crore": 10_000_000, "k": 1_000, None: 1}
+
+
+def normalize_tag(rule: str) -> str:
+    """'Income_Tax_Payer (Since Oct 1, 2022)' -> 'income_tax_payer'."""
+    tag = re.sub(r"\(.*?\)", "", str(rule)).strip().lower()
+    tag = re.sub(r"[\s\-]+", "_", tag).strip("_")
+    return _ALIASES.get(tag, tag)
+
+
+def parse_amount(text) -> Optional[float]:
+    """Largest rupee amount in '8 Lakh' / '6 Lakh to 18 Lakh/year' (None if there is none)."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    amounts = [float(n) * _MULTIPLIER[(unit or "").lower() or None] for n, unit in _AMOUNT.findall(str(text))]
+    return max(amounts) if amounts else None
+
+
+def _rules(scheme: Dict) -> Tuple[List[str], List[str]]:
+    rules = scheme.get("eligibility_rules") or {}
+    targets = [normalize_tag(r) for r in rules.get("target_group") or []]
+    exclusions = [normalize_tag(r) for r in rules.get("exclusions") or []]
+    return [t for t in targets if t not in _NOT_A_RULE], [t for t in exclusions if t not in _NOT_A_RULE]
+
+
+def _age_bounds(scheme: Dict) -> Tuple[float, float]:
+    limits = scheme.get("age_limits") or {}
+    low = limits.get("min", scheme.get("min_age"))
+    high = limits.get("max", scheme.get("max_age"))
+    return (float(low) if low else -np.inf), (float(high) if high is not None else np.inf)
+
+
+def _income_limit(scheme: Dict) -> Tuple[float, List[str], bool]:
+    """(yearly cap in rupees, income groups that qualify, whether income is limited at all)."""
+    groups = [g.lower() for g in scheme.get("income_groups") or []]
+    limits = scheme.get("income_limits") or {}
+    cap = parse_amount(limits.get("amount"))
+    bands = {k: v for k, v in limits.items() if k not in ("amount", "type", "note")}
+    if bands:
+        groups += [k.lower() for k in bands]
+        caps = [a for a in map(parse_amount, bands.values()) if a is not None]
+        cap = max(caps + ([cap] if cap is not None else [])) if caps else cap
+    if cap is None:
+        return (-np.inf if groups else np.inf), groups, bool(groups)
+    return cap, groups, True
+
+
+class CompiledCatalogue:
+    """A scheme catalogue compiled for batch eligibility checks."""
+
+    def __init__(self, schemes: List[Dict]):
+        self.schemes = [
+            {"scheme_id": s.get("scheme_id") or s.get("name"), "name": s.get("name", "Unknown")}
+            for s in schemes
+        ]
+        rules = [_rules(s) for s in schemes]
+        incomes = [_income_limit(s) for s in schemes]
+
+        self.tags: Dict[str, int] = {}
+        for targets, exclusions in rules:
+            for tag in targets + exclusions:
+                self.tags.setdefault(tag, len(self.tags))
+        self.income_groups: Dict[str, int] = {}
+        for _, groups, _ in incomes:
+            for group in groups:
+                self.income_groups.setdefault(group, len(self.income_groups))
+
+        n = len(schemes)
+        self.targets = np.zeros((n, len(self.tags)), dtype=np.float32)
+        self.exclusions = np.zeros((n, len(self.tags)), dtype=np.float32)
+        self.groups = np.zeros((n, len(self.income_groups)), dtype=np.float32)
+        for i, (targets, exclusions) in enumerate(rules):
+            self.targets[i, [self.tags[t] for t in targets]] = 1
+            self.exclusions[i, [self.tags[t] for t in exclusions]] = 1
+        for i, (_, groups, _) in enumerate(incomes):
+            self.groups[i, [self.income_groups[g] for g in groups]] = 1
+        self.open_to_all = self.targets.sum(axis=1) == 0
+
+        bounds = np.array([_age_bounds(s) for s in schemes], dtype=np.float64).reshape(n, 2)
+        self.min_age, self.max_age = bounds[:, 0], bounds[:, 1]
+        self.income_cap = np.array([cap for cap, _, _ in incomes], dtype=np.float64)
+        self.income_limited = np.array([limited for _, _, limited in incomes], dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.schemes)
+
+    def _profile_tags(self, profile: Dict) -> Iterable[str]:
+        yield "indian_citizen"  # every complainant; schemes list it as a target group
+        for tag in profile.get("tags") or []:
+            yield normalize_tag(tag)
+        age = profile.get("age")
+        gender = (profile.get("gender") or "").lower()
+        if gender in ("f", "female", "woman"):
+            if age is not None and age >= 18:
+                yield "adult_woman"
+            elif age is not None:
+                yield "girl_child"
+        income_group = (profile.get("income_group") or "").lower()
+        if income_group in ("bpl", "apl"):
+            yield f"{income_group}_household"
+        residence = (profile.get("residence") or "").lower()
+        if residence == "urban":
+            yield "urban_resident"
+        elif residence == "rural":
+            yield "rural_household"
+
+    def evaluate(self, profiles: List[Dict]) -> Tuple[np.ndarray, List[str]]:
+        """
+        Boolean profile x scheme matrix for `profiles` (dicts with age,
+        gender, annual_income, income_group, residence, tags), and the
+        profile tags no scheme mentions.
+        """
+        n = len(profiles)
+        has = np.zeros((n, len(self.tags)), dtype=np.float32)
+        in_group = np.zeros((n, len(self.income_groups)), dtype=np.float32)
+        age = np.full(n, np.nan)
+        income = np.full(n, np.nan)
+        unknown = set()
+        for i, profile in enumerate(profiles):
+            for tag in self._profile_tags(profile):
+                j = self.tags.get(tag)
+                if j is not None:
+                    has[i, j] = 1
+                elif tag != "indian_citizen":
+                    unknown.add(tag)
+            j = self.income_groups.get((profile.get("income_group") or "").lower())
+            if j is not None:
+                in_group[i, j] = 1
+            if profile.get("age") is not None:
+                age[i] = profile["age"]
+            if profile.get("annual_income") is not None:
+                income[i] = profile["annual_income"]
+
+        targeted = (has @ self.targets.T > 0) | self.open_to_all
+        excluded = has @ self.exclusions.T > 0
+        with np.errstate(invalid="ignore"):  # NaN (unknown) compares False
+            age_ok = (
+                (np.isneginf(self.min_age) | (age[:, None] >= self.min_age))
+                & (np.isposinf(self.max_age) | (age[:, None] <= self.max_age))
+            )
+            income_ok = (
+                ~self.income_limited
+                | (income[:, None] <= self.income_cap)
+                | (in_group @ self.groups.T > 0)
+            )
+        return targeted & ~excluded & age_ok & income_ok, sorted(unknown)
+
+
+_lock = threading.Lock()
+_compiled: Optional[CompiledCatalogue] = None
+_compiled_key: Optional[Tuple[str, int]] = None
+
+
+def _catalogue_path() -> Optional[str]:
+    for path in CATALOGUE_PATHS:
+        if os.path.exists(path):
+            return os.path.abspath(path)
+    return None
+
+
+def catalogue() -> CompiledCatalogue:
+    """The compiled catalogue, recompiled if the scheme file changed since last time."""
+    global _compiled, _compiled_key
+    path = _catalogue_path()
+    key = (path, os.stat(path).st_mtime_ns) if path else (None, 0)
+    if key == _compiled_key and _compiled is not None:
+        return _compiled
+    with _lock:
+        if key != _compiled_key or _compiled is None:
+            schemes = []
+            if path:
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        schemes = json.load(f)
+                except Exception as e:
+                    print("⚠️ Scheme catalogue load failed, eligibility has no schemes:", str(e))
+            _compiled, _compiled_key = CompiledCatalogue(schemes), key
+    return _compiled
+
+
+def eligible_schemes(profiles: List[Dict]) -> Dict:
+    """Eligible scheme ids for each profile, evaluated against the whole catalogue at once."""
+    compiled = catalogue()
+    matrix, unknown = compiled.evaluate(profiles)
+    ids = [s["scheme_id"] for s in compiled.schemes]
+    return {
+        "schemes": {s["scheme_id"]: s["name"] for s in compiled.schemes},
+        "results": [
+            {"eligible": [ids[j] for j in np.flatnonzero(row)]}
+            for row in matrix
+        ],
+        "unknown_tags": unknown,
+    }
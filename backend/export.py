@@ -0,0 +1,204 @@
+"""
+Civisense Export
+================
+Constant-memory dumps of the complaints table, and optionally the
+archive (`include_archived`: complaints moved out by archive.py, merged
+in id order).
+
+- stream_export() yields CSV or NDJSON bytes (optionally gzip-compressed)
+  from a server-side cursor, for `GET /export` via StreamingResponse.
+- write_parquet() writes a columnar snapshot in fixed-size row groups
+  (CLI only, needs the optional `pyarrow` package).
+
+Run manually with:  python export.py --format parquet --out complaints.parquet [--tenant chennai]
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import func, select, union_all
+
+from db import ArchivedComplaint, Complaint, SessionLocal
+
+
+EXPORT_COLUMNS = [
+    "id", "text", "area", "area_id", "category", "confidence", "urgency",
+    "population_impact", "vulnerability", "priority_score", "scheme", "status", "timestamp",
+]
+CHUNK_SIZE = 2000
+
+
+def _ensure_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise ImportError("pyarrow package is required for Parquet export. Install with: pip install pyarrow")
+
+
+def _select(
+    model,
+    area_id: Optional[int] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    stmt = select(*(getattr(model, c) for c in EXPORT_COLUMNS))
+    if area_id is not None:
+        stmt = stmt.where(model.area_id == area_id)
+    if category:
+        stmt = stmt.where(model.category == category)
+    if status:
+        stmt = stmt.where(func.lower(model.status) == status.lower())
+    if since:
+        stmt = stmt.where(model.timestamp >= since)
+    if until:
+        stmt = stmt.where(model.timestamp < until)
+    return stmt
+
+
+def _query(include_archived: bool = False, **filters):
+    if not include_archived:
+        return _select(Complaint, **filters).order_by(Complaint.id)
+    # Archived ids are never reused, so the union has one row per complaint.
+    rows = union_all(_select(Complaint, **filters), _select(ArchivedComplaint, **filters)).subquery()
+    return select(*(rows.c[c] for c in EXPORT_COLUMNS)).order_by(rows.c.id)
+
+
+def iter_row_chunks(chunk_size: int = CHUNK_SIZE, **filters) -> Iterator[list]:
+    """
+    Yield lists of up to `chunk_size` rows from a server-side cursor.
+
+    Opens its own session: a streamed response outlives the request's
+    dependency-managed session.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            _query(**filters).execution_options(stream_results=True, yield_per=chunk_size)
+        )
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _csv_chunks(chunks: Iterator[list]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():  # header only: no rows matched
+        yield buf.getvalue().encode("utf-8")
+
+
+def _ndjson_chunks(chunks: Iterator[list]) -> Iterator[bytes]:
+    for rows in chunks:
+        lines = [
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str, ensure_ascii=False)
+            for row in rows
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def stream_export(fmt: str = "csv", gzip: bool = False, **filters) -> Iterator[bytes]:
+    """Bytes of a CSV or NDJSON export, produced chunk by chunk."""
+    if fmt == "csv":
+        body = _csv_chunks(iter_row_chunks(**filters))
+    elif fmt == "ndjson":
+        body = _ndjson_chunks(iter_row_chunks(**filters))
+    else:
+        raise ValueError("format must be 'csv' or 'ndjson'")
+    return _gzip(body) if gzip else body
+
+
+def write_parquet(path: str, row_group_size: int = 100_000, **filters) -> int:
+    """Write a Parquet snapshot one row group at a time. Returns rows written."""
+    pa = _ensure_pyarrow()
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("text", pa.string()),
+        ("area", pa.string()),
+        ("area_id", pa.int64()),
+        ("category", pa.string()),
+        ("confidence", pa.float64()),
+        ("urgency", pa.float64()),
+        ("population_impact", pa.float64()),
+        ("vulnerability", pa.float64()),
+        ("priority_score", pa.float64()),
+        ("scheme", pa.string()),
+        ("status", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+    written = 0
+    with pa.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+        for rows in iter_row_chunks(chunk_size=row_group_size, **filters):
+            columns = list(zip(*rows))
+            table = pa.Table.from_arrays(
+                [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                schema=schema,
+            )
+            writer.write_table(table)
+            written += len(rows)
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from tenancy import add_tenant_argument, cli_tenant_context
+
+    parser = argparse.ArgumentParser(description="Export Civisense complaints.")
+    parser.add_argument("--format", choices=["csv", "ndjson", "parquet"], default="parquet")
+    parser.add_argument("--out", required=True, help="Output file ('-' for stdout, csv/ndjson only).")
+    parser.add_argument("--category")
+    parser.add_argument("--status")
+    parser.add_argument("--since", type=datetime.fromisoformat)
+    parser.add_argument("--until", type=datetime.fromisoformat)
+    parser.add_argument("--gzip", action="store_true", help="gzip csv/ndjson output.")
+    parser.add_argument(
+        "--include-archived", action="store_true",
+        help="Also export complaints moved to complaints_archive (left out by default).",
+    )
+    parser.add_argument("--row-group-size", type=int, default=100_000)
+    add_tenant_argument(parser)
+    args = parser.parse_args()
+
+    filters = dict(
+        category=args.category, status=args.status, since=args.since, until=args.until,
+        include_archived=args.include_archived,
+    )
+
+    with cli_tenant_context(parser, args.tenant):
+        if args.format == "parquet":
+            n = write_parquet(args.out, row_group_size=args.row_group_size, **filters)
+            print(f"✅ Wrote {n} complaints to {args.out}")
+        else:
+            out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+            try:
+                for chunk in stream_export(args.format, gzip=args.gzip, **filters):
+                    out.write(chunk)
+            finally:
+                if out is not sys.stdout.buffer:
+                    out.close()
@@ -11,6 +11,7 @@ Falls back gracefully if Gemini is unavailable.
 import json
 import os
 import re
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
 # ---------------------------------------------------------------------------
@@ -49,16 +50,18 @@ def _load_schemes() -> list:
     return []
 
 
-SCHEMES_DATA = _load_schemes()
-
-
-def _build_schemes_context() -> str:
-    """Format schemes into a concise context string for the prompt."""
-    if not SCHEMES_DATA:
+@lru_cache(maxsize=1)
+def schemes_context() -> str:
+    """
+    Format schemes into a concise context string for the prompt.
+    Built on first use rather than at import, to keep cold starts short.
+    """
+    schemes = _load_schemes()
+    if not schemes:
         return "No welfare scheme data available."
 
     lines = []
-    for s in SCHEMES_DATA:
+    for s in schemes:
         sid = s.get("scheme_id", "N/A")
         name = s.get("name", "Unknown")
         desc = s.get("description", "")
@@ -77,9 +80,6 @@ def _build_schemes_context() -> str:
     return "\n".join(lines)
 
 
-SCHEMES_CONTEXT = _build_schemes_context()
-
-
 # ---------------------------------------------------------------------------
 # System Prompt
 # ---------------------------------------------------------------------------
@@ -112,14 +112,19 @@ RESPOND WITH ONLY A VALID JSON OBJECT, no markdown, no extra text."""
 class GeminiEngine:
     """Gemini-powered AI engine for civic grievance analysis."""
 
-    def __init__(self):
+    def __init__(self, system_prompt: Optional[str] = None, model: Optional[str] = None):
+        """
+        `system_prompt` overrides SYSTEM_PROMPT (e.g. a candidate prompt
+        evaluated in shadow mode); it may contain a {schemes} placeholder.
+        """
         genai = _ensure_genai()
         api_key = os.getenv("GEMINI_API_KEY", "")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is not set")
 
         self.client = genai.Client(api_key=api_key)
-        self.model = "gemini-2.0-flash"
+        self.model = model or "gemini-2.0-flash"
+        self.system_prompt = system_prompt or SYSTEM_PROMPT
         self.available = True
         print("✅ Gemini AI engine initialised successfully")
 
@@ -156,7 +161,7 @@ class GeminiEngine:
 
         user_message = "\n".join(user_parts)
 
-        system = SYSTEM_PROMPT.format(schemes=SCHEMES_CONTEXT)
+        system = self.system_prompt.replace("{schemes}", schemes_context())
 
         try:
             response = self.client.models.generate_content(
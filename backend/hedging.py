@@ -0,0 +1,141 @@
+"""
+Civisense Hedged Analysis
+=========================
+Keeps intake latency bounded by an SLA instead of by Gemini's long tail.
+
+- submit() starts the Gemini analysis on a small thread pool while the
+  request computes the local (sklearn + rules) analysis.
+- wait() gives Gemini until the SLA (measured from submit) to answer;
+  after that the caller persists the local result.
+- on_late() hands a Gemini answer that arrives after the SLA to a
+  callback (run on the pool), which applies it to the stored complaint.
+- The SLA adapts to observed Gemini latency: max(EWMA, p-th percentile
+  of the last HEDGE_WINDOW calls), clamped to [HEDGE_SLA_MIN_MS,
+  HEDGE_SLA_MAX_MS]. Until HEDGE_MIN_SAMPLES calls have been seen, the
+  fixed HEDGE_SLA_MS is used.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Optional
+
+
+GEMINI_HEDGED = os.getenv("GEMINI_HEDGED", "1").lower() in ("1", "true", "yes")
+HEDGE_SLA_MS = float(os.getenv("HEDGE_SLA_MS", "2000"))
+HEDGE_SLA_MIN_MS = float(os.getenv("HEDGE_SLA_MIN_MS", "300"))
+HEDGE_SLA_MAX_MS = float(os.getenv("HEDGE_SLA_MAX_MS", "4000"))
+HEDGE_SLA_PERCENTILE = float(os.getenv("HEDGE_SLA_PERCENTILE", "0.9"))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", "8"))
+HEDGE_WINDOW = 500
+HEDGE_MIN_SAMPLES = 20
+EWMA_ALPHA = 0.1
+
+
+class LatencyTracker:
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: deque = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+            self.ewma = ms if self.ewma is None else EWMA_ALPHA * ms + (1 - EWMA_ALPHA) * self.ewma
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._samples)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def sla_ms(self) -> float:
+        if len(self) < HEDGE_MIN_SAMPLES:
+            return HEDGE_SLA_MS
+        target = max(self.ewma or 0.0, self.percentile(HEDGE_SLA_PERCENTILE) or 0.0)
+        return min(HEDGE_SLA_MAX_MS, max(HEDGE_SLA_MIN_MS, target))
+
+
+class HedgedGemini:
+    def __init__(self, nlp_engine, workers: int = HEDGE_WORKERS):
+        self.nlp = nlp_engine
+        self.latency = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini-hedge")
+        self._counts = Counter()
+        self._counts_lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self._counts_lock:
+            self._counts[key] += 1
+
+    def _call(self, text: str, area: Optional[str], flags: Optional[dict]) -> Optional[Dict]:
+        started = time.perf_counter()
+        try:
+            return self.nlp.analyze_with_gemini(text=text, area=area, vulnerability_flags=flags)
+        finally:
+            self.latency.record((time.perf_counter() - started) * 1000.0)
+
+    def submit(self, text: str, area: Optional[str], flags: Optional[dict]) -> Future:
+        future = self._executor.submit(self._call, text, area, flags)
+        future.deadline = time.monotonic() + self.latency.sla_ms() / 1000.0
+        return future
+
+    def wait(self, future: Future) -> Optional[Dict]:
+        """Gemini's result if it arrives within the SLA, else None (keep the local result)."""
+        try:
+            result = future.result(timeout=max(0.0, future.deadline - time.monotonic()))
+        except TimeoutError:
+            self.count("local_after_sla")
+            return None
+        self.count("gemini" if result else "gemini_failed")
+        return result
+
+    def on_late(self, future: Future, callback: Callable[[Dict], bool]) -> None:
+        """Run `callback(result)` on the pool once a late Gemini answer arrives."""
+        context = contextvars.copy_context()  # e.g. the request's tenant
+
+        def _done(f: Future) -> None:
+            if f.cancelled() or f.exception() is not None or not f.result():
+                self.count("late_failed")
+                return
+            try:
+                self._executor.submit(context.run, self._apply, callback, f.result())
+            except RuntimeError:  # shutting down
+                pass
+
+        future.add_done_callback(_done)
+
+    def _apply(self, callback: Callable[[Dict], bool], result: Dict) -> None:
+        try:
+            applied = callback(result)
+            self.count("upgraded" if applied else "upgrade_skipped")
+        except Exception as e:
+            print("⚠️ Late Gemini upgrade failed:", e)
+            self.count("upgrade_failed")
+
+    def stats(self) -> dict:
+        with self._counts_lock:
+            counts = dict(self._counts)
+        def _ms(value: Optional[float]) -> Optional[float]:
+            return round(value, 1) if value is not None else None
+
+        return {
+            "enabled": GEMINI_HEDGED,
+            "sla_ms": round(self.latency.sla_ms(), 1),
+            "ewma_ms": _ms(self.latency.ewma),
+            "p50_ms": _ms(self.latency.percentile(0.5)),
+            "p90_ms": _ms(self.latency.percentile(0.9)),
+            "p99_ms": _ms(self.latency.percentile(0.99)),
+            "samples": len(self.latency),
+            "outcomes": counts,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,250 @@
+"""
+Civisense Hotspot Detector
+==========================
+Streaming counts of recent complaints per (area, category), so spikes
+such as "30 water complaints in Ward 12 within an hour" are spotted on
+intake without grouped COUNTs over the complaints table.
+
+- Each (area, category) has a ring buffer of HOTSPOT_BUCKET_MINUTES
+  buckets covering HOTSPOT_BASELINE_HOURS. A bucket is reset lazily the
+  first time its slot is reused, so record() is O(1).
+- The spike score compares the last HOTSPOT_WINDOW_MINUTES with the
+  average window over the rest of the baseline, as a Poisson z-score:
+  (current - expected) / sqrt(expected + 1). A cohort is a hotspot when
+  it has at least HOTSPOT_MIN_COUNT complaints in the window and
+  z >= HOTSPOT_Z.
+- spike() maps that to [0, 1] (0.5 at the hotspot threshold) for the
+  urgency boost in priority.apply_spike().
+- rebuild() reloads the buffers from the complaints of the last baseline
+  period: at startup, and every HOTSPOT_RESYNC_SECONDS, so pre-forked
+  workers also see each other's intake. The resync defaults to 30 s under
+  serve.py with several workers and is off in a single process.
+"""
+
+import contextvars
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from db import Complaint
+from startup import worker_index
+from tenancy import TenantLocal
+
+
+HOTSPOT_BUCKET_MINUTES = int(os.getenv("HOTSPOT_BUCKET_MINUTES", "5"))
+HOTSPOT_WINDOW_MINUTES = int(os.getenv("HOTSPOT_WINDOW_MINUTES", "60"))
+HOTSPOT_BASELINE_HOURS = int(os.getenv("HOTSPOT_BASELINE_HOURS", "24"))
+HOTSPOT_MIN_COUNT = int(os.getenv("HOTSPOT_MIN_COUNT", "10"))
+HOTSPOT_Z = float(os.getenv("HOTSPOT_Z", "3"))
+HOTSPOT_RESYNC_SECONDS = os.getenv("HOTSPOT_RESYNC_SECONDS")  # 0 disables; default depends on serve.py
+MULTI_WORKER_RESYNC_SECONDS = 30.0
+
+
+def resync_interval() -> float:
+    """HOTSPOT_RESYNC_SECONDS if set, else 30 s in a serve.py worker and 0 otherwise."""
+    if HOTSPOT_RESYNC_SECONDS:
+        return float(HOTSPOT_RESYNC_SECONDS)
+    return MULTI_WORKER_RESYNC_SECONDS if worker_index() is not None else 0.0
+
+
+_EPOCH = datetime(1970, 1, 1)
+_Key = Tuple[object, str]
+
+
+def _bucket_of(ts: datetime, bucket_seconds: int) -> int:
+    return int((ts - _EPOCH).total_seconds()) // bucket_seconds
+
+
+class _Ring:
+    __slots__ = ("counts", "stamps")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.stamps = [-1] * size  # bucket number each slot currently holds
+
+    def add(self, bucket: int, n: int = 1) -> None:
+        slot = bucket % len(self.counts)
+        if self.stamps[slot] != bucket:
+            self.stamps[slot] = bucket
+            self.counts[slot] = 0
+        self.counts[slot] += n
+
+    def total(self, first: int, last: int) -> int:
+        """Complaints in buckets first..last (inclusive)."""
+        size = len(self.counts)
+        return sum(
+            self.counts[b % size] for b in range(max(first, last - size + 1), last + 1)
+            if self.stamps[b % size] == b
+        )
+
+
+class HotspotDetector:
+    def __init__(
+        self,
+        bucket_minutes: int = HOTSPOT_BUCKET_MINUTES,
+        window_minutes: int = HOTSPOT_WINDOW_MINUTES,
+        baseline_hours: int = HOTSPOT_BASELINE_HOURS,
+    ):
+        self.bucket_seconds = bucket_minutes * 60
+        self.window_buckets = max(1, window_minutes // bucket_minutes)
+        self.size = max(self.window_buckets + 1, baseline_hours * 60 // bucket_minutes)
+        self._lock = threading.Lock()
+        self._rings: Dict[_Key, _Ring] = {}
+        self._names: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def area_key(area: Optional[str], area_id: Optional[int]) -> object:
+        if area_id is not None:
+            return area_id
+        return (area or "").strip().lower() or None
+
+    def _now_bucket(self, now: Optional[datetime] = None) -> int:
+        return _bucket_of(now or datetime.utcnow(), self.bucket_seconds)
+
+    # ---------- UPDATES ----------
+
+    def record(
+        self,
+        area: Optional[str],
+        category: Optional[str],
+        area_id: Optional[int] = None,
+        ts: Optional[datetime] = None,
+    ) -> None:
+        key = self.area_key(area, area_id)
+        if key is None or not category:
+            return
+        bucket = self._now_bucket(ts)
+        with self._lock:
+            ring = self._rings.get((key, category))
+            if ring is None:
+                ring = self._rings[(key, category)] = _Ring(self.size)
+            ring.add(bucket)
+            if area:
+                self._names.setdefault(key, area)
+
+    def rebuild(self, db: Session, chunk_size: int = 5000) -> int:
+        """Replace the buffers with counts of the complaints in the baseline period."""
+        now = datetime.utcnow()
+        since = now - timedelta(seconds=self.size * self.bucket_seconds)
+        rings: Dict[_Key, _Ring] = {}
+        names: Dict[object, str] = {}
+        loaded = 0
+
+        rows = (
+            db.query(Complaint.area, Complaint.area_id, Complaint.category, Complaint.timestamp)
+            .filter(Complaint.timestamp >= since)
+            .yield_per(chunk_size)
+        )
+        for area, area_id, category, ts in rows:
+            key = self.area_key(area, area_id)
+            if key is None or not category or ts is None:
+                continue
+            ring = rings.get((key, category))
+            if ring is None:
+                ring = rings[(key, category)] = _Ring(self.size)
+            ring.add(_bucket_of(min(ts, now), self.bucket_seconds))
+            if area:
+                names.setdefault(key, area)
+            loaded += 1
+
+        with self._lock:
+            self._rings = rings
+            self._names.update(names)
+        return loaded
+
+    # ---------- SCORING ----------
+
+    def _score(self, ring: _Ring, now_bucket: int, pending: int = 0) -> Tuple[int, float, float]:
+        """(count in window, expected count per window, z-score)."""
+        window_start = now_bucket - self.window_buckets + 1
+        current = ring.total(window_start, now_bucket) + pending
+        history = ring.total(now_bucket - self.size + 1, window_start - 1)
+        expected = history / ((self.size - self.window_buckets) / self.window_buckets)
+        return current, expected, (current - expected) / math.sqrt(expected + 1.0)
+
+    def spike(
+        self,
+        area: Optional[str],
+        category: Optional[str],
+        area_id: Optional[int] = None,
+        pending: int = 1,
+    ) -> float:
+        """
+        Spike score in [0, 1] for a cohort, counting `pending` complaints
+        not recorded yet (the one being scored). 0.5 at the hotspot threshold.
+        """
+        key = self.area_key(area, area_id)
+        if key is None or not category:
+            return 0.0
+        with self._lock:
+            ring = self._rings.get((key, category))
+            if ring is None:
+                return 0.0
+            current, _, z = self._score(ring, self._now_bucket(), pending)
+        if current < HOTSPOT_MIN_COUNT or z <= 0:
+            return 0.0
+        return min(1.0, z / (2.0 * HOTSPOT_Z))
+
+    def hotspots(self, min_z: float = HOTSPOT_Z, min_count: int = HOTSPOT_MIN_COUNT, limit: int = 50) -> List[dict]:
+        now_bucket = self._now_bucket()
+        found = []
+        with self._lock:
+            for (key, category), ring in list(self._rings.items()):
+                current, expected, z = self._score(ring, now_bucket)
+                if current == 0 and ring.total(now_bucket - self.size + 1, now_bucket) == 0:
+                    del self._rings[(key, category)]  # nothing left in the baseline
+                    continue
+                if current >= min_count and z >= min_z:
+                    found.append({
+                        "area": self._names.get(key, key),
+                        "area_id": key if isinstance(key, int) else None,
+                        "category": category,
+                        "count": current,
+                        "expected": round(expected, 2),
+                        "z_score": round(z, 2),
+                        "spike": round(min(1.0, z / (2.0 * HOTSPOT_Z)), 3),
+                    })
+        found.sort(key=lambda h: -h["z_score"])
+        return found[:limit]
+
+    def settings(self) -> dict:
+        return {
+            "bucket_minutes": self.bucket_seconds // 60,
+            "window_minutes": self.window_buckets * self.bucket_seconds // 60,
+            "baseline_hours": self.size * self.bucket_seconds / 3600,
+            "cohorts_tracked": len(self._rings),
+        }
+
+    # ---------- BACKGROUND RESYNC ----------
+
+    def start(self, session_factory, interval: Optional[float] = None) -> None:
+        interval = resync_interval() if interval is None else interval
+        if interval <= 0 or self._thread is not None:
+            return
+
+        def _loop():
+            while not self._stop.wait(interval):
+                db = session_factory()
+                try:
+                    self.rebuild(db)
+                except Exception as e:
+                    print("⚠️ Hotspot resync failed:", e)
+                finally:
+                    db.close()
+
+        # Run in the caller's context, so the loop reads the right tenant's database.
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(target=context.run, args=(_loop,), name="hotspot-resync", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+hotspot_detector = TenantLocal(HotspotDetector)  # one per tenant
@@ -0,0 +1,243 @@
+"""
+Civisense Idempotency
+=====================
+`Idempotency-Key` support for POST /complaint, so client retries neither
+create duplicate rows nor pay for a second Gemini analysis.
+
+- The first request with a key claims it by inserting a row with an empty
+  response; the primary key makes the claim atomic across workers.
+- When it finishes, the response is stored in the row (kept for
+  IDEMPOTENCY_TTL_HOURS) in the same transaction as the complaint, and in
+  a bounded in-memory map; replays are answered from either without
+  re-running the pipeline.
+- A duplicate arriving while the original is in flight waits for it: on
+  an in-process event if the owner is local, by polling the row otherwise.
+  Claims left behind by a crashed request go stale after
+  IDEMPOTENCY_IN_FLIGHT_TIMEOUT seconds and can be taken over.
+- Reusing a key with a different request body is rejected.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from db import IdempotencyKey
+
+
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+IDEMPOTENCY_IN_FLIGHT_TIMEOUT = float(os.getenv("IDEMPOTENCY_IN_FLIGHT_TIMEOUT", "60"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1
+PURGE_EVERY = 1000  # claims between purges of expired rows
+
+
+class IdempotencyConflict(Exception):
+    """The original request with this key is still running."""
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used with a different request body."""
+
+
+def fingerprint(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, session_factory: Callable[[], Session], cache_size: int = IDEMPOTENCY_CACHE_SIZE):
+        self.session_factory = session_factory
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        # key -> (expires_at, fingerprint, response), least recently used first
+        self._cache: "OrderedDict[str, Tuple[datetime, str, dict]]" = OrderedDict()
+        # key -> event set when the local request owning the key finishes
+        self._in_flight: Dict[str, threading.Event] = {}
+        self._claims = 0
+
+    # ---------- MEMORY ----------
+
+    def _cached(self, key: str, fp: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= datetime.utcnow():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+        if entry[1] != fp:
+            raise IdempotencyKeyReused("Idempotency-Key was already used with a different request body")
+        return entry[2]
+
+    def _remember(self, key: str, expires_at: datetime, fp: str, response: dict) -> None:
+        with self._lock:
+            self._cache[key] = (expires_at, fp, response)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ---------- DATABASE ----------
+
+    def _try_claim(self, db: Session, key: str, fp: str) -> Tuple[bool, Optional[IdempotencyKey]]:
+        """Insert the claim row. Returns (claimed, existing row if not)."""
+        now = datetime.utcnow()
+        db.add(IdempotencyKey(
+            key=key,
+            fingerprint=fp,
+            created_at=now,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+        ))
+        try:
+            db.commit()
+            return True, None
+        except IntegrityError:
+            db.rollback()
+
+        row = db.get(IdempotencyKey, key, populate_existing=True)
+        if row is None:  # expired row purged in between
+            return self._try_claim(db, key, fp)
+
+        if row.expires_at <= now or (
+            row.response is None
+            and row.created_at <= now - timedelta(seconds=IDEMPOTENCY_IN_FLIGHT_TIMEOUT)
+        ):
+            # Expired, or abandoned by a crashed request: take it over, but
+            # only if nobody else did first.
+            taken = db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key, IdempotencyKey.created_at == row.created_at)
+                .values(
+                    fingerprint=fp,
+                    response=None,
+                    complaint_id=None,
+                    created_at=now,
+                    expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if taken:
+                return True, None
+            row = db.get(IdempotencyKey, key, populate_existing=True)
+        return False, row
+
+    def purge_expired(self, db: Session) -> int:
+        result = db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.expires_at <= datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount or 0
+
+    # ---------- PROTOCOL ----------
+
+    def begin(self, key: str, payload: dict) -> Optional[dict]:
+        """
+        Claim `key` for this request, or return the stored response of the
+        request that already used it (waiting for it if still in flight).
+
+        Returns None when the caller owns the key and must call complete()
+        or abandon().
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        fp = fingerprint(payload)
+        deadline = time.monotonic() + IDEMPOTENCY_IN_FLIGHT_TIMEOUT
+
+        while True:
+            cached = self._cached(key, fp)
+            if cached is not None:
+                return cached
+
+            with self._lock:
+                event = self._in_flight.get(key)
+                if event is None:
+                    self._in_flight[key] = threading.Event()
+            if event is not None:
+                # The original is running in this process: wait for its result.
+                if not event.wait(max(0.0, deadline - time.monotonic())):
+                    raise IdempotencyConflict("The original request with this Idempotency-Key is still in progress")
+                continue
+
+            try:
+                response = self._claim_or_wait(key, fp, deadline)
+            except BaseException:
+                self._release(key)
+                raise
+            if response is not None:
+                self._release(key)
+            return response
+
+    def _claim_or_wait(self, key: str, fp: str, deadline: float) -> Optional[dict]:
+        db = self.session_factory()
+        try:
+            self._claims += 1
+            if self._claims % PURGE_EVERY == 0:
+                self.purge_expired(db)
+
+            while True:
+                claimed, row = self._try_claim(db, key, fp)
+                if claimed:
+                    return None
+                if row.fingerprint != fp:
+                    raise IdempotencyKeyReused("Idempotency-Key was already used with a different request body")
+                if row.response is not None:
+                    response = json.loads(row.response)
+                    self._remember(key, row.expires_at, fp, response)
+                    return response
+                # In flight in another worker: poll its row.
+                if time.monotonic() >= deadline:
+                    raise IdempotencyConflict("The original request with this Idempotency-Key is still in progress")
+                time.sleep(POLL_INTERVAL)
+        finally:
+            db.close()
+
+    def _release(self, key: str) -> None:
+        with self._lock:
+            event = self._in_flight.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def record(self, db: Session, key: str, complaint_id: int, response: dict) -> None:
+        """Store the owner's response in `db`'s transaction (caller commits, then calls complete())."""
+        db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == key)
+            .values(
+                complaint_id=complaint_id,
+                response=json.dumps(response, default=str),
+                expires_at=datetime.utcnow() + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def complete(self, key: str, payload: dict, response: dict) -> None:
+        """Remember the committed response and wake up any waiting duplicates."""
+        expires_at = datetime.utcnow() + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+        self._remember(key, expires_at, fingerprint(payload), response)
+        self._release(key)
+
+    def abandon(self, key: str) -> None:
+        """The owner failed: drop the claim so a retry can run the pipeline."""
+        db = self.session_factory()
+        try:
+            db.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.key == key, IdempotencyKey.response.is_(None))
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        finally:
+            db.close()
+        self._release(key)
@@ -1,18 +1,59 @@
+# Imported first so the startup report can time every import below.
+from startup import subsystems
+
 import os
+import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from db import Complaint, Feedback, create_all, get_db
+from admission import gemini_admission, lane_for
+from areas import LEVELS, area_registry, backfill_area_ids, rollup
+from archive import archive_resolved, archived_counts, archived_total, query_archive
+from changes import (
+    CHANGES_HEARTBEAT_SECONDS,
+    CHANGES_MAX_LIMIT,
+    CHANGES_MAX_WAIT_SECONDS,
+    CHANGES_POLL_SECONDS,
+    CursorExpired,
+    change_feed,
+    log_change,
+    prune as prune_changes,
+    read_changes,
+    sse_event,
+)
+from complaint_cache import compact_explanation, complaint_cache, render, with_notes
+from db import ArchivedComplaint, Complaint, Feedback, SessionLocal, create_all, get_db
+from export import stream_export
+from hedging import GEMINI_HEDGED, HedgedGemini
+from hotspots import hotspot_detector
+from idempotency import IdempotencyConflict, IdempotencyKeyReused, IdempotencyStore
 from nlp import NLPEngine
-from priority import evaluate_complaint
-from schemes import map_scheme
+from online_learning import OnlineLearner
+from priority import apply_spike, evaluate_complaint, priority_weights, rescore_cohort
+from responses import dumps, json_response, truncate
+from rollups import (
+    backfill as backfill_rollups,
+    has_source_rows,
+    is_empty as rollups_empty,
+    record_change,
+    record_created,
+    timeseries,
+)
+from schemes import map_scheme, metadata_from_flags
+from search import install_search_index, search_complaints
+from shadow import ShadowRunner, summary as shadow_summary
+from tamil import TAMIL_LOCAL_ONLY, tamil_category
+from task_queue import ANY, is_queued_status, task_queue
+from tenancy import DEFAULT_TENANT, TenantBusy, TenantLocal, UnknownTenant, current_tenant, tenant_context, tenants
 
 
 load_dotenv()
@@ -44,7 +85,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-nlp_engine = NLPEngine()
+# Model and Gemini client are loaded in the background after startup.
+nlp_engine = NLPEngine(lazy=True)
+online_learner = OnlineLearner(nlp_engine)
+idempotency = TenantLocal(lambda: IdempotencyStore(SessionLocal))
+hedged_gemini = HedgedGemini(nlp_engine)
+
+# Requests (other than health checks) wait for these startup tasks.
+REQUEST_DEPENDENCIES = ("database", "task_queue")
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "30"))
+_NO_WAIT_PATHS = {"/", "/health", "/ready", "/startup", "/workers", "/tenants", "/docs", "/openapi.json"}
+# Long-poll / SSE requests mostly sit idle, so they do not count against a tenant's in-flight cap.
+_LONG_LIVED_PATHS = {"/changes", "/changes/stream"}
+
+
+@app.middleware("http")
+async def route_tenant(request: Request, call_next):
+    """Run the request in its tenant's context, initialising the tenant on first use."""
+    if request.url.path in _NO_WAIT_PATHS:
+        return await call_next(request)
+    bounded = request.url.path not in _LONG_LIVED_PATHS
+    try:
+        tenant = tenants.resolve(request.headers)
+        if bounded:
+            tenants.enter(tenant)
+    except UnknownTenant as e:
+        return JSONResponse(status_code=404, content={"detail": str(e)})
+    except TenantBusy as e:
+        return JSONResponse(status_code=503, content={"detail": str(e)}, headers={"Retry-After": "1"})
+    try:
+        with tenant_context(tenant):
+            if tenant != DEFAULT_TENANT:  # the default tenant is set up by the startup tasks
+                await run_in_threadpool(tenants.ensure_initialised, tenant)
+            return await call_next(request)
+    finally:
+        if bounded:
+            tenants.leave(tenant)
+
+
+@app.middleware("http")
+async def wait_for_startup(request: Request, call_next):
+    if request.url.path not in _NO_WAIT_PATHS and not subsystems.is_done(REQUEST_DEPENDENCIES):
+        await run_in_threadpool(subsystems.wait, REQUEST_DEPENDENCIES, STARTUP_WAIT_TIMEOUT)
+    return await call_next(request)
 
 
 class ComplaintIn(BaseModel):
@@ -81,6 +164,40 @@ class FeedbackIn(BaseModel):
     notes: Optional[str] = None
 
 
+class AreaIn(BaseModel):
+    name: str = Field(..., description="Canonical area name.")
+    level: str = Field(default="ward", description="One of ward, zone, district.")
+    parent_id: Optional[int] = Field(None, description="Id of the enclosing zone / district.")
+
+
+class QueueClaim(BaseModel):
+    area: Optional[str] = Field(None, description="Only claim complaints from this area.")
+    category: Optional[str] = Field(None, description="Only claim complaints of this category.")
+
+
+class PriorityWeightsIn(BaseModel):
+    weights: Dict[str, float] = Field(
+        ..., description="Any of urgency, population_impact, vulnerability, confidence; normalised to sum to 1."
+    )
+    open_only: bool = Field(default=True, description="Only consider complaints that are not resolved/closed.")
+    top_k: int = Field(default=50, ge=1, le=10000, description="Queue head size for overlap statistics.")
+
+
+class CitizenProfile(BaseModel):
+    age: Optional[int] = Field(None, ge=0, le=130)
+    gender: Optional[str] = Field(None, description="female / male / other.")
+    annual_income: Optional[float] = Field(None, ge=0, description="Yearly household income in rupees.")
+    income_group: Optional[str] = Field(None, description="bpl, apl, ews, lig, mig, ...")
+    residence: Optional[str] = Field(None, description="urban or rural.")
+    tags: List[str] = Field(
+        default=[], description="Rule names from data/schemes.json that apply, e.g. street_vendor, income_tax_payer."
+    )
+
+
+class EligibilityIn(BaseModel):
+    profiles: List[CitizenProfile] = Field(..., min_length=1, description="One or many citizen profiles.")
+
+
 class DashboardMetric(BaseModel):
     total_complaints: int
     by_status: dict
@@ -89,147 +206,350 @@ class DashboardMetric(BaseModel):
     recent_high_priority: List[dict]
 
 
-@app.on_event("startup")
-def on_startup() -> None:
+# ----------------------------
+# STARTUP TASKS (run in parallel after the port is bound)
+# ----------------------------
+@subsystems.task("database")
+@tenants.initializer
+def init_database() -> None:
     # Ensure DB schema exists
     create_all()
+    install_search_index(tenants.engine())
+
+
+@subsystems.task("idempotency", after=("database",), required=False)
+@tenants.initializer(required=False)
+def init_idempotency() -> None:
+    db = SessionLocal()
+    try:
+        idempotency.purge_expired(db)
+    finally:
+        db.close()
+
+
+@subsystems.task("task_queue", after=("database",))
+@tenants.initializer
+def init_task_queue() -> None:
+    db = SessionLocal()
+    try:
+        backfill_area_ids(db)
+        task_queue.rebuild(db)
+    finally:
+        db.close()
+
+
+@subsystems.task("hotspots", after=("task_queue",), required=False)
+@tenants.initializer(required=False)
+def init_hotspots() -> None:
+    db = SessionLocal()
+    try:
+        hotspot_detector.rebuild(db)
+    finally:
+        db.close()
+    hotspot_detector.start(SessionLocal)
+
+
+@subsystems.task("rollups", after=("task_queue",), required=False)
+@tenants.initializer(required=False)
+def init_rollups() -> None:
+    db = SessionLocal()
+    try:
+        if rollups_empty(db) and has_source_rows(db):  # also when everything is archived
+            print("✅ Analytics rollups backfilled:", backfill_rollups(db))
+    finally:
+        db.close()
+
+
+@subsystems.task("model")
+def init_model() -> None:
+    nlp_engine.load_model()
+
+
+@subsystems.task("gemini", required=False)
+def init_gemini() -> None:
+    nlp_engine.load_gemini()
+
+
+@subsystems.task("online_learning", after=("database", "model"))
+def init_online_learning() -> None:
+    online_learner.load()
+    online_learner.start(SessionLocal)
+
+
+@subsystems.task("shadow", after=("database",), required=False)
+def init_shadow() -> None:
+    nlp_engine.shadow = ShadowRunner.from_env(nlp_engine, SessionLocal)
+
+
+@app.on_event("startup")
+def on_startup() -> None:
+    subsystems.on_ready(tenants.mark_initialised)  # the startup tasks set up the default tenant
+    subsystems.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown() -> None:
+    online_learner.stop()
+    hedged_gemini.shutdown()
+    hotspot_detector.stop()
+    if nlp_engine.shadow is not None:
+        nlp_engine.shadow.shutdown()
 
 
 @app.post("/complaint", response_model=ComplaintOut)
-def create_complaint(payload: ComplaintIn, db: Session = Depends(get_db)) -> ComplaintOut:
-    # =====================================================
-    # STRATEGY: Try Gemini first (unified AI), fallback to
-    # existing sklearn + rules pipeline if Gemini fails.
-    # =====================================================
+def create_complaint(
+    payload: ComplaintIn,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db),
+) -> ComplaintOut:
+    """
+    With an `Idempotency-Key` header, retries of the same request return the
+    original result instead of creating (and analysing) a new complaint.
+    """
+    client_id = request.headers.get("X-Client-Id") or (request.client.host if request.client else None)
+    if not idempotency_key:
+        return _create_complaint(payload, db, client_id)
+
+    body = payload.model_dump()
+    try:
+        stored = idempotency.begin(idempotency_key, body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if stored is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+        return ComplaintOut(**stored)
+
+    try:
+        out = _create_complaint(payload, db, client_id, idempotency_key)
+    except BaseException:
+        db.rollback()  # release the complaint's write lock before dropping the claim
+        idempotency.abandon(idempotency_key)
+        raise
+    idempotency.complete(idempotency_key, body, out.model_dump(mode="json"))
+    return out
 
-    gemini_result = nlp_engine.analyze_with_gemini(
-        text=payload.text,
+
+SPIKE_NOTE = " Raised because complaints of this kind are spiking in the area."
+
+
+def _gemini_analysis(gemini_result: dict, spike: float = 0.0) -> dict:
+    """Complaint fields and explanation from a Gemini result."""
+    category = gemini_result["category"]
+    confidence = gemini_result["confidence"]
+    urgency = apply_spike(gemini_result["urgency_score"], spike)
+    population_impact = gemini_result["population_impact"]
+    vulnerability = gemini_result["vulnerability_score"]
+    priority_score = gemini_result["priority_score"] / 100.0  # normalise to 0-1
+    # Shift Gemini's score by the urgency boost alone, as rescore_cohort does for impact.
+    priority_score = min(1.0, priority_score + priority_weights()["urgency"] * (urgency - gemini_result["urgency_score"]))
+    scheme = gemini_result["recommended_scheme"]
+    scheme_reason = gemini_result["scheme_reason"]
+
+    explanation = {
+        "category": {
+            "value": category,
+            "confidence": confidence,
+            "notes": f"Classified by Gemini AI. {gemini_result.get('summary', '')}",
+        },
+        "urgency": {
+            "value": urgency,
+            "notes": gemini_result.get("urgency_reason", "Assessed by Gemini AI.") + (SPIKE_NOTE if spike else ""),
+        },
+        "population_impact": {
+            "value": population_impact,
+            "notes": gemini_result.get("population_reason", "Assessed by Gemini AI."),
+        },
+        "vulnerability": {
+            "value": vulnerability,
+            "notes": gemini_result.get("vulnerability_reason", "Assessed by Gemini AI."),
+        },
+        "priority_score": {
+            "value": priority_score,
+            "notes": f"Priority {gemini_result['priority_score']}/100 — weighted by urgency, impact, and vulnerability.",
+        },
+        "scheme": {
+            "value": scheme,
+            "notes": scheme_reason,
+        },
+    }
+
+    return {
+        "version": "gemini",
+        "category": category,
+        "confidence": confidence,
+        "urgency": urgency,
+        "population_impact": population_impact,
+        "vulnerability": vulnerability,
+        "priority_score": priority_score,
+        "scheme": scheme,
+        "explanation": explanation,
+    }
+
+
+def _local_analysis(payload: ComplaintIn, db: Session, area_id: Optional[int]) -> dict:
+    """Complaint fields and explanation from the sklearn + rules pipeline."""
+    processed_text = nlp_engine.translate_input(payload.text)
+
+    # 1) NLP classification (raw text: the Tamil-script vote needs the original words)
+    category, confidence = nlp_engine.predict_category(payload.text)
+    spike = hotspot_detector.spike(payload.area, category, area_id)
+
+    # 2-4) Priority pipeline
+    urgency, population_impact, vulnerability, priority_score = evaluate_complaint(
+        db=db,
+        text=processed_text,
         area=payload.area,
+        category=category,
+        confidence=confidence,
         vulnerability_flags=payload.vulnerability,
+        area_id=area_id,
+        spike=spike,
     )
 
-    if gemini_result:
-        # ----- GEMINI PATH (primary) -----
-        category = gemini_result["category"]
-        confidence = gemini_result["confidence"]
-        urgency = gemini_result["urgency_score"]
-        population_impact = gemini_result["population_impact"]
-        vulnerability = gemini_result["vulnerability_score"]
-        priority_score = gemini_result["priority_score"] / 100.0  # normalise to 0-1
-        scheme = gemini_result["recommended_scheme"]
-        scheme_reason = gemini_result["scheme_reason"]
+    # 5) Welfare scheme engine
+    metadata = metadata_from_flags(payload.vulnerability)
 
-        explanation = {
-            "category": {
-                "value": category,
-                "confidence": confidence,
-                "notes": f"Classified by Gemini AI. {gemini_result.get('summary', '')}",
-            },
-            "urgency": {
-                "value": urgency,
-                "notes": gemini_result.get("urgency_reason", "Assessed by Gemini AI."),
-            },
-            "population_impact": {
-                "value": population_impact,
-                "notes": gemini_result.get("population_reason", "Assessed by Gemini AI."),
-            },
-            "vulnerability": {
-                "value": vulnerability,
-                "notes": gemini_result.get("vulnerability_reason", "Assessed by Gemini AI."),
-            },
-            "priority_score": {
-                "value": priority_score,
-                "notes": f"Priority {gemini_result['priority_score']}/100 — weighted by urgency, impact, and vulnerability.",
-            },
-            "scheme": {
-                "value": scheme,
-                "notes": scheme_reason,
-            },
-        }
+    scheme, scheme_reason, scheme_options = map_scheme(
+        category=category,
+        text=processed_text,
+        area=payload.area,
+        metadata=metadata,
+    )
+
+    explanation = {
+        "category": {
+            "value": category,
+            "confidence": confidence,
+            "notes": "Predicted by NLP engine (model or rules).",
+        },
+        "urgency": {
+            "value": urgency,
+            "notes": "Derived from keywords indicating emergencies or time sensitivity." + (SPIKE_NOTE if spike else ""),
+        },
+        "population_impact": {
+            "value": population_impact,
+            "notes": "Estimated from number of similar complaints in the same area and category.",
+        },
+        "vulnerability": {
+            "value": vulnerability,
+            "notes": "Higher if vulnerable groups are involved (Senior Citizen, BPL, Disability).",
+        },
+        "priority_score": {
+            "value": priority_score,
+            "notes": "Weighted combination of urgency, impact, vulnerability and model confidence.",
+        },
+        "scheme": {
+            "value": scheme,
+            "notes": scheme_reason,
+            "options": scheme_options,
+        },
+    }
 
-        # Use Gemini's translation if available, otherwise original text
-        stored_text = payload.text
+    return {
+        "version": nlp_engine.model_version,
+        "category": category,
+        "confidence": confidence,
+        "urgency": urgency,
+        "population_impact": population_impact,
+        "vulnerability": vulnerability,
+        "priority_score": priority_score,
+        "scheme": scheme,
+        "explanation": explanation,
+    }
 
-    else:
-        # ----- FALLBACK PATH (sklearn + rules) -----
-        processed_text = nlp_engine.translate_input(payload.text)
-
-        # 1) NLP classification
-        category, confidence = nlp_engine.predict_category(processed_text)
-
-        # 2-4) Priority pipeline
-        urgency, population_impact, vulnerability, priority_score = evaluate_complaint(
-            db=db,
-            text=processed_text,
-            area=payload.area,
-            category=category,
-            confidence=confidence,
-            vulnerability_flags=payload.vulnerability,
-        )
 
-        # 5) Welfare scheme engine
-        metadata = {}
-        if payload.vulnerability:
-            if payload.vulnerability.get("seniorCitizen"):
-                metadata["age"] = 70
-            if payload.vulnerability.get("lowIncome"):
-                metadata["income_group"] = "bpl"
-
-        scheme, scheme_reason = map_scheme(
-            category=category,
-            text=processed_text,
-            area=payload.area,
-            metadata=metadata,
-        )
+def _create_complaint(
+    payload: ComplaintIn,
+    db: Session,
+    client_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> ComplaintOut:
+    # =====================================================
+    # STRATEGY: Try Gemini first (unified AI), fallback to
+    # existing sklearn + rules pipeline if Gemini fails or
+    # admission control routes the request away from it.
+    # Tamil-script complaints the lexicon can categorise
+    # stay local (TAMIL_LOCAL_ONLY).
+    # In hedged mode both run at once and Gemini only wins
+    # if it answers within the adaptive SLA.
+    # =====================================================
 
-        stored_text = payload.text
+    # Resolve (and store) the area in its own short transaction, so a new
+    # area does not hold the SQLite write lock through the Gemini call.
+    area_id = area_registry.resolve(db, payload.area)
+    db.commit()
+
+    admitted = False
+    if nlp_engine.gemini is not None and not (TAMIL_LOCAL_ONLY and tamil_category(payload.text)):
+        lane = lane_for(nlp_engine.translate_input(payload.text), payload.vulnerability)
+        admitted, _ = gemini_admission.admit(f"{current_tenant.get()}:{client_id}", lane)
 
+    pending = None  # Gemini call still running after the SLA
+    if admitted and GEMINI_HEDGED:
+        future = hedged_gemini.submit(payload.text, payload.area, payload.vulnerability)
+        local = _local_analysis(payload, db, area_id)
+        gemini_result = hedged_gemini.wait(future)
+        if gemini_result:
+            spike = hotspot_detector.spike(payload.area, gemini_result["category"], area_id)
+            analysis = _gemini_analysis(gemini_result, spike)
+        else:
+            analysis = local
+            if not future.done():
+                pending = future
+    else:
+        gemini_result = None
+        if admitted:
+            gemini_result = nlp_engine.analyze_with_gemini(
+                text=payload.text,
+                area=payload.area,
+                vulnerability_flags=payload.vulnerability,
+            )
+        if gemini_result:
+            spike = hotspot_detector.spike(payload.area, gemini_result["category"], area_id)
+            analysis = _gemini_analysis(gemini_result, spike)
+        else:
+            analysis = _local_analysis(payload, db, area_id)
+
+    category = analysis["category"]
+    explanation = analysis["explanation"]
+    if pending is not None:
         explanation = {
-            "category": {
-                "value": category,
-                "confidence": confidence,
-                "notes": "Predicted by NLP engine (model or rules).",
-            },
-            "urgency": {
-                "value": urgency,
-                "notes": "Derived from keywords indicating emergencies or time sensitivity.",
-            },
-            "population_impact": {
-                "value": population_impact,
-                "notes": "Estimated from number of similar complaints in the same area and category.",
-            },
-            "vulnerability": {
-                "value": vulnerability,
-                "notes": "Higher if vulnerable groups are involved (Senior Citizen, BPL, Disability).",
-            },
-            "priority_score": {
-                "value": priority_score,
-                "notes": "Weighted combination of urgency, impact, vulnerability and model confidence.",
-            },
-            "scheme": {
-                "value": scheme,
-                "notes": scheme_reason,
-            },
+            **explanation,
+            "analysis": {"notes": "Local analysis within the latency SLA; Gemini's result will be applied when it arrives."},
         }
+    stored_text = payload.text
 
     # 6) Persist complaint
     complaint = Complaint(
         text=stored_text,
         area=payload.area,
+        area_id=area_id,
         category=category,
-        confidence=confidence,
-        urgency=urgency,
-        population_impact=population_impact,
-        vulnerability=vulnerability,
-        priority_score=priority_score,
-        scheme=scheme,
+        confidence=analysis["confidence"],
+        urgency=analysis["urgency"],
+        population_impact=analysis["population_impact"],
+        vulnerability=analysis["vulnerability"],
+        priority_score=analysis["priority_score"],
+        scheme=analysis["scheme"],
         status=payload.status or "new",
+        explanation=compact_explanation(explanation, analysis["version"]),
     )
     db.add(complaint)
-    db.commit()
-    db.refresh(complaint)
+    area_registry.record_complaint(db, area_id)
+    record_created(db, [complaint])
+    log_change(db, complaint, "created")
+    db.flush()
 
-    return ComplaintOut(
+    # The cohort just grew; lift older open complaints if it crossed a tier.
+    rescored = rescore_cohort(db, area=payload.area, category=category, area_id=area_id)
+    db.refresh(complaint)
+    out = ComplaintOut(
         id=complaint.id,
         text=complaint.text,
         area=complaint.area,
@@ -244,61 +564,164 @@ def create_complaint(payload: ComplaintIn, db: Session = Depends(get_db)) -> Com
         timestamp=complaint.timestamp,
         explanation=explanation,
     )
+    if idempotency_key:
+        # Committed together with the complaint: a retry never finds the
+        # complaint stored but the key still unanswered.
+        idempotency.record(db, idempotency_key, out.id, out.model_dump(mode="json"))
+    db.commit()
+    hotspot_detector.record(payload.area, category, area_id)
+    if rescored:
+        task_queue.refresh_cohort(db, area_id, category)
+    task_queue.sync(complaint)
+
+    if pending is not None:
+        complaint_id = out.id
+        hedged_gemini.on_late(pending, lambda result: _apply_gemini_upgrade(complaint_id, result))
+
+    # Sampled, non-blocking comparison against a candidate engine
+    nlp_engine.observe_shadow(
+        payload.text,
+        live_category=category,
+        live_version=analysis["version"],
+        area=payload.area,
+        vulnerability_flags=payload.vulnerability,
+        complaint_id=out.id,
+    )
+
+    return out
+
+
+def _apply_gemini_upgrade(complaint_id: int, gemini_result: dict) -> bool:
+    """
+    Replace a hedged complaint's local analysis with Gemini's late answer,
+    unless an officer has already corrected it or moved it on.
+    """
+    db = SessionLocal()
+    try:
+        complaint = db.get(Complaint, complaint_id)
+        if complaint is None or not is_queued_status(complaint.status):
+            return False
+        if db.query(Feedback.id).filter(Feedback.complaint_id == complaint_id).first():
+            return False
+
+        spike = hotspot_detector.spike(complaint.area, gemini_result["category"], complaint.area_id, pending=0)
+        analysis = _gemini_analysis(gemini_result, spike)
+        old_category = complaint.category
+        for field in ("category", "confidence", "urgency", "population_impact",
+                      "vulnerability", "priority_score", "scheme"):
+            setattr(complaint, field, analysis[field])
+        complaint.explanation = compact_explanation(analysis["explanation"], analysis["version"])
+        record_change(db, complaint, old_category=old_category)
+        log_change(db, complaint, "reanalysed", old_category=old_category)
+        db.commit()
+        complaint_cache.invalidate(complaint_id)
+
+        if analysis["category"] != old_category:
+            for category in (old_category, analysis["category"]):
+                if rescore_cohort(db, area=complaint.area, category=category, area_id=complaint.area_id):
+                    db.commit()
+                    task_queue.refresh_cohort(db, complaint.area_id, category)
+        db.refresh(complaint)
+        task_queue.sync(complaint)
+        return True
+    finally:
+        db.close()
+
+
+def _merge_counts(rows, archived: dict, missing) -> dict:
+    merged: dict = {}
+    for key, count in list(rows) + list(archived.items()):
+        key = key or missing
+        merged[key] = merged.get(key, 0) + count
+    return merged
+
+
+# Columns of each `recent_high_priority` item, selectable with ?fields=
+DASHBOARD_FIELDS = (
+    "id", "text", "area", "category", "priority_score", "status", "timestamp",
+    "scheme", "confidence", "urgency", "population_impact", "vulnerability",
+)
 
 
 @app.get("/dashboard", response_model=DashboardMetric)
-def get_dashboard(db: Session = Depends(get_db)) -> DashboardMetric:
-    total = db.query(Complaint).count()
+def get_dashboard(
+    request: Request,
+    fields: Optional[str] = None,
+    preview: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    `fields` is a comma-separated subset of DASHBOARD_FIELDS for the recent
+    complaints (only those columns are selected); `preview` truncates
+    `text` to that many characters in SQL. Large responses are gzip /
+    brotli compressed when the client accepts it.
+    """
+    if fields:
+        columns = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = sorted(set(columns) - set(DASHBOARD_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown fields: {', '.join(unknown)}. Choose from {', '.join(DASHBOARD_FIELDS)}",
+            )
+    else:
+        columns = list(DASHBOARD_FIELDS)
+    if preview is not None and preview < 1:
+        raise HTTPException(status_code=400, detail="preview must be a positive number of characters")
 
-    by_status_rows = db.query(Complaint.status, func.count(Complaint.id)).group_by(Complaint.status).all()
-    by_status = {status or "unknown": count for status, count in by_status_rows}
+    # Hot table counts plus the archived rollups, so totals survive archival.
+    total = db.query(Complaint).count() + archived_total(db)
 
-    by_category_rows = db.query(Complaint.category, func.count(Complaint.id)).group_by(Complaint.category).all()
-    by_category = {category or "uncategorized": count for category, count in by_category_rows}
+    by_status = _merge_counts(
+        db.query(Complaint.status, func.count(Complaint.id)).group_by(Complaint.status).all(),
+        archived_counts(db, "status"),
+        "unknown",
+    )
 
-    area_rows = (
-        db.query(Complaint.area, func.count(Complaint.id).label("count"))
-        .group_by(Complaint.area)
-        .order_by(func.count(Complaint.id).desc())
-        .limit(5)
-        .all()
+    by_category = _merge_counts(
+        db.query(Complaint.category, func.count(Complaint.id)).group_by(Complaint.category).all(),
+        archived_counts(db, "category"),
+        "uncategorized",
     )
 
-    top_areas = [{"area": area or "unknown", "count": count} for area, count in area_rows]
+    # Grouped on the canonical integer area id, so spelling variants merge.
+    area_counts = _merge_counts(
+        db.query(Complaint.area_id, func.count(Complaint.id)).group_by(Complaint.area_id).all(),
+        archived_counts(db, "area_id"),
+        None,
+    )
+    top_areas = [
+        {"area": area_registry.name(area_id) or "unknown", "count": count}
+        for area_id, count in sorted(area_counts.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    ]
 
+    # Only the requested columns; a text preview is cut in SQL (one extra
+    # character tells us whether to add an ellipsis).
+    selected = [
+        func.substr(Complaint.text, 1, preview + 1) if name == "text" and preview else getattr(Complaint, name)
+        for name in columns
+    ]
     recent_high_priority = (
-        db.query(Complaint)
+        db.query(*selected)
         .order_by(Complaint.priority_score.desc(), Complaint.timestamp.desc())
         .limit(50)
         .all()
     )
 
-    recent_data = [
-        {
-            "id": c.id,
-            "text": c.text,
-            "area": c.area,
-            "category": c.category,
-            "priority_score": c.priority_score,
-            "status": c.status,
-            "timestamp": c.timestamp,
-            # NEW fields for dashboard detail view
-            "scheme": c.scheme,
-            "confidence": c.confidence,
-            "urgency": c.urgency,
-            "population_impact": c.population_impact,
-            "vulnerability": c.vulnerability,
-        }
-        for c in recent_high_priority
-    ]
+    recent_data = [dict(zip(columns, row)) for row in recent_high_priority]
+    if preview and "text" in columns:
+        for item in recent_data:
+            item["text"] = truncate(item["text"], preview)
 
-    return DashboardMetric(
-        total_complaints=total,
-        by_status=by_status,
-        by_category=by_category,
-        top_areas=top_areas,
-        recent_high_priority=recent_data,
-    )
+    # Plain dicts go straight to the serializer; the response model above
+    # documents the shape without re-validating it on every poll.
+    return json_response(request, {
+        "total_complaints": total,
+        "by_status": by_status,
+        "by_category": by_category,
+        "top_areas": top_areas,
+        "recent_high_priority": recent_data,
+    })
 
 
 @app.patch("/status/{complaint_id}", response_model=ComplaintOut)
@@ -311,33 +734,97 @@ def update_status(
     if not complaint:
         raise HTTPException(status_code=404, detail="Complaint not found")
 
+    old_status = complaint.status
     complaint.status = payload.status
+    record_change(db, complaint, old_status=old_status)
+    log_change(db, complaint, "status", old_status=old_status)
     db.add(complaint)
     db.commit()
     db.refresh(complaint)
+    complaint_cache.invalidate(complaint.id)
+    task_queue.sync(complaint)
 
-    explanation = {
-        "priority_score": {
-            "value": complaint.priority_score or 0.0,
-            "notes": "Priority did not change; only status updated.",
-        }
+    return ComplaintOut(**render(complaint))
+
+
+@app.get("/complaint/{complaint_id}", response_model=ComplaintOut)
+def get_complaint(complaint_id: int, request: Request, db: Session = Depends(get_db)):
+    """Single complaint with its stored explanation, served from a bounded cache."""
+    rendered = complaint_cache.get(complaint_id)
+    if rendered is None:
+        # Archived complaints keep their explanation, so old links still work.
+        complaint = db.get(Complaint, complaint_id) or db.get(ArchivedComplaint, complaint_id)
+        if not complaint:
+            raise HTTPException(status_code=404, detail="Complaint not found")
+        rendered = render(complaint)
+        complaint_cache.put(complaint_id, rendered)
+    return json_response(request, rendered)
+
+
+@app.get("/complaints/cache")
+def complaint_cache_stats() -> dict:
+    return complaint_cache.stats()
+
+
+def _queue_filter(db: Session, area: Optional[str], category: Optional[str]):
+    """Translate optional area/category filters into task queue keys."""
+    area_id = area_registry.lookup(db, area) if area else ANY
+    if area_id is None:
+        raise HTTPException(status_code=404, detail="Unknown area")
+    return area_id, category or ANY
+
+
+def _queue_item(complaint: Complaint) -> dict:
+    return {
+        "id": complaint.id,
+        "text": complaint.text,
+        "area": complaint.area,
+        "category": complaint.category,
+        "priority_score": complaint.priority_score,
+        "status": complaint.status,
+        "timestamp": complaint.timestamp,
+        "scheme": complaint.scheme,
     }
 
-    return ComplaintOut(
-        id=complaint.id,
-        text=complaint.text,
-        area=complaint.area,
-        category=complaint.category,
-        confidence=complaint.confidence or 0.0,
-        urgency=complaint.urgency or 0.0,
-        population_impact=complaint.population_impact or 0.0,
-        vulnerability=complaint.vulnerability or 0.0,
-        priority_score=complaint.priority_score or 0.0,
-        scheme=complaint.scheme or "",
-        status=complaint.status,
-        timestamp=complaint.timestamp,
-        explanation=explanation,
-    )
+
+@app.get("/queue/next")
+def queue_next(
+    area: Optional[str] = None,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+) -> dict:
+    """Most urgent open complaint for the given filters, without claiming it."""
+    area_id, category = _queue_filter(db, area, category)
+    task_queue.refresh(db)
+    complaint_id = task_queue.peek(area_id, category)
+    complaint = db.get(Complaint, complaint_id) if complaint_id is not None else None
+    if complaint is None:
+        raise HTTPException(status_code=404, detail="No open complaints in queue")
+    return {"complaint": _queue_item(complaint), "queue_depth": task_queue.depth()["total"]}
+
+
+@app.post("/queue/claim")
+def queue_claim(payload: QueueClaim, db: Session = Depends(get_db)) -> dict:
+    """Take the most urgent open complaint and mark it assigned, atomically."""
+    area_id, category = _queue_filter(db, payload.area, payload.category)
+    complaint = task_queue.claim(db, area_id, category)
+    if complaint is None:
+        raise HTTPException(status_code=404, detail="No open complaints in queue")
+    complaint_cache.invalidate(complaint.id)
+    return {"complaint": _queue_item(complaint), "queue_depth": task_queue.depth()["total"]}
+
+
+@app.get("/queue/depth")
+def queue_depth(db: Session = Depends(get_db)) -> dict:
+    task_queue.refresh(db)
+    return task_queue.depth()
+
+
+@app.get("/hotspots")
+def get_hotspots(min_z: Optional[float] = None, min_count: Optional[int] = None, limit: int = 50) -> dict:
+    """(area, category) cohorts whose complaint rate in the current window is spiking."""
+    kwargs = {k: v for k, v in (("min_z", min_z), ("min_count", min_count)) if v is not None}
+    return {**hotspot_detector.settings(), "hotspots": hotspot_detector.hotspots(limit=limit, **kwargs)}
 
 
 @app.post("/feedback")
@@ -354,15 +841,388 @@ def create_feedback(payload: FeedbackIn, db: Session = Depends(get_db)) -> dict:
     )
     db.add(feedback)
 
+    corrected = {}
+    old_category = complaint.category
     if payload.correct_category:
         complaint.category = payload.correct_category
+        corrected["category"] = "Corrected by officer feedback."
     if payload.correct_scheme:
         complaint.scheme = payload.correct_scheme
+        corrected["scheme"] = "Corrected by officer feedback."
+    if corrected:
+        complaint.explanation = with_notes(complaint.explanation, **corrected)
+        record_change(db, complaint, old_category=old_category)
+    log_change(
+        db, complaint, "feedback",
+        old_category=old_category if payload.correct_category else None,
+        corrected=sorted(corrected) or None,
+    )
 
     db.commit()
+    complaint_cache.invalidate(complaint.id)
+
+    if payload.correct_category and rescore_cohort(
+        db, area=complaint.area, category=complaint.category, area_id=complaint.area_id
+    ):
+        db.commit()
+        task_queue.refresh_cohort(db, complaint.area_id, complaint.category)
+    task_queue.sync(complaint)
     return {"message": "Feedback recorded successfully"}
 
 
+@app.post("/areas")
+def upsert_area(payload: AreaIn, db: Session = Depends(get_db)) -> dict:
+    try:
+        area = area_registry.upsert(db, payload.name, level=payload.level, parent_id=payload.parent_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"id": area.id, "name": area.name, "level": area.level, "parent_id": area.parent_id}
+
+
+@app.get("/analytics/timeseries")
+def analytics_timeseries(
+    request: Request,
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    area: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    group_by: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Complaint volume, resolutions and median time to resolution per period,
+    merged from the hourly rollups. `area` includes the wards below a zone
+    or district.
+    """
+    area_ids = None
+    if area:
+        area_id = area_registry.lookup(db, area)
+        if area_id is None:
+            raise HTTPException(status_code=404, detail="Unknown area")
+        area_ids = area_registry.descendants(area_id)
+    try:
+        series = timeseries(
+            db, granularity=granularity, since=since, until=until,
+            area_ids=area_ids, category=category, status=status, group_by=group_by,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if group_by == "area":
+        for point in series:
+            point["area"] = {area_registry.name(a) if a else None: n for a, n in point["area"].items()}
+    return json_response(request, {"granularity": granularity, "series": series})
+
+
+@app.get("/areas/rollup")
+def area_rollup(level: str = "ward", db: Session = Depends(get_db)) -> dict:
+    if level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {', '.join(LEVELS)}")
+    return {"level": level, "areas": rollup(db, level)}
+
+
+@app.get("/health")
+def liveness() -> dict:
+    """Liveness: the process is up and serving HTTP, whatever is still loading."""
+    return {"status": "alive"}
+
+
+@app.get("/ready")
+def readiness():
+    """Readiness: 200 once every required subsystem has initialised, 503 before."""
+    ready = subsystems.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "subsystems": {name: s["state"] for name, s in subsystems.status().items()},
+            "model_version": nlp_engine.model_version,
+        },
+    )
+
+
+@app.get("/tenants")
+def tenant_status() -> dict:
+    """Configured tenants: engine cached, initialised, requests in flight and rejected."""
+    return tenants.stats()
+
+
+@app.get("/startup")
+def startup_report() -> dict:
+    """Import time per module and init time per subsystem for this process."""
+    return subsystems.report()
+
+
+@app.get("/workers")
+def worker_status() -> dict:
+    """Per-worker readiness when running under serve.py (pre-fork mode)."""
+    board = getattr(app.state, "worker_board", None)
+    if board is None:
+        return {"mode": "single", "pid": os.getpid(), "workers": []}
+    workers = board.snapshot()
+    return {
+        "mode": "prefork",
+        "pid": os.getpid(),
+        "ready": sum(1 for w in workers if w["state"] == "ready"),
+        "workers": workers,
+    }
+
+
+@app.get("/admission")
+def admission_stats() -> dict:
+    """Gemini admission control: tokens, per-lane queue depth, admitted and overflow counts."""
+    return {"gemini_available": nlp_engine.gemini is not None, **gemini_admission.stats()}
+
+
+@app.get("/hedging")
+def hedging_stats() -> dict:
+    """Adaptive Gemini SLA, observed latency and how hedged requests were answered."""
+    return {"gemini_available": nlp_engine.gemini is not None, **hedged_gemini.stats()}
+
+
+@app.get("/model")
+def get_model() -> dict:
+    online_learner.sync()
+    return {
+        "version": nlp_engine.model_version,
+        "history": nlp_engine.model_history(),
+        "last_feedback_id": online_learner.last_feedback_id,
+    }
+
+
+@app.post("/model/learn")
+def learn_from_feedback(db: Session = Depends(get_db)) -> dict:
+    """Run one online-learning pass over unseen feedback now."""
+    return online_learner.step(db)
+
+
+@app.post("/model/rollback")
+def rollback_model() -> dict:
+    version = online_learner.rollback()
+    if version is None:
+        raise HTTPException(status_code=409, detail="No previous model to roll back to")
+    return {"version": version, "history": nlp_engine.model_history()}
+
+
+@app.get("/model/shadow")
+def get_shadow_summary(candidate: Optional[str] = None, db: Session = Depends(get_db)) -> dict:
+    """Agreement and latency of shadow-evaluated candidate engines."""
+    shadow = nlp_engine.shadow
+    return {
+        "enabled": shadow is not None,
+        "candidate": shadow.candidate.version if shadow else None,
+        "sample_rate": shadow.sample_rate if shadow else 0.0,
+        "counters": dict(shadow.stats) if shadow else {},
+        "candidates": shadow_summary(db, candidate),
+    }
+
+
+@app.get("/priority/weights")
+def get_priority_weights() -> dict:
+    # bulk_priority pulls in NumPy; imported on first use to keep cold starts short.
+    from bulk_priority import current_weights
+
+    return {"weights": current_weights()}
+
+
+@app.post("/priority/simulate")
+def simulate_priority(payload: PriorityWeightsIn, db: Session = Depends(get_db)) -> dict:
+    """What-if: how would the queue reorder under the proposed weights?"""
+    from bulk_priority import simulate
+
+    try:
+        return simulate(db, payload.weights, top_k=payload.top_k, open_only=payload.open_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.put("/priority/weights")
+def put_priority_weights(payload: PriorityWeightsIn, db: Session = Depends(get_db)) -> dict:
+    """Apply approved weights and re-score complaints in bulk."""
+    from bulk_priority import apply_weights
+
+    try:
+        result = apply_weights(db, payload.weights, open_only=payload.open_only)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    task_queue.rebuild(db)
+    return result
+
+
+@app.post("/schemes/eligible")
+def schemes_eligible(payload: EligibilityIn) -> dict:
+    """Schemes each profile is eligible for, checked against the whole catalogue in one pass."""
+    from eligibility import ELIGIBILITY_MAX_PROFILES, eligible_schemes
+
+    if len(payload.profiles) > ELIGIBILITY_MAX_PROFILES:
+        raise HTTPException(status_code=400, detail=f"At most {ELIGIBILITY_MAX_PROFILES} profiles per request.")
+    return eligible_schemes([p.model_dump() for p in payload.profiles])
+
+
+@app.get("/complaints/search")
+def search(
+    q: str,
+    area: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    db: Session = Depends(get_db),
+) -> dict:
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+
+    area_id = area_registry.lookup(db, area)
+    if area and area_id is None:
+        return {"query": q, "count": 0, "results": []}
+
+    limit = max(1, min(limit, 100))
+    results = search_complaints(
+        db, q, area_id=area_id, category=category, status=status, limit=limit, offset=offset
+    )
+    return {"query": q, "count": len(results), "results": results}
+
+
+@app.get("/export")
+def export_complaints(
+    format: str = "csv",
+    gzip: bool = False,
+    area: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: bool = False,
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    """
+    Stream a full complaint dump as CSV or NDJSON in constant memory.
+    Archived complaints are only included with `include_archived=true`.
+    """
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'csv' or 'ndjson'")
+
+    area_id = area_registry.lookup(db, area)
+    if area and area_id is None:
+        raise HTTPException(status_code=404, detail="Unknown area")
+
+    body = stream_export(
+        format, gzip=gzip, area_id=area_id, category=category, status=status, since=since, until=until,
+        include_archived=include_archived,
+    )
+    filename = f"complaints.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else ("text/csv" if format == "csv" else "application/x-ndjson")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def _changes_page(since: int, limit: int) -> dict:
+    db = SessionLocal()
+    try:
+        return read_changes(db, since=since, limit=limit)
+    finally:
+        db.close()
+
+
+@app.get("/changes")
+async def get_changes(request: Request, since: int = 0, limit: int = 100, wait: float = 0.0):
+    """
+    Complaint changes after cursor `since` (0 = the oldest retained change),
+    oldest first. Pass the returned `next_cursor` as `since` on the next call.
+    With `wait` (seconds), an empty page is held until a change arrives
+    (long-poll).
+    """
+    deadline = time.monotonic() + max(0.0, min(wait, CHANGES_MAX_WAIT_SECONDS))
+    with change_feed.subscribe() as subscription:  # before reading, so no commit is missed
+        while True:
+            try:
+                page = await run_in_threadpool(_changes_page, since, limit)
+            except CursorExpired as e:
+                raise HTTPException(status_code=410, detail=str(e))
+            remaining = deadline - time.monotonic()
+            if page["changes"] or remaining <= 0:
+                return json_response(request, page)
+            await subscription.wait(min(remaining, CHANGES_POLL_SECONDS))
+
+
+@app.get("/changes/stream")
+async def stream_changes(
+    request: Request,
+    since: int = 0,
+    last_event_id: Optional[int] = Header(None),
+) -> StreamingResponse:
+    """Server-sent events for every change after `since` (or the Last-Event-ID of a reconnect)."""
+    cursor = last_event_id if last_event_id is not None else since
+
+    async def events():
+        nonlocal cursor
+        idle = 0.0
+        with change_feed.subscribe() as subscription:
+            while not await request.is_disconnected():
+                try:
+                    page = await run_in_threadpool(_changes_page, cursor, CHANGES_MAX_LIMIT)
+                except CursorExpired as e:
+                    yield b"event: expired\ndata: " + dumps({"detail": str(e)}) + b"\n\n"
+                    return
+                for change in page["changes"]:
+                    yield sse_event(change)
+                cursor = page["next_cursor"]
+                if page["changes"]:
+                    idle = 0.0
+                    if page["has_more"]:
+                        continue
+                if not await subscription.wait(CHANGES_POLL_SECONDS):
+                    idle += CHANGES_POLL_SECONDS
+                    if idle >= CHANGES_HEARTBEAT_SECONDS:
+                        idle = 0.0
+                        yield b": keep-alive\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/archive/run")
+def run_archive(older_than_days: Optional[int] = None, db: Session = Depends(get_db)) -> dict:
+    """Move complaints resolved more than the retention window ago to the archive."""
+    archived = archive_resolved(db, older_than_days=older_than_days)
+    if archived:
+        complaint_cache.clear()
+    pruned = prune_changes(db)
+    db.commit()
+    return {"archived": archived, "changes_pruned": pruned}
+
+
+@app.get("/archive")
+def get_archive(
+    area: Optional[str] = None,
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = 50,
+    offset: int = 0,
+    db: Session = Depends(get_db),
+) -> dict:
+    area_id = area_registry.lookup(db, area)
+    if area and area_id is None:
+        return {"count": 0, "complaints": []}
+
+    limit = max(1, min(limit, 500))
+    rows = query_archive(
+        db, area_id=area_id, category=category, since=since, until=until, limit=limit, offset=offset
+    )
+    return {"count": len(rows), "complaints": rows}
+
+
+subsystems.app_imported()
+
+
 if __name__ == "__main__":
     import uvicorn
 
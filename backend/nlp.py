@@ -1,6 +1,6 @@
 """
 Civisense NLP Engine
-Single-file hackathon version (NO cross-file imports)
+Hackathon version (only cross-file import: the tamil.py lexicon)
 Exposes NLPEngine for FastAPI
 
 Features:
@@ -11,9 +11,12 @@ Features:
 
 import re
 import os
-import joblib
+import threading
+from collections import deque
 from typing import Dict, Any, Tuple
 
+from tamil import normalize as normalize_tamil, tamil_category
+
 
 # =========================
 # INTERNAL AI ENGINE (ML MODE)
@@ -217,27 +220,126 @@ class CivisenseNLP:
 # =========================
 
 class NLPEngine:
-    def __init__(self, model_path: str = "model.joblib"):
+    def __init__(self, model_path: str = "model.joblib", use_gemini: bool = True, lazy: bool = False):
+        """
+        With lazy=True nothing is loaded here; call load_gemini() and
+        load_model() later (main.py runs them in parallel after startup).
+        Until then requests use the rule-based fallback.
+        """
+        self.model_path = model_path
+        self.use_gemini = use_gemini
+
         # --- Gemini (primary) ---
         self.gemini = None
+        self._gemini_loaded = False
+
+        # --- sklearn ML model (secondary) ---
+        self.engine = None
+        self.model_version = "rules"
+        self._model_loaded = False
+        # (version, engine) loaded at startup, restored when the online model is withdrawn
+        self._base = ("rules", None)
+        # Previous (version, engine) pairs kept for rollback after a hot swap
+        self._previous = deque(maxlen=int(os.getenv("MODEL_HISTORY", "3")))
+        self._swap_lock = threading.Lock()
+        # Optional shadow.ShadowRunner comparing a candidate engine on sampled traffic
+        self.shadow = None
+
+        if not lazy:
+            self.load_gemini()
+            self.load_model()
+
+    def load_gemini(self) -> None:
+        if self._gemini_loaded or not self.use_gemini:
+            return
+        self._gemini_loaded = True
         try:
             from gemini_engine import GeminiEngine
             self.gemini = GeminiEngine()
         except Exception as e:
             print(f"⚠️ Gemini engine not available, will use fallback: {e}")
 
-        # --- sklearn ML model (secondary) ---
-        self.engine = None
-
-        if os.path.exists(model_path):
-            try:
-                model_bundle = joblib.load(model_path)
-                self.engine = CivisenseNLP(model_bundle)
-                print("✅ ML model loaded successfully (fallback)")
-            except Exception as e:
-                print("⚠️ Model load failed. Falling back to rule-based NLP:", e)
-        else:
+    def load_model(self) -> None:
+        if self._model_loaded:
+            return
+        self._model_loaded = True
+        if not os.path.exists(self.model_path):
             print("⚠️ Model not found. Running in rule-based NLP mode")
+            return
+        try:
+            import joblib
+
+            new_engine = CivisenseNLP(joblib.load(self.model_path))
+        except Exception as e:
+            print("⚠️ Model load failed. Falling back to rule-based NLP:", e)
+            return
+        with self._swap_lock:
+            self._base = ("baseline", new_engine)
+            if self.engine is None:  # never replace a model swapped in meanwhile
+                self.engine = new_engine
+                self.model_version = "baseline"
+        print("✅ ML model loaded successfully (fallback)")
+
+    # --------------------------------------------------
+    # Hot swap (used by online learning)
+    # --------------------------------------------------
+    def swap_model(self, model_bundle: Dict, version: str) -> None:
+        """
+        Atomically replace the ML model. Requests already running keep the
+        engine they started with; new ones see the new model.
+        """
+        new_engine = CivisenseNLP(model_bundle)
+        with self._swap_lock:
+            self._previous.append((self.model_version, self.engine))
+            self.engine = new_engine
+            self.model_version = version
+
+    def rollback(self) -> str | None:
+        """Restore the model that was live before the last swap."""
+        with self._swap_lock:
+            if not self._previous:
+                return None
+            self.model_version, self.engine = self._previous.pop()
+            return self.model_version
+
+    def restore_base(self) -> str:
+        """Go back to the startup model, e.g. after another worker rolled the online one back."""
+        with self._swap_lock:
+            while self._previous and self.engine is not self._base[1]:
+                self.model_version, self.engine = self._previous.pop()
+            self.model_version, self.engine = self._base
+            return self.model_version
+
+    def model_history(self) -> list:
+        return [version for version, _ in self._previous]
+
+    # --------------------------------------------------
+    # Shadow mode (candidate evaluated off the request path)
+    # --------------------------------------------------
+    def observe_shadow(
+        self,
+        text: str,
+        live_category: str,
+        live_version: str = None,
+        area: str = None,
+        vulnerability_flags: dict = None,
+        complaint_id: int = None,
+    ) -> bool:
+        """
+        Offer a finished live decision to the shadow runner, if any.
+        Never blocks: samples are dropped when the shadow queue is full.
+        """
+        shadow = self.shadow
+        if shadow is None:
+            return False
+        return shadow.offer(
+            text,
+            live_category,
+            live_version or self.model_version,
+            area=area,
+            flags=vulnerability_flags,
+            complaint_id=complaint_id,
+        )
 
     # --------------------------------------------------
     # NEW: Full Gemini analysis (used by main.py)
@@ -270,9 +372,10 @@ class NLPEngine:
     def translate_input(self, text: str) -> str:
         """
         Simple dictionary-based translation/normalization for Hackathon demo.
-        Converts common Tanglish/Tamil keywords to English.
+        Converts Tamil-script words (tamil.py lexicon) and common Tanglish
+        keywords to English.
         """
-        t = text.lower()
+        t = normalize_tamil(text).lower()
         
         # Tanglish / Tamil Keyword Map
         replacements = {
@@ -305,9 +408,10 @@ class NLPEngine:
         # Pre-process / Translate
         processed_text = self.translate_input(text)
         
-        # Use ML if available
-        if self.engine:
-            result = self.engine.analyze_complaint(processed_text)
+        # Use ML if available (one read, so a concurrent swap can't split it)
+        engine = self.engine
+        if engine:
+            result = engine.analyze_complaint(processed_text)
             return (
                 result["category"]["predicted"],
                 float(result["category"]["confidence"]),
@@ -318,6 +422,11 @@ class NLPEngine:
         # -------------------------
         t = processed_text.lower()
 
+        # Tamil script: the lexicon's category vote, not the first rule hit
+        category = tamil_category(text)
+        if category:
+            return category, 0.6
+
         if "water" in t or "pipe" in t or "tanker" in t:
             return "Water", 0.6
         if "road" in t or "pothole" in t or "street" in t:
@@ -336,8 +445,9 @@ class NLPEngine:
         return "Other", 0.5
 
     def analyze_full(self, text: str) -> Dict[str, Any]:
-        if self.engine:
-            return self.engine.analyze_complaint(text)
+        engine = self.engine
+        if engine:
+            return engine.analyze_complaint(text)
 
         # Minimal explainable fallback output
         category, confidence = self.predict_category(text)
@@ -0,0 +1,413 @@
+"""
+Civisense Online Learning
+=========================
+Learns from officer corrections (`feedback.correct_category`) without a
+retrain/redeploy cycle.
+
+- The learner keeps an incremental model: HashingVectorizer (stateless, so
+  no vocabulary refit) + SGDClassifier trained with partial_fit().
+- It is seeded once from the labelled training CSV and the categories
+  already stored on complaints (i.e. the current model's decisions).
+- A background thread consumes new feedback in mini-batches, trains a
+  copy of the model and hot-swaps it into NLPEngine; requests never wait
+  on training. Previous models stay in NLPEngine for rollback.
+- Every ONLINE_HOLDOUT_EVERY-th correction (by feedback id) is never
+  trained on. A trained model only goes live once it classifies at least
+  ONLINE_HOLDOUT_MIN of those held-out corrections, and at least as
+  accurately as the live model; until then it keeps learning off to the
+  side.
+- The model is shared by all tenants. The background loop learns from
+  each tenant's corrections in turn, with a feedback cursor per tenant.
+- Under serve.py only worker 0 trains. The model file is the shared state:
+  every worker reloads it when it changes (every ONLINE_MODEL_SYNC_SECONDS)
+  and before learning or rolling back, so a rollback on any worker reaches
+  all of them. A lock file next to the model serialises writers.
+"""
+
+import contextlib
+import copy
+import csv
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from db import Complaint, Feedback
+from startup import is_leader, worker_index
+from tenancy import DEFAULT_TENANT, current_tenant, tenant_context, tenants
+
+try:
+    import fcntl
+except ImportError:  # Windows: serve.py does not fork there
+    fcntl = None
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ONLINE_MODEL_PATH = os.getenv("ONLINE_MODEL_PATH", os.path.join(BASE_DIR, "model_online.joblib"))
+TRAINING_DATA_PATH = os.getenv(
+    "TRAINING_DATA_PATH", os.path.join(BASE_DIR, "..", "ai", "training_data.csv")
+)
+ONLINE_LEARNING_INTERVAL = float(os.getenv("ONLINE_LEARNING_INTERVAL", "300"))  # seconds, 0 disables
+ONLINE_MODEL_SYNC_SECONDS = float(os.getenv("ONLINE_MODEL_SYNC_SECONDS", "5"))  # serve.py workers only
+BATCH_SIZE = int(os.getenv("ONLINE_LEARNING_BATCH_SIZE", "256"))
+HOLDOUT_EVERY = int(os.getenv("ONLINE_HOLDOUT_EVERY", "5"))
+HOLDOUT_MIN = int(os.getenv("ONLINE_HOLDOUT_MIN", "20"))
+HOLDOUT_LIMIT = 1000  # most recent held-out corrections used for the check
+SEED_LIMIT = 20000
+SEED_EPOCHS = 5
+
+CATEGORIES = [
+    "Water", "Roads", "Electricity", "Health", "Welfare",
+    "Sanitation", "Housing", "Education", "Food", "Other",
+]
+
+
+def _new_model() -> Dict:
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+
+    return {
+        "vectorizer": HashingVectorizer(
+            n_features=2 ** 18,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm="l2",
+            lowercase=True,
+        ),
+        "classifier": SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42),
+        "categories": list(CATEGORIES),
+        "version": None,
+        "feedback_cursors": {},  # tenant -> id of the last feedback row trained on
+    }
+
+
+def _cursors_of(model: Dict) -> Dict[str, int]:
+    if "feedback_cursors" in model:
+        return model["feedback_cursors"]
+    return {DEFAULT_TENANT: model.get("last_feedback_id", 0)}  # saved before cursors were per tenant
+
+
+def _is_online(bundle: Optional[Dict]) -> bool:
+    return bool(bundle) and ("feedback_cursors" in bundle or "last_feedback_id" in bundle)
+
+
+class OnlineLearner:
+    def __init__(self, nlp_engine, model_path: str = ONLINE_MODEL_PATH, batch_size: int = BATCH_SIZE):
+        self.nlp = nlp_engine
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self._model: Optional[Dict] = None
+        # tenant -> id of the last feedback row consumed (ids are per tenant database)
+        self._cursors: Dict[str, int] = {}
+        self._mtime: Optional[int] = None  # st_mtime_ns of the model file last loaded or saved
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def last_feedback_id(self) -> int:
+        return self._cursors.get(current_tenant.get(), 0)
+
+    # ---------- PERSISTENCE ----------
+
+    def load(self) -> bool:
+        """Resume from a previously saved online model and make it live."""
+        with self._lock:
+            return self._load(self._file_mtime())
+
+    def sync(self) -> bool:
+        """Pick up a model another worker saved, or its removal by a rollback."""
+        mtime = self._file_mtime()
+        if mtime == self._mtime:
+            return False
+        with self._lock:
+            return self._sync()
+
+    def _sync(self) -> bool:
+        mtime = self._file_mtime()
+        if mtime == self._mtime:
+            return False
+        if mtime is None:
+            self._mtime = None
+            self._model = None
+            version = self.nlp.restore_base()
+            print(f"✅ Online model withdrawn by another worker, back to {version}")
+            return True
+        return self._load(mtime)
+
+    def _load(self, mtime: Optional[int]) -> bool:
+        if mtime is None:
+            return False
+        import joblib
+
+        self._mtime = mtime  # a broken file is not retried until it changes
+        try:
+            model = joblib.load(self.model_path)
+        except Exception as e:
+            print("⚠️ Online model load failed, keeping current model:", e)
+            return False
+        self._model = model
+        # Another worker's file may be behind corrections this one already consumed
+        for tenant, cursor in _cursors_of(model).items():
+            self._cursors[tenant] = max(self._cursors.get(tenant, 0), cursor)
+        history = self.nlp.model_history()
+        if history and history[-1] == model["version"]:
+            self.nlp.rollback()  # another worker rolled back to it
+        elif model["version"] != self.nlp.model_version:
+            self.nlp.swap_model(model, version=model["version"])
+        print(f"✅ Online model {model['version']} loaded")
+        return True
+
+    def _file_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _save(self, model: Dict) -> None:
+        import joblib
+
+        tmp = self.model_path + ".tmp"
+        joblib.dump(model, tmp)
+        os.replace(tmp, self.model_path)  # atomic on the same filesystem
+        self._mtime = self._file_mtime()
+
+    def _remove(self) -> None:
+        if os.path.exists(self.model_path):
+            os.remove(self.model_path)
+        self._mtime = None
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Serialise model writers across serve.py workers."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.model_path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    # ---------- TRAINING ----------
+
+    def _seed(self, db: Session) -> Dict:
+        """
+        Initial model: labelled CSV plus the categories already assigned to
+        complaints (which include every correction applied via /feedback),
+        except complaints with a held-out correction.
+        """
+        texts: List[str] = []
+        labels: List[str] = []
+
+        if os.path.exists(TRAINING_DATA_PATH):
+            with open(TRAINING_DATA_PATH, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    if row.get("category") in CATEGORIES:
+                        texts.append(self.nlp.translate_input(row["complaint_text"]))
+                        labels.append(row["category"])
+
+        rows = (
+            db.query(Complaint.text, Complaint.category)
+            .filter(
+                Complaint.category.in_(CATEGORIES),
+                ~exists().where(Feedback.complaint_id == Complaint.id, Feedback.id % HOLDOUT_EVERY == 0),
+            )
+            .order_by(Complaint.id.desc())
+            .limit(SEED_LIMIT)
+            .all()
+        )
+        for text, category in rows:
+            texts.append(self.nlp.translate_input(text))
+            labels.append(category)
+
+        model = _new_model()
+        if texts:
+            pairs = list(zip(texts, labels))
+            rng = random.Random(42)
+            for _ in range(SEED_EPOCHS):
+                rng.shuffle(pairs)
+                X = model["vectorizer"].transform([t for t, _ in pairs])
+                model["classifier"].partial_fit(X, [y for _, y in pairs], classes=CATEGORIES)
+        return model
+
+    def _holdout(self, db: Session) -> List[Tuple[str, str]]:
+        """(text, correct category) of the most recent held-out corrections."""
+        return (
+            db.query(Complaint.text, Feedback.correct_category)
+            .join(Complaint, Complaint.id == Feedback.complaint_id)
+            .filter(Feedback.correct_category.in_(CATEGORIES), Feedback.id % HOLDOUT_EVERY == 0)
+            .order_by(Feedback.id.desc())
+            .limit(HOLDOUT_LIMIT)
+            .all()
+        )
+
+    def _accuracy(self, model: Optional[Dict], holdout: List[Tuple[str, str]]) -> float:
+        """Share of `holdout` that `model` (None: the live engine) gets right."""
+        if model is None:
+            predicted = [self.nlp.predict_category(text)[0] for text, _ in holdout]
+        else:
+            X = model["vectorizer"].transform([self.nlp.translate_input(text) for text, _ in holdout])
+            predicted = model["classifier"].predict(X)
+        return sum(p == label for p, (_, label) in zip(predicted, holdout)) / len(holdout)
+
+    def _fetch_feedback(self, db: Session, after_id: int) -> List[Tuple[int, str, str]]:
+        return (
+            db.query(Feedback.id, Complaint.text, Feedback.correct_category)
+            .join(Complaint, Complaint.id == Feedback.complaint_id)
+            .filter(Feedback.id > after_id, Feedback.correct_category.isnot(None))
+            .order_by(Feedback.id)
+            .limit(self.batch_size)
+            .all()
+        )
+
+    def step(self, db: Session) -> Dict:
+        """
+        Consume all unseen feedback in mini-batches and, if anything was
+        learned and the result beats the live model on the held-out
+        corrections, hot-swap it into the NLP engine.
+        """
+        with self._lock, self._file_lock():
+            self._sync()  # continue from whatever another worker deployed
+            base = self._model
+            tenant = current_tenant.get()
+            batch = self._fetch_feedback(db, self._cursors.get(tenant, 0))
+            if not batch:
+                return {"learned": 0, "skipped": 0, "version": self.nlp.model_version}
+
+            # Train a copy; the live model is never mutated in place.
+            model = copy.deepcopy(base) if base else self._seed(db)
+            classes = model["classifier"].classes_ if hasattr(model["classifier"], "classes_") else CATEGORIES
+            model.pop("last_feedback_id", None)
+            cursors = model["feedback_cursors"] = dict(self._cursors)
+            learned = skipped = 0
+
+            while batch:
+                texts, labels = [], []
+                for feedback_id, text, category in batch:
+                    if feedback_id % HOLDOUT_EVERY == 0:
+                        continue  # held out for the quality check
+                    if category in CATEGORIES:
+                        texts.append(self.nlp.translate_input(text))
+                        labels.append(category)
+                    else:
+                        skipped += 1
+                if texts:
+                    X = model["vectorizer"].transform(texts)
+                    model["classifier"].partial_fit(X, labels, classes=classes)
+                    learned += len(texts)
+                cursors[tenant] = batch[-1][0]
+                batch = self._fetch_feedback(db, cursors[tenant])
+
+            if not learned:
+                # Nothing usable to train on (or all held out); just move past these rows
+                self._cursors[tenant] = cursors[tenant]
+                return {"learned": 0, "skipped": skipped, "version": self.nlp.model_version}
+
+            model["categories"] = list(model["classifier"].classes_)
+            model["version"] = "online-" + datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+            self._model = model
+            self._cursors[tenant] = cursors[tenant]
+
+            holdout = self._holdout(db)
+            accuracy = self._accuracy(model, holdout) if holdout else None
+            live_accuracy = self._accuracy(None, holdout) if holdout else None
+            result = {
+                "learned": learned,
+                "skipped": skipped,
+                "holdout": len(holdout),
+                "accuracy": accuracy,
+                "live_accuracy": live_accuracy,
+            }
+            if not holdout or len(holdout) < HOLDOUT_MIN or accuracy < live_accuracy:
+                # Keep learning from this model, but leave the live one in place.
+                print(
+                    f"⚠️ Online model {model['version']} not deployed: held-out accuracy "
+                    f"{accuracy} vs live {live_accuracy} on {len(holdout)} corrections"
+                )
+                return {**result, "version": self.nlp.model_version, "deployed": False}
+
+            self._save(model)
+            self.nlp.swap_model(model, version=model["version"])
+
+        print(f"✅ Online model {model['version']} learned from {learned} corrections")
+        return {**result, "version": model["version"], "deployed": True}
+
+    def rollback(self) -> Optional[str]:
+        """Restore the previous live model; further learning continues from it."""
+        with self._lock, self._file_lock():
+            self._sync()
+            version = self.nlp.rollback()
+            if version is None:
+                return None
+            # The cursor is kept, so rolled-back corrections are not replayed.
+            # Without an online model to continue from, the next step re-seeds.
+            engine = self.nlp.engine
+            bundle = engine.model if engine is not None else None
+            if _is_online(bundle):
+                self._model = {**bundle, "feedback_cursors": dict(self._cursors)}
+                self._model.pop("last_feedback_id", None)
+                self._save(self._model)
+            else:
+                self._model = None
+                self._remove()  # don't bring the rejected model back on restart (or on other workers)
+            return version
+
+    # ---------- BACKGROUND LOOP ----------
+
+    def start(
+        self,
+        session_factory: Callable[[], Session],
+        interval: float = ONLINE_LEARNING_INTERVAL,
+        sync_interval: float = ONLINE_MODEL_SYNC_SECONDS,
+    ) -> None:
+        """
+        Train every `interval` seconds on the leader (see startup.is_leader),
+        on each tenant's corrections in turn; serve.py workers also reload
+        the shared model file every `sync_interval` seconds.
+        """
+        train = interval > 0 and is_leader()
+        sync = sync_interval > 0 and worker_index() is not None
+        if not (train or sync) or self._thread is not None:
+            return
+        tick = min(interval if train else sync_interval, sync_interval if sync else interval)
+
+        def _loop():
+            next_step = time.monotonic() + interval
+            while not self._stop.wait(tick):
+                if sync:
+                    try:
+                        self.sync()
+                    except Exception as e:
+                        print("⚠️ Online model sync failed:", e)
+                if not train or time.monotonic() < next_step:
+                    continue
+                next_step = time.monotonic() + interval
+                for tenant in tenants.tenants():
+                    with tenant_context(tenant):
+                        self._step_tenant(session_factory)
+
+
+        self._thread = threading.Thread(target=_loop, name="online-learner", daemon=True)
+        self._thread.start()
+
+    def _step_tenant(self, session_factory: Callable[[], Session]) -> None:
+        tenant = current_tenant.get()
+        try:
+            tenants.ensure_initialised(tenant)
+            db = session_factory()
+            try:
+                self.step(db)
+            finally:
+                db.close()
+        except Exception as e:
+            print(f"⚠️ Online learning step failed for tenant '{tenant}':", e)
+
+    def stop(self) -> None:
+        self._stop.set()
@@ -1,10 +1,112 @@
 from __future__ import annotations
 
-from typing import Tuple
+import json
+import os
+import threading
+from typing import Dict, Optional, Tuple
 
+from sqlalchemy import case, func, update
 from sqlalchemy.orm import Session
 
-from db import Complaint
+from archive import archived_cohort_count
+from changes import log_selected
+from db import CLOSED_STATUSES, Complaint
+from tenancy import DEFAULT_TENANT, current_tenant
+
+
+# Weights used by compute_priority_score; chosen for explainability.
+# Approved overrides (see bulk_priority.apply_weights) live in a JSON file
+# per tenant, which every worker re-reads when it changes (see
+# priority_weights()).
+DEFAULT_WEIGHTS = {
+    "urgency": 0.35,
+    "population_impact": 0.25,
+    "vulnerability": 0.25,
+    "confidence": 0.15,
+}
+
+WEIGHTS_PATH = os.getenv(
+    "PRIORITY_WEIGHTS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "priority_weights.json"),
+)
+
+_weights_lock = threading.Lock()
+# tenant -> (mtime of its weights file when read, weights)
+_weights: Dict[str, Tuple[Optional[int], Dict[str, float]]] = {}
+
+
+def weights_path(tenant: Optional[str] = None) -> str:
+    """WEIGHTS_PATH for the default tenant, priority_weights_<tenant>.json next to it for the others."""
+    tenant = tenant or current_tenant.get()
+    if tenant == DEFAULT_TENANT:
+        return WEIGHTS_PATH
+    root, ext = os.path.splitext(WEIGHTS_PATH)
+    return f"{root}_{tenant}{ext}"
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def priority_weights() -> Dict[str, float]:
+    """The current tenant's live weights, reloaded if its file changed since the last call."""
+    tenant = current_tenant.get()
+    path = weights_path(tenant)
+    mtime = _mtime(path)
+    cached = _weights.get(tenant)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _weights_lock:
+        cached = _weights.get(tenant)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        weights = dict(DEFAULT_WEIGHTS)
+        try:
+            if mtime is not None:
+                with open(path, "r", encoding="utf-8") as f:
+                    weights.update({k: float(v) for k, v in json.load(f).items() if k in DEFAULT_WEIGHTS})
+        except Exception as e:
+            print("⚠️ Priority weights file load failed, keeping current weights:", str(e))
+            weights = cached[1] if cached is not None else dict(DEFAULT_WEIGHTS)
+        _weights[tenant] = (mtime, weights)
+        return weights
+
+
+def save_weights(weights: Dict[str, float]) -> None:
+    """Persist the current tenant's approved weights; other workers pick them up on their next priority_weights() call."""
+    tenant = current_tenant.get()
+    path = weights_path(tenant)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(weights, f, indent=2)
+    os.replace(tmp, path)  # readers never see a half-written file
+    with _weights_lock:
+        _weights[tenant] = (_mtime(path), {**DEFAULT_WEIGHTS, **weights})
+
+
+# Added to urgency at spike score 1 (see apply_spike).
+HOTSPOT_URGENCY_BOOST = float(os.getenv("HOTSPOT_URGENCY_BOOST", "0.3"))
+
+
+def normalize_weights(weights: Dict[str, float]) -> Dict[str, float]:
+    """
+    Validate proposed weights (missing keys keep their current value) and
+    scale them to sum to 1 so scores stay in [0, 1].
+    """
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown weight(s): {', '.join(sorted(unknown))}")
+
+    merged = {**priority_weights(), **{k: float(v) for k, v in weights.items()}}
+    if any(v < 0 for v in merged.values()):
+        raise ValueError("Weights must be non-negative")
+    total = sum(merged.values())
+    if total <= 0:
+        raise ValueError("At least one weight must be positive")
+    return {k: v / total for k, v in merged.items()}
 
 
 def compute_urgency(text: str) -> float:
@@ -40,24 +142,54 @@ def compute_urgency(text: str) -> float:
     return max(0.0, min(1.0, score))
 
 
-def compute_population_impact(db: Session, area: str | None, category: str | None) -> float:
+def apply_spike(urgency: float, spike: float) -> float:
+    """
+    Raise urgency for complaints in a cohort that is spiking right now
+    (spike score from hotspots.HotspotDetector, in [0, 1]).
+    """
+    return max(0.0, min(1.0, urgency + HOTSPOT_URGENCY_BOOST * spike))
+
+
+def compute_population_impact(
+    db: Session,
+    area: str | None,
+    category: str | None,
+    area_id: int | None = None,
+) -> float:
     """
     Estimate population impact based on count of similar complaints
-    in the same area and category.
+    in the same area and category (archived ones included).
+
+    When the canonical `area_id` is known, all spelling variants of the
+    area are counted together.
     """
-    if not area or not category:
+    if not (area or area_id is not None) or not category:
         return 0.3
 
+    return population_impact_for_count(cohort_size(db, area, category, area_id=area_id))
+
+
+def cohort_size(
+    db: Session,
+    area: str | None,
+    category: str | None,
+    area_id: int | None = None,
+) -> int:
+    """Number of complaints (hot and archived) in one (area, category) cohort."""
+    area_filter = Complaint.area_id == area_id if area_id is not None else Complaint.area == area
     count = (
         db.query(Complaint)
         .filter(
-            Complaint.area == area,
+            area_filter,
             Complaint.category == category,
         )
         .count()
     )
+    return count + archived_cohort_count(db, area, category, area_id=area_id)
+
 
-    # Map count to [0.2, 1.0] with a saturation
+def population_impact_for_count(count: int) -> float:
+    """Map a count of similar complaints to [0.2, 1.0] with a saturation."""
     if count == 0:
         return 0.2
     if count == 1:
@@ -115,18 +247,14 @@ def compute_priority_score(
     """
     Aggregate a final priority score [0, 1].
 
-    Weights are configurable; here chosen for explainability.
+    Weights are configurable via priority_weights().
     """
-    w_urgency = 0.35
-    w_population = 0.25
-    w_vulnerability = 0.25
-    w_confidence = 0.15
-
+    weights = priority_weights()
     score = (
-        w_urgency * urgency
-        + w_population * population_impact
-        + w_vulnerability * vulnerability
-        + w_confidence * model_confidence
+        weights["urgency"] * urgency
+        + weights["population_impact"] * population_impact
+        + weights["vulnerability"] * vulnerability
+        + weights["confidence"] * model_confidence
     )
     return max(0.0, min(1.0, score))
 
@@ -138,13 +266,17 @@ def evaluate_complaint(
     category: str,
     confidence: float,
     vulnerability_flags: dict | None = None,
+    area_id: int | None = None,
+    spike: float = 0.0,
 ) -> Tuple[float, float, float, float]:
     """
     Run the full priority pipeline and return:
     (urgency, population_impact, vulnerability, priority_score)
+
+    `spike` is the cohort's current hotspot score; it raises urgency.
     """
-    urgency = compute_urgency(text)
-    population_impact = compute_population_impact(db, area=area, category=category)
+    urgency = apply_spike(compute_urgency(text), spike)
+    population_impact = compute_population_impact(db, area=area, category=category, area_id=area_id)
     vulnerability = compute_vulnerability(text, flags=vulnerability_flags)
     priority_score = compute_priority_score(
         urgency=urgency,
@@ -155,3 +287,56 @@ def evaluate_complaint(
 
     return urgency, population_impact, vulnerability, priority_score
 
+
+def rescore_cohort(
+    db: Session,
+    area: str | None,
+    category: str | None,
+    area_id: int | None = None,
+    only_on_crossing: bool = True,
+) -> int:
+    """
+    Raise `population_impact` (and with it `priority_score`) of the open
+    complaints in one (area, category) cohort after it has grown.
+
+    Call after a complaint has been added to the cohort. Only does work
+    when the cohort size just crossed one of the population_impact_for_count
+    tiers, and then runs a single set-based UPDATE on the indexed cohort.
+    Idempotent: rows already at the new level are left alone. Pass
+    `only_on_crossing=False` to settle a cohort after bulk loads.
+
+    Returns the number of complaints re-scored.
+    """
+    if not (area or area_id is not None) or not category:
+        return 0
+
+    area_filter = Complaint.area_id == area_id if area_id is not None else Complaint.area == area
+    size = cohort_size(db, area, category, area_id=area_id)
+
+    # Each member sees the other (size - 1) complaints as "similar".
+    impact = population_impact_for_count(max(size - 1, 0))
+    if size < 2:
+        return 0
+    if only_on_crossing and impact == population_impact_for_count(size - 2):
+        return 0
+
+    # Shift the stored score by the population term alone, so scores that
+    # came from Gemini keep their other components untouched.
+    old_impact = func.coalesce(Complaint.population_impact, 0.0)
+    raised = func.coalesce(Complaint.priority_score, 0.0) + priority_weights()["population_impact"] * (impact - old_impact)
+
+    cohort = (
+        area_filter,
+        Complaint.category == category,
+        func.lower(func.coalesce(Complaint.status, "new")).notin_(CLOSED_STATUSES),
+        old_impact < impact,
+    )
+    new_score = case((raised > 1.0, 1.0), else_=raised)
+    log_selected(db, "rescored", *cohort, priority_score=new_score, population_impact=impact)
+    result = db.execute(
+        update(Complaint)
+        .where(*cohort)
+        .values(population_impact=impact, priority_score=new_score)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
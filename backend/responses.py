@@ -0,0 +1,81 @@
+"""
+Civisense Responses
+===================
+Lean JSON responses for payloads polled from slow mobile connections.
+
+- dumps() serialises with `orjson` when installed (several times faster
+  than the standard library, handles datetimes natively) and falls back
+  to `json`.
+- json_response() skips Pydantic re-validation and compresses bodies over
+  COMPRESS_MIN_BYTES with brotli (if the optional `brotli` package is
+  installed and the client accepts `br`) or gzip.
+"""
+
+import gzip
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # good ratio at gzip-like CPU cost
+
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS, default=_default)
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _accepted_encodings(request: Request) -> set:
+    accepted = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.lower())
+    return accepted
+
+
+def json_response(request: Request, payload: Any, status_code: int = 200) -> Response:
+    """Serialise `payload` and compress it if large enough and the client accepts it."""
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"}
+
+    if len(body) >= COMPRESS_MIN_BYTES:
+        accepted = _accepted_encodings(request)
+        if brotli is not None and "br" in accepted:
+            body = brotli.compress(body, quality=BROTLI_QUALITY)
+            headers["Content-Encoding"] = "br"
+        elif "gzip" in accepted:
+            body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def truncate(text: Optional[str], limit: Optional[int]) -> Optional[str]:
+    """Cut `text` to `limit` characters, marking the cut with an ellipsis."""
+    if text is None or not limit or len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + "…"
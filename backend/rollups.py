@@ -0,0 +1,305 @@
+"""
+Civisense Rollups
+=================
+Hourly pre-aggregates for trend analytics, so per-day / per-week volumes
+and time to resolution over a year are read from a few thousand rollup
+rows instead of a scan of `complaints`.
+
+- `rollup_hourly`: complaints created in each hour, by area, category and
+  current status. Intake adds to it, and status or category changes move
+  the complaint between rows, in the same transaction as the change.
+- `rollup_resolution_hourly`: complaints resolved in each hour, by area,
+  category and a log-spaced time-to-resolution bucket. Medians are
+  interpolated within a bucket, so they are approximate.
+- backfill() rebuilds both tables from `complaints` and
+  `complaints_archive`. Resolution history needs `resolved_at`, which is
+  only recorded from now on (and kept when a complaint is archived). Run it while intake is idle:
+  `python rollups.py --backfill`.
+- timeseries() merges the rows to hour / day / week / month. Each row
+  also stores its day, so coarser queries group by day in SQL and only
+  merge a few hundred rows per year in Python.
+"""
+
+import argparse
+import bisect
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, update
+from sqlalchemy.orm import Session
+
+from db import CLOSED_STATUSES, ArchivedComplaint, Complaint, HourlyRollup, ResolutionRollup
+
+
+GRANULARITIES = ("hour", "day", "week", "month")
+GROUP_BY = ("category", "area", "status")
+# Upper bounds (hours) of the time-to-resolution buckets; the last bucket is open-ended.
+DURATION_BOUNDS_HOURS = (1, 2, 4, 8, 12, 24, 48, 72, 120, 168, 336, 720, 1440, 4320)
+
+_RollupKey = Tuple[datetime, int, str, str]
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def duration_bucket(hours: float) -> int:
+    return bisect.bisect_left(DURATION_BOUNDS_HOURS, hours)
+
+
+def _norm_status(status: Optional[str]) -> str:
+    return (status or "new").strip().lower()
+
+
+def _is_closed(status: Optional[str]) -> bool:
+    return _norm_status(status) in CLOSED_STATUSES
+
+
+def _bump(db: Session, model, n: int, **key) -> None:
+    """Add `n` to the row identified by `key`, creating it if needed."""
+    if n == 0:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        stmt = upsert(model).values(count=n, day=key["hour"].replace(hour=0), **key)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=list(key), set_={"count": model.count + stmt.excluded.count}
+        ))
+        return
+
+    updated = db.execute(
+        update(model)
+        .where(*(getattr(model, k) == v for k, v in key.items()))
+        .values(count=model.count + n)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        db.execute(insert(model).values(count=n, day=key["hour"].replace(hour=0), **key))
+
+
+# ---------- INCREMENTAL MAINTENANCE (caller commits) ----------
+
+def record_created(db: Session, complaints: Iterable) -> None:
+    """Count new complaints (ORM objects or dicts with timestamp, area_id, category, status)."""
+    counts: Counter = Counter()
+    for c in complaints:
+        get = c.get if isinstance(c, dict) else lambda k, c=c: getattr(c, k)
+        ts = get("timestamp") or datetime.utcnow()
+        counts[(hour_of(ts), get("area_id") or 0, get("category") or "", _norm_status(get("status")))] += 1
+    for (hour, area_id, category, status), n in counts.items():
+        _bump(db, HourlyRollup, n, hour=hour, area_id=area_id, category=category, status=status)
+
+
+def record_change(
+    db: Session,
+    complaint: Complaint,
+    old_status: Optional[str] = None,
+    old_category: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> None:
+    """
+    Move `complaint` from its old (category, status) row to its current one,
+    and count it as resolved the first time it reaches a closed status.
+    """
+    if old_status is None:
+        old_status = complaint.status
+    if old_category is None:
+        old_category = complaint.category
+    hour = hour_of(complaint.timestamp or datetime.utcnow())
+    area_id = complaint.area_id or 0
+
+    old_key = (old_category or "", _norm_status(old_status))
+    new_key = (complaint.category or "", _norm_status(complaint.status))
+    if old_key != new_key:
+        _bump(db, HourlyRollup, -1, hour=hour, area_id=area_id, category=old_key[0], status=old_key[1])
+        _bump(db, HourlyRollup, 1, hour=hour, area_id=area_id, category=new_key[0], status=new_key[1])
+
+    if _is_closed(complaint.status) and not _is_closed(old_status) and complaint.resolved_at is None:
+        now = now or datetime.utcnow()
+        complaint.resolved_at = now
+        if complaint.timestamp is not None:
+            hours = max(0.0, (now - complaint.timestamp).total_seconds() / 3600.0)
+            _bump(
+                db, ResolutionRollup, 1,
+                hour=hour_of(now), area_id=area_id, category=complaint.category or "",
+                duration_bucket=duration_bucket(hours),
+            )
+
+
+# ---------- BACKFILL ----------
+
+def backfill(db: Session, chunk_size: int = 5000) -> Dict[str, int]:
+    """Rebuild both rollup tables from complaints and the archive."""
+    created: Counter = Counter()
+    resolved: Counter = Counter()
+
+    for model in (Complaint, ArchivedComplaint):
+        columns = (model.timestamp, model.area_id, model.category, model.status, model.resolved_at)
+        for ts, area_id, category, status, resolved_at in db.query(*columns).yield_per(chunk_size):
+            if ts is None:
+                continue
+            created[(hour_of(ts), area_id or 0, category or "", _norm_status(status))] += 1
+            if resolved_at is not None:
+                hours = max(0.0, (resolved_at - ts).total_seconds() / 3600.0)
+                resolved[(hour_of(resolved_at), area_id or 0, category or "", duration_bucket(hours))] += 1
+
+    db.execute(delete(HourlyRollup))
+    db.execute(delete(ResolutionRollup))
+    if created:
+        db.execute(insert(HourlyRollup), [
+            {"hour": h, "day": h.replace(hour=0), "area_id": a, "category": c, "status": s, "count": n}
+            for (h, a, c, s), n in created.items()
+        ])
+    if resolved:
+        db.execute(insert(ResolutionRollup), [
+            {"hour": h, "day": h.replace(hour=0), "area_id": a, "category": c, "duration_bucket": b, "count": n}
+            for (h, a, c, b), n in resolved.items()
+        ])
+    db.commit()
+    return {"hourly_rows": len(created), "resolution_rows": len(resolved)}
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(HourlyRollup.id).first() is None
+
+
+def has_source_rows(db: Session) -> bool:
+    """True if complaints or the archive hold anything to backfill from."""
+    return any(db.query(model.id).first() is not None for model in (Complaint, ArchivedComplaint))
+
+
+# ---------- QUERIES ----------
+
+def period_of(hour: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return hour
+    day = hour.replace(hour=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())  # ISO week, Monday first
+    return day.replace(day=1)
+
+
+def _median_hours(histogram: Dict[int, int]) -> Optional[float]:
+    total = sum(histogram.values())
+    if not total:
+        return None
+    half = total / 2.0
+    seen = 0
+    for b in sorted(histogram):
+        n = histogram[b]
+        if seen + n >= half:
+            low = DURATION_BOUNDS_HOURS[b - 1] if b > 0 else 0.0
+            high = DURATION_BOUNDS_HOURS[b] if b < len(DURATION_BOUNDS_HOURS) else low * 2
+            return round(low + (high - low) * (half - seen) / n, 2)
+        seen += n
+    return None
+
+
+def timeseries(
+    db: Session,
+    granularity: str = "day",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    area_ids: Optional[List[int]] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    group_by: Optional[str] = None,
+) -> List[dict]:
+    """
+    Complaint volume per period (optionally split by category, area id or
+    status), resolutions per period and their median time to resolution.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if group_by is not None and group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of {', '.join(GROUP_BY)}")
+
+    def _filtered(model, q):
+        # Coarse queries filter on whole days so they can use the covering index.
+        if granularity == "hour":
+            if since is not None:
+                q = q.filter(model.hour >= hour_of(since))
+            if until is not None:
+                q = q.filter(model.hour < until)
+        else:
+            if since is not None:
+                q = q.filter(model.day >= since.replace(hour=0, minute=0, second=0, microsecond=0))
+            if until is not None:
+                q = q.filter(model.day < until)
+        if area_ids is not None:
+            q = q.filter(model.area_id.in_(area_ids))
+        if category:
+            q = q.filter(model.category == category)
+        return q
+
+    periods: Dict[datetime, dict] = defaultdict(
+        lambda: {"count": 0, "resolved": 0, "histogram": Counter(), "groups": Counter()}
+    )
+    period_cache: Dict[datetime, datetime] = {}
+
+    def _period(bucket: datetime) -> dict:
+        period = period_cache.get(bucket)
+        if period is None:
+            period = period_cache[bucket] = period_of(bucket, granularity)
+        return periods[period]
+
+    time_col = HourlyRollup.hour if granularity == "hour" else HourlyRollup.day
+    group_col = {"category": HourlyRollup.category, "area": HourlyRollup.area_id, "status": HourlyRollup.status}.get(group_by)
+    cols = [time_col] + ([group_col] if group_col is not None else [])
+    q = _filtered(HourlyRollup, db.query(*cols, func.sum(HourlyRollup.count)))
+    if status:
+        q = q.filter(HourlyRollup.status == _norm_status(status))
+    for row in q.group_by(*cols):
+        p = _period(row[0])
+        p["count"] += int(row[-1] or 0)
+        if group_col is not None:
+            p["groups"][row[1]] += int(row[-1] or 0)
+
+    time_col = ResolutionRollup.hour if granularity == "hour" else ResolutionRollup.day
+    rq = _filtered(ResolutionRollup, db.query(time_col, ResolutionRollup.duration_bucket, func.sum(ResolutionRollup.count)))
+    for bucket_start, bucket, n in rq.group_by(time_col, ResolutionRollup.duration_bucket):
+        p = _period(bucket_start)
+        p["resolved"] += int(n or 0)
+        p["histogram"][bucket] += int(n or 0)
+
+    series = []
+    for period in sorted(periods):
+        p = periods[period]
+        point = {
+            "period": period,
+            "count": p["count"],
+            "resolved": p["resolved"],
+            "median_resolution_hours": _median_hours(p["histogram"]),
+        }
+        if group_col is not None:
+            point[group_by] = {k: v for k, v in p["groups"].items() if v}
+        series.append(point)
+    return series
+
+
+if __name__ == "__main__":
+    from db import SessionLocal, create_all
+    from tenancy import add_tenant_argument, cli_tenant_context
+
+    parser = argparse.ArgumentParser(description="Maintain the hourly analytics rollups.")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild rollups from all complaints.")
+    add_tenant_argument(parser)
+    args = parser.parse_args()
+
+    if args.backfill:
+        with cli_tenant_context(parser, args.tenant):
+            create_all()
+            session = SessionLocal()
+            try:
+                print("✅ Rollups rebuilt:", backfill(session))
+            finally:
+                session.close()
+    else:
+        parser.print_help()
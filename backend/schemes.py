@@ -1,6 +1,11 @@
+import heapq
 import json
+import math
 import os
-from typing import Tuple, Dict, List
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
 
 # ==========================
 # SAFE SCHEME LOADER
@@ -49,18 +54,16 @@ DEFAULT_SCHEMES = [
     },
 ]
 
-# Try loading JSON safely
-SCHEMES: List[Dict] = DEFAULT_SCHEMES
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEME_PATH = os.path.join(BASE_DIR, "schemes.json")
+SCHEME_TOP_K = int(os.getenv("SCHEME_TOP_K", "3"))
 
-try:
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    SCHEME_PATH = os.path.join(BASE_DIR, "schemes.json")
+# BM25 parameters and per-field weights (keywords are curated, so count double)
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = {"name": 1.0, "description": 1.0, "keywords": 2.0}
 
-    if os.path.exists(SCHEME_PATH):
-        with open(SCHEME_PATH, "r", encoding="utf-8") as f:
-            SCHEMES = json.load(f)
-except Exception as e:
-    print("⚠️ Schemes file load failed, using fallback schemes:", str(e))
+_TOKEN = re.compile(r"[a-z0-9]+")
 
 
 # ==========================
@@ -84,59 +87,192 @@ def _is_eligible(scheme: Dict, metadata: Dict) -> bool:
     return True
 
 
-def _keyword_score(text: str, keywords: List[str]) -> int:
-    t = text.lower()
-    return sum(1 for k in keywords if k.lower() in t)
+def _tokens(text: str) -> List[str]:
+    """Lower-case word tokens with plural 's' stripped ("hospitals" -> "hospital")."""
+    return [
+        t[:-1] if len(t) > 3 and t.endswith("s") and not t.endswith("ss") else t
+        for t in _TOKEN.findall(text.lower())
+    ]
+
+
+# ==========================
+# BM25 INDEX
+# ==========================
+
+class SchemeIndex:
+    """
+    Inverted index over scheme name, description and keywords. Each
+    posting holds the scheme's precomputed BM25 weight for the term, so a
+    query only touches the postings of its own words, not every scheme.
+    """
+
+    def __init__(self, schemes: List[Dict]):
+        self.schemes = schemes
+        self.by_category: Dict[str, List[int]] = defaultdict(list)
+        self.uncategorised: List[int] = []
+        self.categories: List[frozenset] = []
+        self.keyword_tokens: List[List[Tuple[str, frozenset]]] = []
+
+        docs: List[Counter] = []
+        for i, scheme in enumerate(schemes):
+            categories = [c.lower() for c in scheme.get("categories", [])]
+            for c in categories:
+                self.by_category[c].append(i)
+            if not categories:
+                self.uncategorised.append(i)
+            self.categories.append(frozenset(categories))
+
+            keywords = scheme.get("keywords", [])
+            self.keyword_tokens.append([(k, frozenset(_tokens(k))) for k in keywords])
+            tf: Counter = Counter()
+            for field, texts in (
+                ("name", [scheme.get("name", "")]),
+                ("description", [scheme.get("description") or ""]),
+                ("keywords", keywords),
+            ):
+                for text in texts:
+                    for token in _tokens(text):
+                        tf[token] += FIELD_WEIGHTS[field]
+            docs.append(tf)
+
+        n = len(docs)
+        avg_len = (sum(sum(tf.values()) for tf in docs) / n) if n else 0.0
+        df = Counter(token for tf in docs for token in tf)
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        for i, tf in enumerate(docs):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * sum(tf.values()) / avg_len) if avg_len else BM25_K1
+            for token, f in tf.items():
+                idf = math.log(1 + (n - df[token] + 0.5) / (df[token] + 0.5))
+                self.postings[token].append((i, idf * f * (BM25_K1 + 1) / (f + norm)))
+
+    def scores(self, text: str) -> Dict[int, float]:
+        """BM25 score of every scheme sharing a word with `text` (others score 0)."""
+        scores: Dict[int, float] = defaultdict(float)
+        for token in set(_tokens(text)):
+            for i, weight in self.postings.get(token, ()):
+                scores[i] += weight
+        return scores
+
+    def serves(self, i: int, category: str) -> bool:
+        """Whether scheme `i` is listed for `category` or open to every category."""
+        return not self.categories[i] or category in self.categories[i]
+
+    def candidates(self, category: str) -> List[int]:
+        """Schemes for `category` plus those open to every category, in file order."""
+        return sorted(self.by_category.get(category, []) + self.uncategorised)
+
+    def matched_keywords(self, i: int, text: str) -> List[str]:
+        words = set(_tokens(text))
+        return [k for k, tokens in self.keyword_tokens[i] if tokens and tokens <= words]
+
+
+_index_lock = threading.Lock()
+_index: SchemeIndex = SchemeIndex(DEFAULT_SCHEMES)
+_index_mtime: Optional[int] = None
+
+
+def scheme_index() -> SchemeIndex:
+    """The index for SCHEME_PATH, rebuilt when the file changes (fallback schemes if it is missing or invalid)."""
+    global _index, _index_mtime
+    try:
+        mtime = os.stat(SCHEME_PATH).st_mtime_ns
+    except OSError:
+        mtime = None
+    if mtime == _index_mtime:
+        return _index
+    with _index_lock:
+        if mtime != _index_mtime:
+            schemes = DEFAULT_SCHEMES
+            if mtime is not None:
+                try:
+                    with open(SCHEME_PATH, "r", encoding="utf-8") as f:
+                        schemes = json.load(f)
+                except Exception as e:
+                    print("⚠️ Schemes file load failed, using fallback schemes:", str(e))
+            _index, _index_mtime = SchemeIndex(schemes), mtime
+    return _index
+
+
+def metadata_from_flags(vulnerability_flags: Dict | None) -> Dict:
+    """Citizen attributes implied by the intake form's vulnerability flags."""
+    metadata = {}
+    if vulnerability_flags:
+        if vulnerability_flags.get("seniorCitizen"):
+            metadata["age"] = 70
+        if vulnerability_flags.get("lowIncome"):
+            metadata["income_group"] = "bpl"
+    return metadata
 
 
 # ==========================
 # MAIN ENGINE
 # ==========================
 
-def map_scheme(
+def rank_schemes(
     category: str,
     text: str,
-    area: str | None = None,
-    metadata: Dict | None = None
-) -> Tuple[str, str]:
+    metadata: Dict | None = None,
+    k: int = SCHEME_TOP_K,
+) -> List[Dict]:
+    """
+    Up to `k` eligible schemes for the category, best first, as
+    {"name", "score", "matched_keywords"}. If no scheme shares a word
+    with the text, the first eligible one in file order is returned.
+    """
     metadata = metadata or {}
     category = (category or "").lower()
-    text = (text or "").lower()
+    index = scheme_index()
 
-    candidates = []
+    # Only schemes sharing a word with the text have postings to score.
+    ranked = heapq.nsmallest(
+        max(1, k),
+        (
+            (score, i) for i, score in index.scores(text or "").items()
+            if index.serves(i, category) and _is_eligible(index.schemes[i], metadata)
+        ),
+        key=lambda x: (-x[0], x[1]),  # ties keep file order
+    )
+    if not ranked:
+        first = next((i for i in index.candidates(category) if _is_eligible(index.schemes[i], metadata)), None)
+        ranked = [] if first is None else [(0.0, first)]
 
-    for scheme in SCHEMES:
-        scheme_categories = [c.lower() for c in scheme.get("categories", [])]
-
-        if scheme_categories and category not in scheme_categories:
-            continue
+    return [
+        {
+            "name": index.schemes[i]["name"],
+            "score": round(score, 3),
+            "matched_keywords": index.matched_keywords(i, text or ""),
+        }
+        for score, i in ranked
+    ]
 
-        if not _is_eligible(scheme, metadata):
-            continue
 
-        score = _keyword_score(text, scheme.get("keywords", []))
-        candidates.append((score, scheme))
+def map_scheme(
+    category: str,
+    text: str,
+    area: str | None = None,
+    metadata: Dict | None = None,
+    k: int = SCHEME_TOP_K,
+) -> Tuple[str, str, List[Dict]]:
+    """Best scheme, its explanation, and the ranked top-k options (see rank_schemes)."""
+    options = rank_schemes(category, text, metadata, k)
 
-    if not candidates:
+    if not options:
         return (
             "General Grievance Redressal Cell",
-            "No matching welfare scheme found. Routed for manual government review."
+            "No matching welfare scheme found. Routed for manual government review.",
+            [],
         )
 
-    candidates.sort(key=lambda x: x[0], reverse=True)
-    best = candidates[0][1]
-
-    matched_keywords = [
-        k for k in best.get("keywords", [])
-        if k.lower() in text
-    ]
-
+    best = options[0]
     explanation = f"Matched scheme '{best['name']}'"
 
-    if matched_keywords:
-        explanation += " using keywords: " + ", ".join(matched_keywords[:5])
+    if best["matched_keywords"]:
+        explanation += " using keywords: " + ", ".join(best["matched_keywords"][:5])
+
+    if len(options) > 1:
+        explanation += ". Other options: " + ", ".join(o["name"] for o in options[1:])
 
     if area:
         explanation += f". Assigned to local authority for '{area}'."
 
-    return best["name"], explanation
+    return best["name"], explanation, options
@@ -0,0 +1,176 @@
+"""
+Civisense Full-Text Search
+==========================
+Indexed search over complaint text, kept in sync by the database itself:
+
+- SQLite: an external-content FTS5 table (`complaints_fts`) maintained by
+  insert/update/delete triggers on `complaints`.
+- PostgreSQL: a stored generated `tsvector` column with a GIN index.
+
+Ranking uses bm25 (SQLite) / ts_rank_cd (Postgres) and snippets come from
+snippet() / ts_headline().
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import text as sql
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from tenancy import current_tenant
+
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS complaints_fts
+    USING fts5(text, content='complaints', content_rowid='id', tokenize='unicode61')
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS complaints_fts_ai AFTER INSERT ON complaints BEGIN
+        INSERT INTO complaints_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS complaints_fts_ad AFTER DELETE ON complaints BEGIN
+        INSERT INTO complaints_fts(complaints_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS complaints_fts_au AFTER UPDATE OF text ON complaints BEGIN
+        INSERT INTO complaints_fts(complaints_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO complaints_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+_POSTGRES_DDL = [
+    """
+    ALTER TABLE complaints ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_complaints_search_vector ON complaints USING GIN (search_vector)",
+]
+
+# Tenant -> dialect, set by install_search_index(); missing or None means
+# only the LIKE fallback is usable in that tenant's database.
+_BACKEND: Dict[str, Optional[str]] = {}
+
+
+def install_search_index(engine: Engine) -> None:
+    """Create the FTS index and its sync triggers (for the current tenant) if they don't exist yet."""
+    tenant = current_tenant.get()
+    dialect = engine.dialect.name
+
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                existed = conn.execute(
+                    sql("SELECT 1 FROM sqlite_master WHERE name = 'complaints_fts'")
+                ).first()
+                for stmt in _SQLITE_DDL:
+                    conn.execute(sql(stmt))
+                if not existed:
+                    # Index rows that were inserted before the triggers existed
+                    conn.execute(sql("INSERT INTO complaints_fts(complaints_fts) VALUES ('rebuild')"))
+            elif dialect == "postgresql":
+                for stmt in _POSTGRES_DDL:
+                    conn.execute(sql(stmt))
+            else:
+                print(f"⚠️ Full-text search not supported on {dialect}, using LIKE fallback")
+                _BACKEND[tenant] = None
+                return
+        _BACKEND[tenant] = dialect
+    except Exception as e:
+        print("⚠️ Full-text index setup failed, using LIKE fallback:", e)
+        _BACKEND[tenant] = None
+
+
+def _fts5_query(q: str) -> str:
+    """Turn free text into a safe FTS5 query: every term quoted, all required."""
+    terms = re.findall(r"\w+", q, flags=re.UNICODE)
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def _filters(area_id: Optional[int], category: Optional[str], status: Optional[str]):
+    clauses, params = [], {}
+    if area_id is not None:
+        clauses.append("c.area_id = :area_id")
+        params["area_id"] = area_id
+    if category:
+        clauses.append("c.category = :category")
+        params["category"] = category
+    if status:
+        clauses.append("lower(c.status) = :status")
+        params["status"] = status.lower()
+    return "".join(f" AND {c}" for c in clauses), params
+
+
+def search_complaints(
+    db: Session,
+    q: str,
+    area_id: Optional[int] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[dict]:
+    """Ranked full-text search over complaint text with optional filters."""
+    where, params = _filters(area_id, category, status)
+    params.update({"limit": limit, "offset": offset})
+
+    backend = _BACKEND.get(current_tenant.get())
+    if backend == "sqlite":
+        match = _fts5_query(q)
+        if not match:
+            return []
+        params["q"] = match
+        stmt = f"""
+            SELECT c.id, c.area, c.category, c.status, c.priority_score, c.timestamp,
+                   bm25(complaints_fts) AS rank,
+                   snippet(complaints_fts, 0, '[', ']', '…', 12) AS snippet
+            FROM complaints_fts
+            JOIN complaints c ON c.id = complaints_fts.rowid
+            WHERE complaints_fts MATCH :q{where}
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """
+    elif backend == "postgresql":
+        params["q"] = q
+        stmt = f"""
+            SELECT c.id, c.area, c.category, c.status, c.priority_score, c.timestamp,
+                   ts_rank_cd(c.search_vector, query) AS rank,
+                   ts_headline('english', c.text, query,
+                               'StartSel=[, StopSel=], MaxWords=20, MinWords=5') AS snippet
+            FROM complaints c, websearch_to_tsquery('english', :q) AS query
+            WHERE c.search_vector @@ query{where}
+            ORDER BY rank DESC
+            LIMIT :limit OFFSET :offset
+        """
+    else:
+        # Unindexed fallback; only meant for databases without FTS support.
+        params["q"] = f"%{q}%"
+        stmt = f"""
+            SELECT c.id, c.area, c.category, c.status, c.priority_score, c.timestamp,
+                   0.0 AS rank, substr(c.text, 1, 160) AS snippet
+            FROM complaints c
+            WHERE c.text LIKE :q{where}
+            ORDER BY c.priority_score DESC
+            LIMIT :limit OFFSET :offset
+        """
+
+    rows = db.execute(sql(stmt), params).mappings().all()
+    return [
+        {
+            "id": r["id"],
+            "area": r["area"],
+            "category": r["category"],
+            "status": r["status"],
+            "priority_score": r["priority_score"],
+            "timestamp": r["timestamp"],
+            # bm25 is lower-is-better; flip it so higher always means more relevant
+            "rank": -float(r["rank"]) if backend == "sqlite" else float(r["rank"]),
+            "snippet": r["snippet"],
+        }
+        for r in rows
+    ]
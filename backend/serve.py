@@ -0,0 +1,237 @@
+"""
+Civisense Production Server
+===========================
+Pre-fork multi-worker entry point.
+
+- The parent imports the app once: the sklearn model, the NLP rule tables,
+  the scheme data and the regex cache are built here and frozen out of the
+  garbage collector (gc.freeze), then N workers are forked. Workers share
+  those pages copy-on-write instead of loading N private copies.
+- Each worker drops pooled DB connections inherited from the parent and
+  runs a warm-up pass through the NLP / priority / scheme pipeline before
+  it starts accepting on the shared socket, and takes its 1/N share of the
+  Gemini admission budget; its remaining startup tasks
+  then finish in the background (see startup.py).
+- Worker state (pid, starting / warming / ready, ready time) lives in a
+  shared array that GET /workers reports from any worker; the parent
+  restarts workers that die.
+
+Run with:  python serve.py --workers 4   (defaults: WEB_CONCURRENCY or cores, PORT or 8000)
+"""
+
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Dict, List, Optional
+
+
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "0")) or os.cpu_count() or 1
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+
+STATES = ("stopped", "starting", "warming", "ready")
+STOPPED, STARTING, WARMING, READY = range(len(STATES))
+_FIELDS = 3  # pid, state, ready_at
+
+WARMUP_TEXTS = [
+    "No water supply in our street for 5 days, elderly people are suffering",
+    "Big pothole on the main road causing accidents",
+    "Street light not working near the school",
+    "Garbage overflowing and sewage blocked, risk of outbreak",
+    "Pension not received for 3 months, below poverty line family",
+    "thanni varala, kuppai romba irukku",
+]
+
+
+class WorkerBoard:
+    """Per-worker state in shared memory, readable from every worker."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._slots = RawArray("d", workers * _FIELDS)
+
+    def set(self, index: int, state: int, pid: Optional[int] = None) -> None:
+        base = index * _FIELDS
+        if pid is not None:
+            self._slots[base] = pid
+        self._slots[base + 1] = state
+        self._slots[base + 2] = time.time() if state == READY else 0.0
+
+    def snapshot(self) -> List[Dict]:
+        out = []
+        for i in range(self.workers):
+            pid, state, ready_at = self._slots[i * _FIELDS:(i + 1) * _FIELDS]
+            out.append({
+                "worker": i,
+                "pid": int(pid) or None,
+                "state": STATES[int(state)],
+                "ready_since": ready_at or None,
+                **(_memory(int(pid)) if pid and state != STOPPED else {}),
+            })
+        return out
+
+
+def _memory(pid: int) -> Dict[str, float]:
+    """RSS and proportional set size (shared pages split across sharers), Linux only."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {
+        key + "_mb": round(int(fields[name].split()[0]) / 1024.0, 1)
+        for key, name in (("rss", "Rss"), ("pss", "Pss"))
+        if name in fields
+    }
+
+
+def warm_up(main) -> None:
+    """Run sample complaints through the local pipeline so every lazy path is built."""
+    from priority import compute_urgency, compute_vulnerability
+    from schemes import map_scheme
+
+    engine = main.nlp_engine
+    for text in WARMUP_TEXTS:
+        processed = engine.translate_input(text)
+        category, _ = engine.predict_category(text)
+        engine.analyze_full(processed)
+        compute_urgency(processed)
+        compute_vulnerability(processed)
+        map_scheme(category=category, text=processed, area=None, metadata={})
+
+
+def preload():
+    """Import and warm the app in the parent, then freeze it for copy-on-write sharing."""
+    import main
+    from startup import subsystems
+
+    # Schema setup runs once here so the workers' startup hooks don't race on
+    # DDL; the model is loaded here so every worker shares the same pages.
+    subsystems.run("database", "model")
+
+    warm_up(main)
+    gc.collect()
+    gc.freeze()  # keep the GC from touching (and so copying) the shared objects
+    return main
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(main, index: int, sock: socket.socket, board: WorkerBoard, log_level: str) -> None:
+    import uvicorn
+    from tenancy import tenants
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.environ["CIVISENSE_WORKER"] = str(index)
+
+    # Pooled connections were opened by the parent; never share them.
+    tenants.dispose_all(close=False)
+    # Each worker admits its 1/N of the Gemini quota.
+    main.gemini_admission.share(board.workers)
+
+    board.set(index, WARMING, pid=os.getpid())
+    warm_up(main)
+
+    config = uvicorn.Config(main.app, log_level=log_level, lifespan="on")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    os._exit(0)
+
+
+def serve(workers: int = WORKERS, host: str = HOST, port: int = PORT, log_level: str = "info") -> None:
+    if not hasattr(os, "fork") or workers <= 1:
+        import uvicorn
+
+        uvicorn.run("main:app", host=host, port=port, log_level=log_level)
+        return
+
+    sock = _bind(host, port)
+    board = WorkerBoard(workers)
+    main = preload()
+
+    main.app.state.worker_board = board
+
+    # Called once the worker's remaining startup tasks (task queue, Gemini
+    # client, online learner, ...) have finished.
+    def _mark_ready() -> None:
+        index = int(os.environ["CIVISENSE_WORKER"])
+        board.set(index, READY)
+        print(f"✅ Worker {index} (pid {os.getpid()}) ready")
+
+    from startup import subsystems
+
+    subsystems.on_ready(_mark_ready)
+
+    children: Dict[int, int] = {}  # pid -> worker index
+
+    def spawn(index: int) -> None:
+        board.set(index, STARTING, pid=0)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(main, index, sock, board, log_level)
+            finally:
+                os._exit(1)
+        children[pid] = index
+
+    stopping = False
+
+    def shutdown(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"🚀 Civisense on {host}:{port} with {workers} pre-forked workers (parent pid {os.getpid()})")
+    for i in range(workers):
+        spawn(i)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = children.pop(pid, None)
+        if index is None:
+            continue
+        board.set(index, STOPPED)
+        if not stopping:
+            print(f"⚠️ Worker {index} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(0.5)
+            spawn(index)
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run Civisense with pre-forked workers.")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    serve(args.workers, args.host, args.port, args.log_level)
@@ -0,0 +1,234 @@
+"""
+Civisense Shadow Evaluation
+===========================
+Runs a candidate engine (a new classifier bundle or a new Gemini prompt)
+on a sample of real complaints, off the request path, and records how
+often it agrees with the live result.
+
+- NLPEngine.observe_shadow() is called after the live decision is made;
+  it only draws a random number and hands the sample to a small thread
+  pool, so requests never wait on the candidate.
+- The pool is bounded: when `queue_size` samples are already pending the
+  new one is dropped (and counted) instead of applying backpressure.
+- Every finished sample is written to `shadow_samples`; summary() reports
+  agreement and candidate latency per candidate version.
+
+Configure with SHADOW_MODEL_PATH (joblib bundle) or SHADOW_PROMPT_PATH
+(system prompt text file), SHADOW_SAMPLE_RATE (0..1), SHADOW_QUEUE_SIZE
+and SHADOW_WORKERS.
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.orm import Session
+
+from db import ShadowSample
+
+
+SHADOW_MODEL_PATH = os.getenv("SHADOW_MODEL_PATH", "")
+SHADOW_PROMPT_PATH = os.getenv("SHADOW_PROMPT_PATH", "")
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0.1"))
+SHADOW_QUEUE_SIZE = int(os.getenv("SHADOW_QUEUE_SIZE", "64"))
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "2"))
+SUMMARY_WINDOW = 10000  # latest samples per version used for latency percentiles
+
+
+# ==========================
+# CANDIDATES
+# ==========================
+
+class ModelCandidate:
+    """A scikit-learn bundle in the same format as model.joblib."""
+
+    def __init__(self, model_path: str, translate: Callable[[str], str]):
+        import joblib
+        from nlp import CivisenseNLP
+
+        self.engine = CivisenseNLP(joblib.load(model_path))
+        self.translate = translate
+        self.version = "model:" + os.path.basename(model_path)
+
+    def predict(self, text: str, area: Optional[str], flags: Optional[dict]) -> Tuple[str, float]:
+        category, confidence, _ = self.engine.predict_category(self.translate(text))
+        return str(category), float(confidence)
+
+
+class PromptCandidate:
+    """The Gemini engine with a different system prompt."""
+
+    def __init__(self, prompt_path: str):
+        from gemini_engine import GeminiEngine
+
+        with open(prompt_path, "r", encoding="utf-8") as f:
+            self.engine = GeminiEngine(system_prompt=f.read())
+        self.version = "prompt:" + os.path.basename(prompt_path)
+
+    def predict(self, text: str, area: Optional[str], flags: Optional[dict]) -> Tuple[str, float]:
+        result = self.engine.analyze_complaint(text=text, area=area, vulnerability_flags=flags)
+        return result["category"], float(result["confidence"])
+
+
+# ==========================
+# RUNNER
+# ==========================
+
+class ShadowRunner:
+    def __init__(
+        self,
+        candidate,
+        session_factory: Callable[[], Session],
+        sample_rate: float = SHADOW_SAMPLE_RATE,
+        queue_size: int = SHADOW_QUEUE_SIZE,
+        workers: int = SHADOW_WORKERS,
+    ):
+        self.candidate = candidate
+        self.session_factory = session_factory
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        self._stats_lock = threading.Lock()
+        self.stats = {"sampled": 0, "dropped": 0, "completed": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls, nlp_engine, session_factory: Callable[[], Session]) -> Optional["ShadowRunner"]:
+        """Build the runner configured by SHADOW_* variables, or None if shadow mode is off."""
+        if SHADOW_SAMPLE_RATE <= 0 or not (SHADOW_MODEL_PATH or SHADOW_PROMPT_PATH):
+            return None
+        try:
+            if SHADOW_MODEL_PATH:
+                candidate = ModelCandidate(SHADOW_MODEL_PATH, nlp_engine.translate_input)
+            else:
+                candidate = PromptCandidate(SHADOW_PROMPT_PATH)
+        except Exception as e:
+            print("⚠️ Shadow candidate could not be loaded, shadow mode disabled:", e)
+            return None
+        print(f"✅ Shadow mode: {candidate.version} on {SHADOW_SAMPLE_RATE:.0%} of requests")
+        return cls(candidate, session_factory)
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def offer(
+        self,
+        text: str,
+        live_category: str,
+        live_version: str,
+        area: Optional[str] = None,
+        flags: Optional[dict] = None,
+        complaint_id: Optional[int] = None,
+    ) -> bool:
+        """Maybe queue one shadow comparison. Never blocks; returns True if queued."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        if not self._slots.acquire(blocking=False):
+            self._count("dropped")
+            return False
+        self._count("sampled")
+        try:
+            self._executor.submit(
+                contextvars.copy_context().run,  # record in the request's tenant database
+                self._run, text, live_category, live_version, area, flags, complaint_id,
+            )
+        except RuntimeError:  # executor shut down
+            self._slots.release()
+            return False
+        return True
+
+    def _run(self, text, live_category, live_version, area, flags, complaint_id) -> None:
+        try:
+            category = confidence = error = None
+            started = time.perf_counter()
+            try:
+                category, confidence = self.candidate.predict(text, area, flags)
+            except Exception as e:
+                error = str(e)[:500]
+            latency_ms = (time.perf_counter() - started) * 1000.0
+
+            db = self.session_factory()
+            try:
+                db.add(ShadowSample(
+                    complaint_id=complaint_id,
+                    live_version=live_version,
+                    candidate_version=self.candidate.version,
+                    live_category=live_category,
+                    candidate_category=category,
+                    candidate_confidence=confidence,
+                    agree=None if error else category == live_category,
+                    latency_ms=latency_ms,
+                    error=error,
+                ))
+                db.commit()
+            finally:
+                db.close()
+            self._count("failed" if error else "completed")
+        except Exception as e:
+            print("⚠️ Shadow sample could not be recorded:", e)
+            self._count("failed")
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ==========================
+# REPORTING
+# ==========================
+
+def _percentile(sorted_values: list, q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return round(sorted_values[idx], 2)
+
+
+def summary(db: Session, candidate_version: Optional[str] = None) -> Dict[str, dict]:
+    """Agreement and candidate latency per candidate version."""
+    query = db.query(
+        ShadowSample.candidate_version,
+        func.count(ShadowSample.id),
+        func.count(ShadowSample.agree),
+        func.sum(cast(ShadowSample.agree, Integer)),
+    ).group_by(ShadowSample.candidate_version)
+    if candidate_version:
+        query = query.filter(ShadowSample.candidate_version == candidate_version)
+
+    report: Dict[str, dict] = {}
+    for version, samples, answered, agreed in query.all():
+        latencies = sorted(
+            l for (l,) in db.query(ShadowSample.latency_ms)
+            .filter(ShadowSample.candidate_version == version)
+            .order_by(ShadowSample.id.desc())
+            .limit(SUMMARY_WINDOW)
+        )
+        disagreements = (
+            db.query(ShadowSample.live_category, ShadowSample.candidate_category, func.count(ShadowSample.id))
+            .filter(ShadowSample.candidate_version == version, ShadowSample.agree.is_(False))
+            .group_by(ShadowSample.live_category, ShadowSample.candidate_category)
+            .order_by(func.count(ShadowSample.id).desc())
+            .limit(10)
+            .all()
+        )
+        report[version] = {
+            "samples": samples,
+            "errors": samples - answered,
+            "agreement": round((agreed or 0) / answered, 4) if answered else None,
+            "latency_ms": {
+                "p50": _percentile(latencies, 0.50),
+                "p95": _percentile(latencies, 0.95),
+                "p99": _percentile(latencies, 0.99),
+                "max": round(latencies[-1], 2) if latencies else None,
+            },
+            "top_disagreements": [
+                {"live": live, "candidate": cand, "count": n} for live, cand, n in disagreements
+            ],
+        }
+    return report
@@ -0,0 +1,198 @@
+"""
+Civisense Startup
+=================
+Cold-start bookkeeping and lazy subsystem initialisation.
+
+- Import timing: from the moment this module is imported until startup
+  finishes, a thin wrapper around __import__ records how long each
+  top-level package took to import (its own time, nested packages are
+  counted separately).
+- Subsystems (database schema, task queue, ML model, Gemini client, ...)
+  are registered with @subsystems.task(name, after=...) and run in
+  parallel on a background thread started by the FastAPI startup hook, so
+  uvicorn binds the port straight away.
+- wait() lets requests block only on what they actually need (e.g. the
+  database); is_ready() / report() back the readiness and startup
+  endpoints.
+- worker_index() / is_leader() tell a serve.py worker which one it is, so
+  work that must happen once per deployment (online training) runs on
+  worker 0 only.
+"""
+
+import builtins
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+class ImportTimer:
+    def __init__(self):
+        self.times: Dict[str, float] = {}
+        self._local = threading.local()
+        self._original = None
+
+    def install(self) -> None:
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self) -> None:
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        # Relative imports belong to the package already being timed; modules
+        # already loaded are just a dict lookup.
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            top = name.partition(".")[0]
+            self.times[top] = self.times.get(top, 0.0) + elapsed - nested
+
+
+class Subsystems:
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self.imports = ImportTimer()
+        self.imports.install()
+        self.app_imported_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+        self._tasks: Dict[str, Tuple[Callable[[], None], Tuple[str, ...], bool]] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._status: Dict[str, dict] = {}
+        self._on_ready: List[Callable[[], None]] = []
+        self._thread: Optional[threading.Thread] = None
+
+    def _ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000.0, 1)
+
+    # ---------- REGISTRATION ----------
+
+    def task(self, name: str, after: Iterable[str] = (), required: bool = True):
+        """Register `fn` as a startup task that runs once its dependencies are done."""
+        def decorator(fn: Callable[[], None]):
+            self._tasks[name] = (fn, tuple(after), required)
+            self._done[name] = threading.Event()
+            self._status[name] = {"state": "pending", "required": required}
+            return fn
+        return decorator
+
+    def on_ready(self, callback: Callable[[], None]) -> None:
+        self._on_ready.append(callback)
+
+    def app_imported(self) -> None:
+        """Called at the end of main.py so the report separates import from init."""
+        self.app_imported_ms = self._ms()
+
+    # ---------- EXECUTION ----------
+
+    def _run(self, name: str) -> None:
+        if self._done[name].is_set():  # already run synchronously via run()
+            return
+        fn, after, _ = self._tasks[name]
+        status = self._status[name]
+        try:
+            for dep in after:
+                self._done[dep].wait()
+                if self._status[dep]["state"] != "ready":
+                    raise RuntimeError(f"dependency '{dep}' failed")
+            status.update(state="running", started_ms=self._ms())
+            started = time.perf_counter()
+            fn()
+            status.update(state="ready", took_ms=round((time.perf_counter() - started) * 1000.0, 1))
+        except Exception as e:
+            status.update(state="failed", error=str(e))
+            print(f"⚠️ Startup task '{name}' failed:", e)
+        finally:
+            self._done[name].set()
+
+    def _run_all(self) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, len(self._tasks)), thread_name_prefix="startup") as pool:
+            list(pool.map(self._run, list(self._tasks)))
+
+        self.ready_ms = self._ms()
+        self.imports.uninstall()
+        slowest = sorted(
+            ((n, s.get("took_ms", 0.0)) for n, s in self._status.items()), key=lambda kv: -kv[1]
+        )[:3]
+        print(
+            f"✅ Startup complete in {self.ready_ms:.0f} ms "
+            f"(app import {self.app_imported_ms or 0:.0f} ms; "
+            + ", ".join(f"{n} {ms:.0f} ms" for n, ms in slowest) + ")"
+        )
+        for callback in self._on_ready:
+            callback()
+
+    def start(self) -> None:
+        """Run every registered task in the background; returns immediately."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_all, name="startup", daemon=True)
+            self._thread.start()
+
+    def run(self, *names: str) -> None:
+        """Run the given tasks synchronously now (e.g. before forking workers)."""
+        for name in names:
+            if not self._done[name].is_set():
+                self._run(name)
+
+    # ---------- QUERIES ----------
+
+    def wait(self, names: Iterable[str], timeout: Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._done[name].wait(remaining):
+                return False
+        return True
+
+    def is_done(self, names: Iterable[str]) -> bool:
+        return all(self._done[n].is_set() for n in names)
+
+    def is_ready(self) -> bool:
+        return all(
+            self._done[name].is_set() and (not required or self._status[name]["state"] == "ready")
+            for name, (_, _, required) in self._tasks.items()
+        )
+
+    def status(self) -> Dict[str, dict]:
+        return {name: dict(s) for name, s in self._status.items()}
+
+    def report(self, top: int = 25) -> dict:
+        imports = sorted(self.imports.times.items(), key=lambda kv: -kv[1])
+        return {
+            "app_import_ms": self.app_imported_ms,
+            "ready_ms": self.ready_ms,
+            "imports_ms": {name: round(s * 1000.0, 1) for name, s in imports[:top]},
+            "init": self.status(),
+        }
+
+
+subsystems = Subsystems()
+
+
+def worker_index() -> Optional[int]:
+    """This process's serve.py worker number, or None when running as a single process."""
+    value = os.getenv("CIVISENSE_WORKER")
+    return int(value) if value else None
+
+
+def is_leader() -> bool:
+    """True in a single process and in serve.py worker 0."""
+    return worker_index() in (None, 0)
@@ -0,0 +1,443 @@
+"""
+Civisense Tamil Normaliser
+==========================
+Lets the local pipeline (sklearn model + rule scorers) read complaints
+written in Tamil script, which `translate_input`'s Tanglish map and the
+English TF-IDF vocabulary cannot, so they no longer depend on Gemini.
+
+- A lexicon of Tamil stems maps words to the English keywords the
+  category rules, urgency / vulnerability / population scorers and the
+  model already know ("தண்ணீர் வரவில்லை" -> "water no water"). Tamil
+  is agglutinative, so most entries are stems that match any suffix
+  ("சாலையில்", "சாலைகள்"); short or ambiguous words match exactly.
+- Each category term also votes for its category; the rule fallback
+  uses the most voted category (tamil_category), and its rule keyword is
+  appended for the model, so a complaint "about water, on our road"
+  still reads as Water.
+- Words outside the lexicon are transliterated to Tanglish-style Latin
+  (ISO 15919 simplified: "குப்பை" -> "kuppai"), so the existing
+  Tanglish keywords still apply.
+- The lexicon is compiled once into dicts of stems and exact words;
+  normalising a complaint is a few dict lookups per word (well under a
+  millisecond).
+
+With TAMIL_LOCAL_ONLY (default on), intake skips Gemini for Tamil-script
+complaints the lexicon can categorise.
+
+Measure accuracy on the labelled set with:
+  python tamil.py --eval ../ai/tamil_eval.csv
+"""
+
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+TAMIL_LOCAL_ONLY = os.getenv("TAMIL_LOCAL_ONLY", "1").lower() in ("1", "true", "yes")
+
+
+# ---------- TRANSLITERATION ----------
+
+_VOWELS = {
+    "அ": "a", "ஆ": "aa", "இ": "i", "ஈ": "ee", "உ": "u", "ஊ": "oo", "எ": "e",
+    "ஏ": "ae", "ஐ": "ai", "ஒ": "o", "ஓ": "o", "ஔ": "au", "ஃ": "h",
+}
+_CONSONANTS = {
+    "க": "k", "ங": "ng", "ச": "s", "ஜ": "j", "ஞ": "nj", "ட": "d", "ண": "n",
+    "த": "th", "ந": "n", "ன": "n", "ப": "p", "ம": "m", "ய": "y", "ர": "r",
+    "ற": "r", "ல": "l", "ள": "l", "ழ": "zh", "வ": "v", "ஶ": "sh", "ஷ": "sh",
+    "ஸ": "s", "ஹ": "h",
+}
+_SIGNS = {
+    "ா": "aa", "ி": "i", "ீ": "ee", "ு": "u", "ூ": "oo", "ெ": "e", "ே": "ae",
+    "ை": "ai", "ொ": "o", "ோ": "o", "ௌ": "au", "ௗ": "",
+}
+_VIRAMA = "்"
+# Consonant + pulli + consonant clusters in common Tanglish spelling:
+# doubled stops (க்க, ட்ட, ற்ற) and nasal + voiced stop (ங்க, ந்த, ம்ப).
+_CLUSTERS = {
+    "கக": "kk", "சச": "ch", "டட": "tt", "தத": "tth", "பப": "pp", "றற": "tr",
+    "ஙக": "ng", "ஞச": "nj", "ணட": "nd", "நத": "ndh", "மப": "mb", "னற": "ndr",
+}
+# A consonant with a pulli (no vowel) where Tanglish uses the unvoiced form.
+_DEAD = {"ட": "t", "ற": "t"}
+_DIGITS = str.maketrans("௦௧௨௩௪௫௬௭௮௯", "0123456789")
+
+_TAMIL_CHAR = re.compile(r"[஀-௿]")
+_TOKENS = re.compile(r"[஀-௿]+|[^஀-௿]+")
+
+
+def has_tamil(text: Optional[str]) -> bool:
+    return bool(text) and _TAMIL_CHAR.search(text) is not None
+
+
+def transliterate(text: str) -> str:
+    """Tamil script to Tanglish-style Latin; other characters are kept."""
+    text = text.translate(_DIGITS)
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in _CONSONANTS:
+            second = text[i + 2:i + 3] if text[i + 1:i + 2] == _VIRAMA else ""
+            cluster = _CLUSTERS.get(ch + second) or (_CONSONANTS[ch] * 2 if second == ch else None)
+            if cluster:
+                base = cluster
+                i += 2  # continue at the second consonant
+            else:
+                base = _CONSONANTS[ch]
+            sign = text[i + 1:i + 2]
+            if sign == _VIRAMA:
+                out.append(base if cluster else _DEAD.get(ch, base))
+                i += 2
+            elif sign in _SIGNS:
+                out.append(base + _SIGNS[sign])
+                i += 2
+            else:
+                out.append(base + "a")
+                i += 1
+        else:
+            out.append(_VOWELS.get(ch, "" if ch in _SIGNS or ch == _VIRAMA else ch))
+            i += 1
+    return "".join(out)
+
+
+# ---------- LEXICON ----------
+
+# (Tamil, English keywords, category). A trailing "*" matches any suffix;
+# a space matches with or without whitespace ("தெரு விளக்கு" / "தெருவிளக்கு").
+LEXICON: List[Tuple[str, str, Optional[str]]] = [
+    # Water
+    ("தண்ணீர*", "water", "Water"),
+    ("தண்ணி*", "water", "Water"),
+    ("குடிநீர*", "drinking water", "Water"),
+    ("நீர்", "water", "Water"),
+    ("குழாய*", "pipe", "Water"),
+    ("பைப்லைன*", "pipeline", "Water"),
+    ("பைப*", "pipe", "Water"),
+    ("டேங்கர*", "tanker", "Water"),
+    ("லாரி தண்ணீர*", "water tanker", "Water"),
+    ("கிணற*", "well", "Water"),
+    ("கிணறு", "well", "Water"),
+    ("போர்வெல*", "borewell", "Water"),
+    ("ஆழ்துளை*", "borewell", "Water"),
+    ("நீர்த்தேக்க*", "water tank", "Water"),
+    ("தொட்டி*", "tank", None),
+    ("மோட்டார*", "motor", None),
+
+    # Roads
+    ("சாலை*", "road", "Roads"),
+    ("ரோட*", "road", "Roads"),
+    ("பள்ளம்", "pothole", "Roads"),
+    ("பள்ளத்*", "pothole", "Roads"),
+    ("பள்ளங்க*", "potholes", "Roads"),
+    ("குழி*", "pothole", "Roads"),
+    ("குண்டும் குழியும*", "potholes", "Roads"),
+    ("பாலம்", "bridge", "Roads"),
+    ("பாலத்*", "bridge", "Roads"),
+    ("நடைபாதை*", "footpath", "Roads"),
+    ("வேகத்தடை*", "speed breaker", "Roads"),
+    ("போக்குவரத்*", "traffic", "Roads"),
+    ("தெரு*", "lane", None),  # usually where the problem is, not what it is
+
+    # Electricity
+    ("மின்*", "electricity", "Electricity"),
+    ("மின்வெட்ட*", "power cut", "Electricity"),
+    ("மின்கம்ப*", "electric pole", "Electricity"),
+    ("மின் கம்பி*", "electric wire", "Electricity"),
+    ("மின்னழுத்த*", "voltage", "Electricity"),
+    ("கரண்ட*", "electricity", "Electricity"),
+    ("விளக்க*", "light", "Electricity"),
+    ("விளக்கு*", "light", "Electricity"),
+    ("தெரு விளக்க*", "light", "Electricity"),
+    ("தெரு விளக்கு*", "light", "Electricity"),
+    ("டிரான்ஸ்பார்மர*", "transformer", "Electricity"),
+    ("வயர*", "wire", "Electricity"),
+
+    # Health
+    ("மருத்துவமனை*", "hospital", "Health"),
+    ("மருத்துவ*", "medical", "Health"),
+    ("மருத்துவர*", "doctor", "Health"),
+    ("டாக்டர*", "doctor", "Health"),
+    ("மருந்த*", "medicine", "Health"),
+    ("மருந்து*", "medicine", "Health"),
+    ("ஆஸ்பத்திரி*", "hospital", "Health"),
+    ("ஆம்புலன்ஸ*", "ambulance", "Health"),
+    ("சுகாதார நிலைய*", "health centre", "Health"),
+    ("காய்ச்சல*", "fever", "Health"),
+    ("டெங்கு*", "dengue", "Health"),
+    ("கொசு*", "mosquito", "Health"),
+    ("காலரா*", "cholera outbreak", "Health"),
+    ("சிகிச்சை*", "treatment", "Health"),
+    ("தடுப்பூசி*", "vaccine", "Health"),
+    ("பிரசவ*", "delivery", "Health"),
+
+    # Welfare
+    ("ரேஷன*", "ration", "Welfare"),
+    ("ரேசன*", "ration", "Welfare"),
+    ("நியாய விலை*", "ration shop", "Welfare"),
+    ("உதவித்தொகை*", "pension", "Welfare"),
+    ("கல்வி உதவித்தொகை*", "scholarship", "Welfare"),
+    ("முதியோர் உதவித்தொகை*", "old age pension", "Welfare"),
+    ("ஓய்வூதிய*", "pension", "Welfare"),
+    ("பென்ஷன*", "pension", "Welfare"),
+    ("பென்சன*", "pension", "Welfare"),
+    ("உரிமைத் தொகை*", "entitlement pension", "Welfare"),
+    ("உரிமைத்தொகை*", "entitlement pension", "Welfare"),
+    ("அரிசி*", "rice", "Welfare"),
+
+    # Sanitation
+    ("குப்பை*", "garbage", "Sanitation"),
+    ("கழிவுநீர*", "sewage", "Sanitation"),
+    ("கழிவு*", "waste", "Sanitation"),
+    ("சாக்கடை*", "sewage drainage", "Sanitation"),
+    ("வடிகால*", "drainage", "Sanitation"),
+    ("கால்வாய*", "drain", "Sanitation"),
+    ("கழிப்பறை*", "toilet", "Sanitation"),
+    ("கழிவறை*", "toilet", "Sanitation"),
+    ("துர்நாற்ற*", "bad smell", "Sanitation"),
+    ("சுத்தம*", "cleaning", None),
+
+    # Housing
+    ("வீடு", "house", "Housing"),
+    ("வீட்டு*", "house", "Housing"),
+    ("வீட்டி*", "house", "Housing"),
+    ("வீடுகள*", "households", "Housing"),
+    ("வீட்டுவசதி*", "housing", "Housing"),
+    ("வீட்டுமனை*", "house site", "Housing"),
+    ("குடிசை*", "hut", "Housing"),
+    ("கட்டட*", "building construction", "Housing"),
+    ("கட்டிட*", "building construction", "Housing"),
+    ("கட்டுமான*", "construction", "Housing"),
+    ("கூரை*", "roof", "Housing"),
+    ("பட்டா*", "patta", "Housing"),
+    ("குடியிருப்*", "residence", "Housing"),
+    ("அடுக்குமாடி*", "apartment", "Housing"),
+
+    # Urgency
+    ("அவசர*", "emergency urgent", None),
+    ("உடனடி*", "immediately", None),
+    ("உடனே", "immediately", None),
+    ("ஆபத்த*", "danger", None),
+    ("அபாய*", "danger", None),
+    ("உயிருக்கு ஆபத்த*", "life threatening", None),
+    ("விபத்த*", "accident", None),
+    ("வெள்ளம்", "flood", None),
+    ("வெள்ளத்*", "flood", None),
+    ("வெள்ளப்*", "flood", None),
+    ("தீ", "fire", None),
+    ("தீப்பிடி*", "fire", None),
+    ("தீப்பொறி*", "fire", None),
+    ("தீவிபத்த*", "fire accident", None),
+    ("இடிந்த*", "collapsed", None),
+    ("சரிந்த*", "collapsed", None),
+    ("உடைந்த*", "broken", None),
+    ("உடைப்ப*", "broken", None),
+    ("வெடித்த*", "burst", None),
+    ("சேதம*", "damaged", None),
+    ("பழுத*", "damaged", None),
+    ("நிரம்பி வழி*", "overflowing", None),
+    ("மழைக்கால*", "monsoon", None),
+    ("மழை*", "rain", None),
+    ("மழைநீர*", "rain", None),
+    ("இரவ*", "night", None),
+    ("நிறுத்த*", "stopped", None),
+
+    # Vulnerability
+    ("முதியவர*", "elderly senior citizen", None),
+    ("முதியோர*", "senior citizen", None),
+    ("வயதான*", "old age", None),
+    ("மூத்த குடிமக்கள*", "senior citizens", None),
+    ("கர்ப்பிணி*", "pregnant", None),
+    ("மாற்றுத்திறனாளி*", "disabled", None),
+    ("ஊனமுற்ற*", "disabled", None),
+    ("குழந்தை*", "children", None),
+    ("பிள்ளைகள*", "children", None),
+    ("பள்ளி*", "school", None),
+    ("விதவை*", "widow", None),
+    ("ஆதரவற்ற*", "orphan", None),
+    ("அனாதை*", "orphan", None),
+    ("கூலி*", "daily wage", None),
+    ("தினக்கூலி*", "daily wage", None),
+    ("குடிசைப் பகுதி*", "slum", None),
+    ("புலம்பெயர்*", "migrant", None),
+
+    # Population and time
+    ("அனைவரு*", "all residents", None),
+    ("எல்லோரு*", "all residents", None),
+    ("முழுவது*", "entire area", None),
+    ("மக்கள*", "people", None),
+    ("குடும்பங்க*", "families", None),
+    ("பல குடும்ப*", "multiple families", None),
+    ("நாட்க*", "days", None),
+    ("நாள*", "days", None),
+    ("வாரம்", "weeks", None),
+    ("வாரமாக*", "weeks", None),
+    ("வாரங்க*", "weeks", None),
+    ("மாதம்", "months", None),
+    ("மாதமாக*", "months", None),
+    ("மாதங்க*", "months", None),
+    ("மணி நேர*", "hours", None),
+    ("ஒரு", "1", None),
+    ("இரண்டு", "2", None),
+    ("மூன்று", "3", None),
+    ("நான்கு", "4", None),
+    ("ஐந்து", "5", None),
+    ("பத்து", "10", None),
+    ("நூறு", "100", None),
+]
+
+# Rule keyword appended for the category most voted by the lexicon.
+CATEGORY_KEYWORDS = {
+    "Water": "water",
+    "Roads": "road",
+    "Electricity": "electricity",
+    "Health": "hospital",
+    "Welfare": "pension",
+    "Sanitation": "sanitation",
+    "Housing": "housing",
+}
+
+# "X இல்லை" / "X வரவில்லை" (X is not there / not coming) -> "no X".
+_NEGATIONS = frozenset({"இல்லை", "இல்ல", "வரல", "இல்லாமல்"})
+_NEGATION_SUFFIX = "ில்லை"
+_MIN_STEM = 2
+
+_Entry = Tuple[str, Optional[str]]
+
+
+def _compile(lexicon) -> Tuple[Dict[str, _Entry], Dict[str, _Entry], int]:
+    stems: Dict[str, _Entry] = {}
+    exact: Dict[str, _Entry] = {}
+    for tamil, english, category in lexicon:
+        key = tamil.replace(" ", "")
+        if key.endswith("*"):
+            stems[key[:-1]] = (english, category)
+        else:
+            exact[key] = (english, category)
+    return stems, exact, max(len(k) for k in stems)
+
+
+_STEMS, _EXACT, _MAX_STEM = _compile(LEXICON)
+
+
+def _lookup(word: str) -> Tuple[int, Optional[_Entry]]:
+    """(characters matched, entry) for the longest lexicon match at the start of `word`."""
+    entry = _EXACT.get(word)
+    if entry is not None:
+        return len(word), entry
+    for k in range(min(len(word), _MAX_STEM), _MIN_STEM - 1, -1):
+        entry = _STEMS.get(word[:k])
+        if entry is not None:
+            return k, entry
+    return 0, None
+
+
+def _is_negation(word: str) -> bool:
+    return word in _NEGATIONS or word.endswith(_NEGATION_SUFFIX)
+
+
+@lru_cache(maxsize=4096)
+def _normalize(text: str) -> Tuple[str, Optional[str]]:
+    tokens = _TOKENS.findall(text.translate(_DIGITS))
+    out: List[str] = []
+    votes: Counter = Counter()
+    latest: Dict[str, int] = {}  # category -> position of its last vote
+    last_hit: Optional[str] = None  # English of the previous Tamil word, if it was a lexicon hit
+
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if not _TAMIL_CHAR.match(token):
+            out.append(token)
+            i += 1
+            continue
+
+        # Two-word entries ("தெரு விளக்கு") first: the match must run into the next word.
+        entry = None
+        if i + 2 < len(tokens) and tokens[i + 1].isspace() and _TAMIL_CHAR.match(tokens[i + 2]):
+            matched, entry = _lookup(token + tokens[i + 2])
+            if matched > len(token) and entry is not None:
+                i += 2
+            else:
+                entry = None
+        if entry is None:
+            _, entry = _lookup(token)
+
+        if entry is not None:
+            english, category = entry
+            out.append(english)
+            if category:
+                votes[category] += 1
+                latest[category] = i
+            last_hit = english
+        elif _is_negation(token):
+            out.append(f"no {last_hit.split()[-1]}" if last_hit else "not working")
+            last_hit = None
+        else:
+            out.append(transliterate(token))
+            last_hit = None
+        i += 1
+
+    # Ties go to the later term: Tamil is verb-final, the problem comes last.
+    category = max(votes, key=lambda c: (votes[c], latest[c])) if votes else None
+    if category:
+        out.append(" " + CATEGORY_KEYWORDS[category])
+    return "".join(out), category
+
+
+def normalize(text: str) -> str:
+    """English keywords (and transliteration) for the Tamil-script words in `text`."""
+    if not has_tamil(text):
+        return text
+    return _normalize(text)[0]
+
+
+def tamil_category(text: str) -> Optional[str]:
+    """Category most supported by the lexicon, or None if `text` has no Tamil category terms."""
+    if not has_tamil(text):
+        return None
+    return _normalize(text)[1]
+
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+    import time
+
+    from nlp import NLPEngine
+
+    parser = argparse.ArgumentParser(description="Tamil-script normalisation for the local NLP pipeline.")
+    parser.add_argument("text", nargs="?", help="Print the normalised form of this text.")
+    parser.add_argument("--eval", metavar="CSV", help="Labelled set (complaint_text,category) to score.")
+    args = parser.parse_args()
+
+    if args.text:
+        print(normalize(args.text))
+    if args.eval:
+        engine = NLPEngine(use_gemini=False)
+        with open(args.eval, newline="", encoding="utf-8") as f:
+            rows = [(r["complaint_text"], r["category"]) for r in csv.DictReader(f)]
+
+        correct: Counter = Counter()
+        totals: Counter = Counter()
+        latencies = []
+        for text, label in rows:
+            started = time.perf_counter()
+            predicted, _ = engine.predict_category(text)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            _normalize.cache_clear()  # time cold lookups
+            totals[label] += 1
+            correct[label] += predicted == label
+
+        latencies.sort()
+        print(f"Engine: {engine.model_version}")
+        print(f"Accuracy: {sum(correct.values())}/{len(rows)} = {sum(correct.values()) / len(rows):.1%}")
+        for label in sorted(totals):
+            print(f"  {label:<12} {correct[label]}/{totals[label]}")
+        print(
+            f"Latency per complaint: p50 {latencies[len(latencies) // 2]:.2f} ms, "
+            f"max {latencies[-1]:.2f} ms"
+        )
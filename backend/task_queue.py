@@ -0,0 +1,281 @@
+"""
+Civisense Task Queue
+====================
+In-process index of open complaints ordered by priority, so officers can
+ask for "the next most urgent complaint in my area" without sorting the
+complaints table.
+
+Every queued complaint sits in four binary heaps keyed by
+(area_id, category), (area_id, *), (*, category) and (*, *), so next/claim
+with any combination of filters is O(log n). Updates use lazy deletion:
+stale heap entries are skipped when they surface and heaps are compacted
+once they are mostly garbage.
+
+The database stays the source of truth. The queue is rebuilt from it at
+startup and, before every read, catches up on the change log (changes.py)
+so complaints created, claimed, re-scored or archived by other workers are
+seen too. This worker's own writes are applied at once. Claims are made
+atomic across processes by a conditional status UPDATE.
+"""
+
+import heapq
+import itertools
+import threading
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from changes import CHANGES_MAX_LIMIT, CursorExpired, log_change, read_changes
+from db import CLOSED_STATUSES, ChangeEvent, Complaint
+from rollups import record_change
+from tenancy import TenantLocal
+
+
+ANY = "*"
+# Statuses (lower-cased) that take a complaint out of the queue.
+DEQUEUED_STATUSES = CLOSED_STATUSES + ("assigned", "in_progress")
+CLAIMED_STATUS = "assigned"
+
+_Key = Tuple[object, object]
+
+
+def is_queued_status(status: Optional[str]) -> bool:
+    return (status or "new").lower() not in DEQUEUED_STATUSES
+
+
+class TaskQueue:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heaps: Dict[_Key, list] = {}
+        self._live: Dict[_Key, int] = {}
+        # complaint id -> (version, keys) of its current heap entries
+        self._entries: Dict[int, Tuple[int, Tuple[_Key, ...]]] = {}
+        self._versions = itertools.count()
+        self._refresh_lock = threading.Lock()
+        self._cursor: Optional[int] = None  # last change-log id applied
+
+    # ---------- INTERNALS ----------
+
+    @staticmethod
+    def _keys(area_id: Optional[int], category: Optional[str]) -> Tuple[_Key, ...]:
+        return ((area_id, category), (area_id, ANY), (ANY, category), (ANY, ANY))
+
+    def _discard(self, complaint_id: int) -> None:
+        entry = self._entries.pop(complaint_id, None)
+        if entry:
+            for key in entry[1]:
+                self._live[key] -= 1
+
+    def _compact(self, key: _Key) -> None:
+        heap = self._heaps[key]
+        if len(heap) > 2 * self._live[key] + 64:
+            heap[:] = [e for e in heap if self._is_current(e)]
+            heapq.heapify(heap)
+
+    def _is_current(self, item) -> bool:
+        entry = self._entries.get(item[2])
+        return entry is not None and entry[0] == item[3]
+
+    def _top(self, key: _Key):
+        heap = self._heaps.get(key)
+        while heap:
+            if self._is_current(heap[0]):
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    # ---------- MUTATIONS ----------
+
+    def upsert(
+        self,
+        complaint_id: int,
+        area_id: Optional[int],
+        category: Optional[str],
+        priority_score: Optional[float],
+        timestamp: Optional[datetime],
+    ) -> None:
+        # Highest score first; among equals the oldest complaint first.
+        ts = timestamp.timestamp() if timestamp else 0.0
+        version = next(self._versions)
+        item = (-(priority_score or 0.0), ts, complaint_id, version)
+        keys = self._keys(area_id, category)
+
+        with self._lock:
+            self._discard(complaint_id)
+            self._entries[complaint_id] = (version, keys)
+            for key in keys:
+                heapq.heappush(self._heaps.setdefault(key, []), item)
+                self._live[key] = self._live.get(key, 0) + 1
+                self._compact(key)
+
+    def remove(self, complaint_id: int) -> None:
+        with self._lock:
+            self._discard(complaint_id)
+
+    def sync(self, complaint: Complaint) -> None:
+        """Bring one complaint's queue entry in line with its DB row."""
+        if is_queued_status(complaint.status):
+            self.upsert(
+                complaint.id,
+                complaint.area_id,
+                complaint.category,
+                complaint.priority_score,
+                complaint.timestamp,
+            )
+        else:
+            self.remove(complaint.id)
+
+    def refresh_cohort(self, db: Session, area_id: Optional[int], category: Optional[str]) -> None:
+        """Re-read the open complaints of one (area, category) after re-scoring."""
+        rows = (
+            db.query(Complaint)
+            .filter(Complaint.area_id == area_id, Complaint.category == category)
+            .filter(func.lower(func.coalesce(Complaint.status, "new")).notin_(DEQUEUED_STATUSES))
+            .all()
+        )
+        for c in rows:
+            self.sync(c)
+
+    def refresh(self, db: Session) -> None:
+        """
+        Apply every change committed since the last refresh, by any worker,
+        re-reading the touched complaints. Rebuilds instead if the change log
+        was pruned past the cursor.
+        """
+        with self._refresh_lock:
+            if self._cursor is None:
+                self._rebuild(db)
+                return
+            try:
+                while True:
+                    page = read_changes(db, since=self._cursor, limit=CHANGES_MAX_LIMIT)
+                    if not page["changes"]:
+                        break
+                    self._sync_ids(db, {c["complaint_id"] for c in page["changes"]})
+                    self._cursor = page["next_cursor"]
+                    if not page["has_more"]:
+                        break
+            except CursorExpired:
+                self._rebuild(db)
+
+    def _sync_ids(self, db: Session, ids) -> None:
+        rows = {
+            r.id: r
+            for r in db.query(
+                Complaint.id, Complaint.area_id, Complaint.category,
+                Complaint.priority_score, Complaint.timestamp, Complaint.status,
+            ).filter(Complaint.id.in_(ids))
+        }
+        for complaint_id in ids:
+            r = rows.get(complaint_id)
+            if r is not None and is_queued_status(r.status):
+                self.upsert(r.id, r.area_id, r.category, r.priority_score, r.timestamp)
+            else:
+                self.remove(complaint_id)  # claimed, closed or archived
+
+    def rebuild(self, db: Session, chunk_size: int = 5000) -> int:
+        """Reload the whole queue from the database."""
+        with self._refresh_lock:
+            return self._rebuild(db, chunk_size)
+
+    def _rebuild(self, db: Session, chunk_size: int = 5000) -> int:
+        # Changes after this cursor are replayed by the next refresh().
+        cursor = db.query(func.max(ChangeEvent.id)).scalar() or 0
+        heaps: Dict[_Key, list] = {}
+        entries: Dict[int, Tuple[int, Tuple[_Key, ...]]] = {}
+        rows = (
+            db.query(
+                Complaint.id,
+                Complaint.area_id,
+                Complaint.category,
+                Complaint.priority_score,
+                Complaint.timestamp,
+            )
+            .filter(func.lower(func.coalesce(Complaint.status, "new")).notin_(DEQUEUED_STATUSES))
+            .yield_per(chunk_size)
+        )
+        for cid, area_id, category, score, timestamp in rows:
+            version = next(self._versions)
+            ts = timestamp.timestamp() if timestamp else 0.0
+            keys = self._keys(area_id, category)
+            entries[cid] = (version, keys)
+            for key in keys:
+                heaps.setdefault(key, []).append((-(score or 0.0), ts, cid, version))
+
+        for heap in heaps.values():
+            heapq.heapify(heap)
+
+        with self._lock:
+            self._heaps = heaps
+            self._entries = entries
+            self._live = {key: len(heap) for key, heap in heaps.items()}
+        self._cursor = cursor
+        return len(entries)
+
+    # ---------- QUERIES ----------
+
+    def peek(self, area_id=ANY, category=ANY) -> Optional[int]:
+        with self._lock:
+            top = self._top((area_id, category))
+            return top[2] if top else None
+
+    def pop(self, area_id=ANY, category=ANY) -> Optional[int]:
+        with self._lock:
+            top = self._top((area_id, category))
+            if top is None:
+                return None
+            self._discard(top[2])
+            return top[2]
+
+    def claim(self, db: Session, area_id=ANY, category=ANY) -> Optional[Complaint]:
+        """
+        Atomically take the most urgent queued complaint and mark it assigned.
+
+        The in-memory pop hands each id to one caller in this process; the
+        conditional UPDATE makes the claim safe against other workers.
+        """
+        self.refresh(db)
+        while True:
+            complaint_id = self.pop(area_id, category)
+            if complaint_id is None:
+                return None
+
+            complaint = db.get(Complaint, complaint_id, populate_existing=True)
+            if complaint is None or not is_queued_status(complaint.status):
+                continue
+            old_status = complaint.status
+
+            result = db.execute(
+                update(Complaint)
+                .where(
+                    Complaint.id == complaint_id,
+                    func.coalesce(Complaint.status, "new") == (old_status or "new"),
+                )
+                .values(status=CLAIMED_STATUS)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                complaint.status = CLAIMED_STATUS
+                record_change(db, complaint, old_status=old_status)
+                log_change(db, complaint, "status", old_status=old_status)
+                db.commit()
+                return complaint
+            db.rollback()
+
+    def depth(self) -> dict:
+        with self._lock:
+            return {
+                "total": self._live.get((ANY, ANY), 0),
+                "by_category": {
+                    key[1]: n for key, n in self._live.items()
+                    if key[0] == ANY and key[1] != ANY and n
+                },
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+task_queue = TenantLocal(TaskQueue)  # one per tenant
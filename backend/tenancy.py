@@ -0,0 +1,348 @@
+"""
+Civisense Tenancy
+=================
+One deployment serving several municipalities, each with its own data.
+
+- The tenant comes from the TENANT_HEADER header (default `X-Tenant-Id`)
+  or, when TENANT_BASE_DOMAIN is set, from the subdomain
+  (`chennai.civisense.example` -> `chennai`). Requests without either use
+  DEFAULT_TENANT. Only tenants listed in TENANTS / TENANTS_PATH are
+  accepted.
+- Each tenant has its own database (`database_url` in TENANTS_PATH, or the
+  TENANT_DATABASE_URL template with `{tenant}`) or, on PostgreSQL, its own
+  schema (`schema`, or TENANT_SCHEMAS=1). Engines are kept in a bounded
+  LRU of TENANT_ENGINE_CACHE entries, each with its own small connection
+  pool, so a hot tenant cannot take every connection.
+- current_tenant is a context variable set per request; SessionLocal and
+  every TenantLocal singleton (task queue, area registry, caches, ...)
+  resolve through it, so tenant-local state never crosses tenants.
+- A tenant is initialised (schema, search index, in-memory indexes) on its
+  first request. Changing its `database_url` in TENANTS_PATH moves it: the
+  file is re-read every TENANT_CONFIG_CHECK_SECONDS, and the old engine and
+  local state are dropped.
+- Each tenant may have at most TENANT_MAX_IN_FLIGHT requests running; more
+  get a 503 instead of queueing ahead of other tenants' requests.
+- The CLI jobs take `--tenant` (add_tenant_argument / cli_tenant_context).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./civisense.db")
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANTS = [t.strip() for t in os.getenv("TENANTS", "").split(",") if t.strip()]
+TENANTS_PATH = os.getenv(
+    "TENANTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tenants.json")
+)
+TENANT_DATABASE_URL = os.getenv("TENANT_DATABASE_URL")  # e.g. sqlite:///./civisense_{tenant}.db
+TENANT_SCHEMAS = os.getenv("TENANT_SCHEMAS", "0").lower() in ("1", "true", "yes")
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant-Id")
+TENANT_BASE_DOMAIN = os.getenv("TENANT_BASE_DOMAIN", "").lower().strip(".")
+TENANT_ENGINE_CACHE = int(os.getenv("TENANT_ENGINE_CACHE", "32"))
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "5"))
+TENANT_MAX_OVERFLOW = int(os.getenv("TENANT_MAX_OVERFLOW", "10"))
+TENANT_MAX_IN_FLIGHT = int(os.getenv("TENANT_MAX_IN_FLIGHT", "32"))
+TENANT_CONFIG_CHECK_SECONDS = 5.0
+
+_TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+class UnknownTenant(Exception):
+    """The request names a tenant this deployment does not serve."""
+
+
+class TenantBusy(Exception):
+    """The tenant already has TENANT_MAX_IN_FLIGHT requests running."""
+
+
+@contextmanager
+def tenant_context(tenant: str):
+    token = current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        current_tenant.reset(token)
+
+
+def _make_engine(url: str, schema: Optional[str]) -> Engine:
+    if url.startswith("sqlite"):
+        # For SQLite, needed for multithreading in FastAPI
+        return create_engine(url, connect_args={"check_same_thread": False})
+    connect_args = {"options": f"-csearch_path={schema}"} if schema else {}
+    return create_engine(
+        url, connect_args=connect_args, pool_size=TENANT_POOL_SIZE, max_overflow=TENANT_MAX_OVERFLOW
+    )
+
+
+class TenantRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._config: Dict[str, dict] = {}
+        self._config_mtime: Optional[float] = None
+        self._config_checked = 0.0
+        # tenant -> ((url, schema), engine), least recently used first
+        self._engines: "OrderedDict[str, Tuple[Tuple[str, Optional[str]], Engine]]" = OrderedDict()
+        self._locals: List["TenantLocal"] = []
+        self._initializers: List[Tuple[Callable[[], None], bool]] = []
+        self._initialised: Dict[str, threading.Event] = {}
+        self._init_locks: Dict[str, threading.Lock] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._rejected: Dict[str, int] = {}
+        self._load_config()
+
+    # ---------- CONFIGURATION ----------
+
+    def _load_config(self) -> None:
+        config: Dict[str, dict] = {tenant: {} for tenant in TENANTS}
+        mtime = None
+        if os.path.exists(TENANTS_PATH):
+            try:
+                mtime = os.path.getmtime(TENANTS_PATH)
+                with open(TENANTS_PATH, "r", encoding="utf-8") as f:
+                    config.update({str(k).lower(): dict(v or {}) for k, v in json.load(f).items()})
+            except Exception as e:
+                print("⚠️ Tenants file load failed, keeping previous tenants:", str(e))
+                return
+        config.setdefault(DEFAULT_TENANT, {})
+        self._config = config
+        self._config_mtime = mtime
+
+    def _refresh_config(self) -> None:
+        now = time.monotonic()
+        if now - self._config_checked < TENANT_CONFIG_CHECK_SECONDS:
+            return
+        self._config_checked = now
+        mtime = os.path.getmtime(TENANTS_PATH) if os.path.exists(TENANTS_PATH) else None
+        if mtime == self._config_mtime:
+            return
+        with self._lock:
+            self._load_config()
+            for tenant in list(self._engines):
+                try:
+                    moved = tenant not in self._config or self._engines[tenant][0] != self.location(tenant)
+                except ValueError:
+                    moved = True
+                if moved:
+                    self._drop(tenant)  # removed or moved: reconnect on next use
+
+    def tenants(self) -> List[str]:
+        return sorted(self._config)
+
+    def is_known(self, tenant: str) -> bool:
+        self._refresh_config()
+        return tenant in self._config
+
+    def location(self, tenant: str) -> Tuple[str, Optional[str]]:
+        """(database URL, schema or None) holding the tenant's data."""
+        entry = self._config.get(tenant, {})
+        if tenant == DEFAULT_TENANT and not entry:
+            return DATABASE_URL, None
+        url = entry.get("database_url") or (
+            TENANT_DATABASE_URL.format(tenant=tenant) if TENANT_DATABASE_URL else DATABASE_URL
+        )
+        schema = entry.get("schema") or (tenant if TENANT_SCHEMAS else None)
+        if schema and url.startswith("sqlite"):
+            raise ValueError(f"Tenant '{tenant}': schemas need PostgreSQL; give it its own database_url")
+        if url == DATABASE_URL and not schema and tenant != DEFAULT_TENANT:
+            raise ValueError(f"Tenant '{tenant}' would share the default database; set database_url or schema")
+        return url, schema
+
+    # ---------- RESOLUTION ----------
+
+    def resolve(self, headers) -> str:
+        """Tenant id for a request, from the tenant header or the subdomain."""
+        tenant = (headers.get(TENANT_HEADER) or "").strip().lower()
+        if not tenant and TENANT_BASE_DOMAIN:
+            host = (headers.get("host") or "").split(":")[0].lower()
+            if host.endswith("." + TENANT_BASE_DOMAIN):
+                tenant = host[: -len(TENANT_BASE_DOMAIN) - 1].split(".")[-1]
+        tenant = tenant or DEFAULT_TENANT
+        if not _TENANT_ID.match(tenant) or not self.is_known(tenant):
+            raise UnknownTenant(f"Unknown tenant '{tenant}'")
+        try:
+            self.location(tenant)
+        except ValueError as e:
+            print("⚠️ Tenant misconfigured:", e)
+            raise UnknownTenant(f"Tenant '{tenant}' is not available")
+        return tenant
+
+    # ---------- ENGINES ----------
+
+    def engine(self, tenant: Optional[str] = None) -> Engine:
+        tenant = tenant or current_tenant.get()
+        with self._lock:
+            cached = self._engines.get(tenant)
+            if cached is not None:
+                self._engines.move_to_end(tenant)
+                return cached[1]
+            location = self.location(tenant)
+            engine = _make_engine(*location)
+            self._engines[tenant] = (location, engine)
+            self._evict()
+            return engine
+
+    def _evict(self) -> None:
+        for tenant in list(self._engines):
+            if len(self._engines) <= TENANT_ENGINE_CACHE:
+                break
+            if tenant != DEFAULT_TENANT and not self._in_flight.get(tenant):
+                self._drop(tenant)
+
+    def _drop(self, tenant: str) -> None:
+        """Forget a tenant's engine and local state; it is re-initialised on next use."""
+        _, engine = self._engines.pop(tenant, (None, None))
+        self._initialised.pop(tenant, None)
+        for local in self._locals:
+            local.drop(tenant)
+        if engine is not None:
+            engine.dispose()
+
+    def dispose_all(self, close: bool = True) -> None:
+        """Reset every pool, e.g. in a freshly forked worker (close=False)."""
+        with self._lock:
+            for _, engine in self._engines.values():
+                engine.dispose(close=close)
+
+    # ---------- PER-TENANT STATE ----------
+
+    def register_local(self, local: "TenantLocal") -> None:
+        self._locals.append(local)
+
+    def initializer(self, fn: Optional[Callable[[], None]] = None, required: bool = True):
+        """
+        Register `fn` to run (in the tenant's context) before a tenant serves
+        requests. Failures of optional initialisers are only logged.
+        """
+        def decorator(fn: Callable[[], None]):
+            self._initializers.append((fn, required))
+            return fn
+        return decorator(fn) if fn is not None else decorator
+
+    def mark_initialised(self, tenant: str = DEFAULT_TENANT) -> None:
+        with self._lock:
+            self._initialised.setdefault(tenant, threading.Event()).set()
+
+    def ensure_initialised(self, tenant: str) -> None:
+        if tenant in self._initialised:
+            return
+        with self._lock:
+            lock = self._init_locks.setdefault(tenant, threading.Lock())
+        with lock:
+            if tenant in self._initialised:
+                return
+            with tenant_context(tenant):
+                for fn, required in self._initializers:
+                    try:
+                        fn()
+                    except Exception as e:
+                        if required:
+                            raise
+                        print(f"⚠️ Tenant '{tenant}' initialiser {fn.__name__} failed:", e)
+            self.mark_initialised(tenant)
+            print(f"✅ Tenant '{tenant}' initialised")
+
+    # ---------- BULKHEAD ----------
+
+    def enter(self, tenant: str) -> None:
+        with self._lock:
+            if self._in_flight.get(tenant, 0) >= TENANT_MAX_IN_FLIGHT:
+                self._rejected[tenant] = self._rejected.get(tenant, 0) + 1
+                raise TenantBusy(f"Too many requests in flight for tenant '{tenant}'")
+            self._in_flight[tenant] = self._in_flight.get(tenant, 0) + 1
+
+    def leave(self, tenant: str) -> None:
+        with self._lock:
+            self._in_flight[tenant] = max(0, self._in_flight.get(tenant, 0) - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "default": DEFAULT_TENANT,
+                "tenants": {
+                    tenant: {
+                        "engine_cached": tenant in self._engines,
+                        "initialised": tenant in self._initialised,
+                        "in_flight": self._in_flight.get(tenant, 0),
+                        "rejected": self._rejected.get(tenant, 0),
+                    }
+                    for tenant in self.tenants()
+                },
+                "engine_cache": {"size": len(self._engines), "capacity": TENANT_ENGINE_CACHE},
+                "max_in_flight": TENANT_MAX_IN_FLIGHT,
+            }
+
+
+tenants = TenantRegistry()
+
+
+def add_tenant_argument(parser) -> None:
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help=f"Tenant to work on (default: {DEFAULT_TENANT}).")
+
+
+def cli_tenant_context(parser, tenant: str):
+    """tenant_context() for a CLI's --tenant value; exits with a usage error if it is not served."""
+    tenant = tenant.strip().lower()
+    if not _TENANT_ID.match(tenant) or not tenants.is_known(tenant):
+        parser.error(f"unknown tenant '{tenant}' (see TENANTS / TENANTS_PATH)")
+    try:
+        tenants.location(tenant)
+    except ValueError as e:
+        parser.error(str(e))
+    return tenant_context(tenant)
+
+
+class TenantLocal:
+    """
+    One instance of `factory()` per tenant, chosen by current_tenant.
+    Attribute access is forwarded, so a module-level singleton can be
+    replaced by a TenantLocal without touching its callers.
+    """
+
+    def __init__(self, factory: Callable[[], object]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instances", {})
+        object.__setattr__(self, "_lock", threading.Lock())
+        tenants.register_local(self)
+
+    def instance(self, tenant: Optional[str] = None):
+        """The tenant's instance (named so it does not shadow e.g. ComplaintCache.get)."""
+        tenant = tenant or current_tenant.get()
+        instance = self._instances.get(tenant)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(tenant)
+                if instance is None:
+                    instance = self._instances[tenant] = self._factory()
+        return instance
+
+    def drop(self, tenant: str) -> None:
+        with self._lock:
+            instance = self._instances.pop(tenant, None)
+        stop = getattr(instance, "stop", None)
+        if callable(stop):  # background threads, e.g. hotspot resync
+            stop()
+
+    def __getattr__(self, name):
+        return getattr(self.instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.instance(), name, value)
+
+    def __len__(self) -> int:
+        return len(self.instance())
@@ -0,0 +1,67 @@
+"""
+Test setup: every run gets its own SQLite database, weights file and
+online-model path, Gemini is disabled, and the app is imported once with
+its startup tasks run (as under uvicorn).
+
+Tests share the database, so each one uses its own area / category
+values (see `unique`) instead of assuming empty tables.
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="civisense-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_TMP}/test.db",
+    "TENANT_DATABASE_URL": f"sqlite:///{_TMP}/tenant_{{tenant}}.db",
+    "TENANTS": "default,tenant_b",
+    "TENANTS_PATH": os.path.join(_TMP, "tenants.json"),
+    "GEMINI_API_KEY": "",
+    "PRIORITY_WEIGHTS_PATH": os.path.join(_TMP, "priority_weights.json"),
+    "ONLINE_MODEL_PATH": os.path.join(_TMP, "model_online.joblib"),
+    "ONLINE_LEARNING_INTERVAL": "0",
+    "SHADOW_SAMPLE_RATE": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_main():
+    import main
+
+    return main
+
+
+@pytest.fixture(scope="session")
+def client(app_main):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app_main.app) as c:
+        app_main.subsystems._thread.join(timeout=120)  # startup tasks run in the background
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    from db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def unique():
+    """A fresh suffix for area / category names, so tests do not see each other's rows."""
+    return uuid.uuid4().hex[:8]
+
+
+@pytest.fixture
+def tmp_dir():
+    return _TMP
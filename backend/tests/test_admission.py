@@ -0,0 +1,47 @@
+import admission
+from admission import GeminiAdmission, lane_for
+
+
+def _drain(gate, client, lane):
+    admitted = 0
+    while gate.admit(client, lane)[0]:
+        admitted += 1
+    return admitted
+
+
+def test_standard_lane_leaves_the_reserve_to_priority(monkeypatch):
+    monkeypatch.setattr(admission, "LANE_WAIT_SECONDS", {"priority": 0.01, "standard": 0.01})
+    gate = GeminiAdmission(rpm=0.001, burst=8, client_rpm=0.001, client_burst=100, reserve=0.25)
+
+    assert _drain(gate, "sms", "standard") == 6
+    assert gate.admit("sms", "priority") == (True, "admitted")
+    assert gate.admit("sms", "priority") == (True, "admitted")
+    assert gate.admit("sms", "priority") == (False, "global_limit")
+    stats = gate.stats()
+    assert stats["admitted"] == {"priority": 2, "standard": 6}
+    assert stats["overflow"]["standard"] == {"global_limit": 1}
+
+
+def test_client_limit_and_worker_share(monkeypatch):
+    monkeypatch.setattr(admission, "LANE_WAIT_SECONDS", {"priority": 0.01, "standard": 0.01})
+    gate = GeminiAdmission(rpm=60, burst=40, client_rpm=0.001, client_burst=4, reserve=0)
+    assert _drain(gate, "kiosk", "standard") == 4
+    assert gate.admit("other", "standard")[0]
+
+    gate.share(4)  # one of four serve.py workers
+    assert gate.stats()["capacity"] == 10 and gate.stats()["rate_per_minute"] == 15
+    assert _drain(gate, "kiosk", "standard") == 1
+
+
+def test_standard_lane_still_admits_after_a_small_share(monkeypatch):
+    monkeypatch.setattr(admission, "LANE_WAIT_SECONDS", {"priority": 0.01, "standard": 0.01})
+    for workers in (8, 16, 64):
+        gate = GeminiAdmission(rpm=15, burst=15, client_rpm=15, client_burst=15, reserve=0.25)
+        gate.share(workers)
+        assert gate.stats()["capacity"] >= 1.0
+        assert gate.admit("c1", "standard") == (True, "admitted")
+
+
+def test_lane_for():
+    assert lane_for("pothole", {"seniorCitizen": True}) == "priority"
+    assert lane_for("pothole", {}) == "standard"
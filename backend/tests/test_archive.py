@@ -0,0 +1,117 @@
+import os
+import sqlite3
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect
+
+from archive import _bump_stats, archive_resolved, archived_cohort_count
+from db import ArchivedComplaint, ArchiveStat, Complaint, SessionLocal, create_all
+from tenancy import tenant_context, tenants
+
+
+def _resolved_complaint(db, area, category, area_id=None):
+    c = Complaint(
+        text="old pothole", area=area, area_id=area_id, category=category, status="resolved",
+        priority_score=0.5, timestamp=datetime.utcnow() - timedelta(days=400),
+    )
+    db.add(c)
+    db.commit()
+    return c.id
+
+
+def test_archived_ids_are_not_reused(db, unique):
+    archived_id = _resolved_complaint(db, f"area-{unique}", f"cat-{unique}")
+    assert archive_resolved(db, older_than_days=365) >= 1
+    assert db.get(ArchivedComplaint, archived_id) is not None
+
+    fresh = Complaint(text="new pothole", area=f"area-{unique}", category=f"cat-{unique}")
+    db.add(fresh)
+    db.commit()
+    assert fresh.id > archived_id
+
+
+def test_stats_are_kept_per_area_id(db, unique):
+    area, category = f"area-{unique}", f"cat-{unique}"
+    _bump_stats(db, Counter({(area, 101, category, "resolved"): 2, (area, 102, category, "resolved"): 3}))
+    db.commit()
+    _bump_stats(db, Counter({(area, 101, category, "resolved"): 1, (area, None, category, "resolved"): 4}))
+    db.commit()
+
+    counts = {
+        s.area_id: s.count
+        for s in db.query(ArchiveStat).filter(ArchiveStat.area == area, ArchiveStat.category == category)
+    }
+    assert counts == {101: 3, 102: 3, None: 4}
+    assert archived_cohort_count(db, area, category, area_id=102) == 3
+
+
+def test_old_sqlite_database_is_migrated(tmp_dir, unique):
+    tenant = f"legacy{unique}"
+    path = os.path.join(tmp_dir, f"tenant_{tenant}.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE complaints (id INTEGER PRIMARY KEY, text TEXT NOT NULL, area VARCHAR(150),
+            category VARCHAR(100), status VARCHAR(50), timestamp DATETIME);
+        CREATE TABLE complaints_archive (id INTEGER PRIMARY KEY, text TEXT NOT NULL);
+        CREATE TABLE archive_stats (id INTEGER PRIMARY KEY, area VARCHAR(150), area_id INTEGER,
+            category VARCHAR(100), status VARCHAR(50), count INTEGER NOT NULL,
+            CONSTRAINT uq_archive_stats_key UNIQUE (area, category, status));
+        INSERT INTO complaints (id, text, area, status) VALUES (3, 'live', 'T Nagar', 'new');
+        INSERT INTO complaints_archive (id, text) VALUES (9, 'archived');
+        INSERT INTO archive_stats (area, area_id, category, status, count) VALUES ('T Nagar', 1, 'Roads', 'resolved', 5);
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    with tenant_context(tenant):
+        create_all()
+        create_all()  # a second run finds nothing to do
+        key = next(
+            u for u in inspect(tenants.engine()).get_unique_constraints("archive_stats")
+            if u["name"] == "uq_archive_stats_key"
+        )
+        assert "area_id" in key["column_names"]
+
+        db = SessionLocal()
+        try:
+            assert db.get(Complaint, 3).text == "live"
+            assert db.query(ArchiveStat).one().count == 5
+            db.add(ArchiveStat(area="T Nagar", area_id=2, category="Roads", status="resolved", count=1))
+            fresh = Complaint(text="new", area="T Nagar")
+            db.add(fresh)
+            db.commit()
+            assert fresh.id == 10  # past the archived id 9, not 4
+        finally:
+            db.close()
+
+
+def test_archived_complaints_keep_their_explanation(client, db, unique):
+    out = client.post("/complaint", json={"text": f"{unique} no water for a week", "area": "Ward 2"}).json()
+    complaint = db.get(Complaint, out["id"])
+    complaint.status, complaint.timestamp = "resolved", datetime.utcnow() - timedelta(days=400)
+    db.commit()
+    assert archive_resolved(db, older_than_days=365) >= 1
+
+    assert db.get(ArchivedComplaint, out["id"]).explanation is not None
+    archived = client.get(f"/complaint/{out['id']}").json()
+    assert archived["status"] == "resolved"
+    assert archived["explanation"]["category"]["notes"] == out["explanation"]["category"]["notes"]
+
+
+def test_retention_counts_from_resolution(db, unique):
+    filed = datetime.utcnow() - timedelta(days=400)
+    recent, old = (
+        Complaint(text="old pothole", area=f"area-{unique}", category="Roads", status="resolved",
+                  timestamp=filed, resolved_at=resolved)
+        for resolved in (datetime.utcnow() - timedelta(days=1), filed + timedelta(days=10))
+    )
+    db.add_all([recent, old])
+    db.commit()
+    recent_id, old_id = recent.id, old.id
+
+    assert archive_resolved(db, older_than_days=365) >= 1
+    assert db.get(ArchivedComplaint, old_id) is not None
+    assert db.get(Complaint, recent_id) is not None  # resolved yesterday, stays hot
@@ -0,0 +1,41 @@
+from areas import area_registry, normalize_area, rollup
+from db import Area, AreaAlias
+
+
+def test_spelling_variants_share_one_area(client, db, unique):
+    first = client.post("/complaint", json={"text": "pothole", "area": f"T Nagar {unique}"}).json()
+    second = client.post("/complaint", json={"text": "pothole", "area": f"t.nagar {unique}"}).json()
+    assert first["area"] != second["area"]  # the raw spelling is kept
+
+    area_id = area_registry.lookup(db, f"T Nagar {unique}")
+    assert area_id is not None
+    assert area_registry.lookup(db, f"t.nagar {unique}") == area_id
+    assert db.query(Area).filter(Area.key == normalize_area(f"T Nagar {unique}")).count() == 1
+
+
+def test_rolled_back_area_is_not_cached(db, unique):
+    raw = f"Rollback Colony {unique}"
+    area_id = area_registry.resolve(db, raw)
+    assert area_id is not None
+    db.rollback()
+
+    assert area_registry.lookup(db, raw) is None
+
+    area_id = area_registry.resolve(db, raw)
+    assert area_registry.lookup(db, raw) is None  # not cached until the commit
+    db.commit()
+    assert area_registry.lookup(db, raw) == area_id
+    assert db.get(AreaAlias, raw).area_id == area_id
+
+
+def test_ward_counts_roll_up_to_zone(client, db, unique):
+    zone = client.post("/areas", json={"name": f"Zone {unique}", "level": "zone"}).json()
+    ward = client.post(
+        "/areas", json={"name": f"Adyar {unique}", "level": "ward", "parent_id": zone["id"]}
+    ).json()
+    for _ in range(2):
+        client.post("/complaint", json={"text": "garbage not collected", "area": f"Adyar {unique}"})
+
+    counts = {row["id"]: row["count"] for row in rollup(db, "zone")}
+    assert counts[zone["id"]] == 2
+    assert {row["id"]: row["count"] for row in rollup(db, "ward")}[ward["id"]] == 2
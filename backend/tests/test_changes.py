@@ -0,0 +1,72 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+import changes
+from changes import CursorExpired, prune, read_changes
+from db import ChangeEvent, SessionLocal, create_all
+from tenancy import tenant_context
+
+
+def _head(db):
+    return db.query(func.max(ChangeEvent.id)).scalar() or 0
+
+
+def test_pages_follow_the_complaint_lifecycle(client, db, unique, monkeypatch):
+    monkeypatch.setattr(changes, "CHANGES_GAP_WAIT_SECONDS", 0)
+    since = _head(db)
+    cid = client.post("/complaint", json={"text": f"{unique} garbage not collected", "area": "Ward 8"}).json()["id"]
+    assert client.patch(f"/status/{cid}", json={"status": "in_progress"}).status_code == 200
+    assert client.post("/feedback", json={"complaint_id": cid, "correct_category": "Health"}).status_code == 200
+
+    kinds, cursor = [], since
+    while True:
+        page = client.get("/changes", params={"since": cursor, "limit": 1}).json()
+        assert len(page["changes"]) <= 1
+        kinds += [(c["kind"], c["status"]) for c in page["changes"] if c["complaint_id"] == cid]
+        assert page["next_cursor"] >= cursor
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            break
+    assert kinds[:3] == [("created", "new"), ("status", "in_progress"), ("feedback", "in_progress")]
+
+    feedback = [c for c in client.get("/changes", params={"since": since}).json()["changes"] if c["kind"] == "feedback"]
+    assert feedback[-1]["category"] == "Health" and feedback[-1]["details"]["old_category"] != "Health"
+
+
+def test_long_poll_at_the_head_returns_an_empty_page(client, db):
+    head = _head(db)
+    started = time.monotonic()
+    page = client.get("/changes", params={"since": head, "wait": 0.2}).json()
+    assert time.monotonic() - started >= 0.2
+    assert page == {"changes": [], "next_cursor": head, "has_more": False}
+
+
+def test_pruned_cursor_expires(app_main, client, unique, monkeypatch):
+    with tenant_context(f"changes{unique}"):
+        create_all()
+        db = SessionLocal()
+        try:
+            old = datetime.utcnow() - timedelta(days=60)
+            db.add_all([ChangeEvent(complaint_id=i, kind="created", created_at=old) for i in (1, 2)]
+                       + [ChangeEvent(complaint_id=3, kind="created", created_at=datetime.utcnow())])
+            db.commit()
+            assert read_changes(db, since=1)["next_cursor"] == 3
+
+            assert prune(db, older_than_days=30) == 2
+            db.commit()
+            with pytest.raises(CursorExpired):
+                read_changes(db, since=1)
+            assert [c["complaint_id"] for c in read_changes(db, since=0)["changes"]] == [3]
+        finally:
+            db.close()
+
+    def expired(since, limit):
+        raise CursorExpired(f"Cursor {since} is older than the retained change log")
+
+    monkeypatch.setattr(app_main, "_changes_page", expired)
+    assert client.get("/changes", params={"since": 1}).status_code == 410
+    body = client.get("/changes/stream", headers={"Last-Event-ID": "7"}).text
+    assert body.startswith("event: expired") and "Cursor 7" in body
@@ -0,0 +1,32 @@
+import responses
+from db import Complaint
+from responses import truncate
+
+
+def test_fields_and_preview_narrow_the_recent_complaints(client, db, unique):
+    text = f"{unique} drainage overflowing into the houses on the main street"
+    complaint = Complaint(text=text, area="Ward 4", category="Sanitation", priority_score=100.0, status="new")
+    db.add(complaint)
+    db.commit()
+
+    r = client.get("/dashboard", params={"fields": "id, text,category", "preview": 20})
+    assert r.status_code == 200
+    [top] = [c for c in r.json()["recent_high_priority"] if c["id"] == complaint.id]
+    assert set(top) == {"id", "text", "category"}
+    assert top["text"] == truncate(text, 20) and top["text"].endswith("…") and len(top["text"]) <= 21
+
+    assert client.get("/dashboard", params={"fields": "id,password"}).status_code == 400
+    assert client.get("/dashboard", params={"preview": 0}).status_code == 400
+
+
+def test_large_responses_are_compressed_for_clients_that_accept_it(client, monkeypatch):
+    monkeypatch.setattr(responses, "COMPRESS_MIN_BYTES", 1)
+    r = client.get("/dashboard", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and "total_complaints" in r.json()
+    assert "content-encoding" not in client.get("/dashboard", headers={"Accept-Encoding": "gzip;q=0"}).headers
+
+
+def test_truncate():
+    assert truncate("short", 10) == "short"
+    assert truncate("a long complaint", 6) == "a long…"
+    assert truncate(None, 5) is None and truncate("kept", None) == "kept"
@@ -0,0 +1,64 @@
+import json
+import os
+
+import eligibility
+from eligibility import CompiledCatalogue, normalize_tag, parse_amount
+
+SCHEMES = [
+    {
+        "scheme_id": "WOMEN_LOAN", "name": "Women Loan",
+        "eligibility_rules": {"target_group": ["Adult_Woman"], "exclusions": ["Income_Tax_Payer (Since Oct 1, 2022)"]},
+        "age_limits": {"min": 18, "max": 60},
+        "income_limits": {"amount": "3 Lakh"},
+    },
+    {
+        "scheme_id": "HOUSING", "name": "Housing",
+        "eligibility_rules": {"target_group": ["N/A"], "exclusions": []},
+        "income_limits": {"EWS": "3 Lakh", "LIG": "6 Lakh"},
+    },
+    {"name": "Old Age Pension", "min_age": 60, "income_groups": ["BPL"]},
+]
+
+
+def _eligible(profile):
+    compiled = CompiledCatalogue(SCHEMES)
+    matrix, _ = compiled.evaluate([profile])
+    return {s["scheme_id"] for s, ok in zip(compiled.schemes, matrix[0]) if ok}
+
+
+def test_rule_names_and_amounts():
+    assert normalize_tag("Income_Tax_Payer (Since Oct 1, 2022)") == "income_tax_payer"
+    assert normalize_tag("BPL") == "bpl_household"
+    assert parse_amount("6 Lakh to 18 Lakh/year") == 1_800_000
+    assert parse_amount("no limit") is None
+
+
+def test_targets_exclusions_age_and_income():
+    woman = {"age": 30, "gender": "female", "annual_income": 250_000}
+    assert _eligible(woman) == {"WOMEN_LOAN", "HOUSING"}
+    assert _eligible({**woman, "tags": ["income tax payer"]}) == {"HOUSING"}
+    assert _eligible({**woman, "age": 65}) == {"HOUSING"}
+    assert _eligible({**woman, "annual_income": 500_000}) == {"HOUSING"}  # over 3 lakh, under LIG's 6
+    assert _eligible({**woman, "annual_income": None}) == set()  # income limits need an income
+    assert _eligible({"age": 40, "income_group": "LIG"}) == {"HOUSING"}  # a band name qualifies
+    assert _eligible({"age": 70, "income_group": "bpl"}) == {"Old Age Pension"}
+    assert _eligible({"income_group": "bpl"}) == set()  # unknown age fails an age limit
+
+
+def test_endpoint_reads_the_catalogue_file(client, tmp_dir, unique, monkeypatch):
+    path = os.path.join(tmp_dir, f"schemes-{unique}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(SCHEMES, f)
+    monkeypatch.setattr(eligibility, "CATALOGUE_PATHS", [path])
+
+    body = client.post("/schemes/eligible", json={"profiles": [
+        {"age": 30, "gender": "female", "annual_income": 250_000, "tags": ["street vendor"]},
+        {"age": 70, "income_group": "BPL"},
+    ]}).json()
+    assert [r["eligible"] for r in body["results"]] == [["WOMEN_LOAN", "HOUSING"], ["Old Age Pension"]]
+    assert body["schemes"]["HOUSING"] == "Housing"
+    assert body["unknown_tags"] == ["bpl_household", "street_vendor"]  # no scheme targets either
+
+    monkeypatch.setattr(eligibility, "ELIGIBILITY_MAX_PROFILES", 1)
+    assert client.post("/schemes/eligible", json={"profiles": [{}, {}]}).status_code == 400
+    assert client.post("/schemes/eligible", json={"profiles": []}).status_code == 422
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import hedging
+from hedging import HEDGE_MIN_SAMPLES, LatencyTracker
+
+
+def _gemini_result(category):
+    return {
+        "category": category, "confidence": 0.95, "urgency_score": 0.5, "population_impact": 0.4,
+        "vulnerability_score": 0.2, "priority_score": 60, "recommended_scheme": "None",
+        "scheme_reason": "n/a",
+    }
+
+
+def test_sla_follows_observed_latency_within_bounds(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_SLA_MIN_MS", 300)
+    monkeypatch.setattr(hedging, "HEDGE_SLA_MAX_MS", 4000)
+    tracker = LatencyTracker()
+    assert tracker.sla_ms() == hedging.HEDGE_SLA_MS  # not enough samples yet
+
+    for _ in range(HEDGE_MIN_SAMPLES):
+        tracker.record(800)
+    assert tracker.sla_ms() == 800
+    for _ in range(HEDGE_MIN_SAMPLES):
+        tracker.record(10)
+    assert tracker.sla_ms() == 800  # p90 still sees the slow half
+    for _ in range(hedging.HEDGE_WINDOW):
+        tracker.record(10)
+    assert tracker.sla_ms() == 300
+    for _ in range(hedging.HEDGE_WINDOW):
+        tracker.record(60_000)
+    assert tracker.sla_ms() == 4000
+
+
+def test_slow_gemini_answer_upgrades_the_stored_local_result(app_main, client, unique, monkeypatch):
+    release = threading.Event()
+
+    def slow_gemini(text, area=None, vulnerability_flags=None):
+        release.wait(5)
+        return _gemini_result("Health")
+
+    monkeypatch.setattr(hedging, "HEDGE_SLA_MS", 50)
+    monkeypatch.setattr(app_main, "GEMINI_HEDGED", True)
+    monkeypatch.setattr(app_main.nlp_engine, "gemini", object())
+    monkeypatch.setattr(app_main.nlp_engine, "analyze_with_gemini", slow_gemini)
+
+    started = time.monotonic()
+    out = client.post("/complaint", json={"text": f"{unique} pothole on the main road", "area": "Ward 3"}).json()
+    assert time.monotonic() - started < 4
+    assert out["category"] != "Health"
+    assert "Gemini's result will be applied" in out["explanation"]["analysis"]["notes"]
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while client.get(f"/complaint/{out['id']}").json()["category"] != "Health":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert app_main.hedged_gemini.stats()["outcomes"]["upgraded"] >= 1
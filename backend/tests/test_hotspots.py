@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from db import Complaint
+from hotspots import HOTSPOT_MIN_COUNT, HotspotDetector
+from priority import apply_spike
+
+
+def _baseline(detector, area, category, now):
+    for hours in range(2, 24):  # one complaint an hour outside the window
+        detector.record(area, category, ts=now - timedelta(hours=hours))
+
+
+def test_burst_in_the_window_is_a_hotspot():
+    detector = HotspotDetector(bucket_minutes=5, window_minutes=60, baseline_hours=24)
+    now = datetime.utcnow()
+    _baseline(detector, "Ward 12", "Water", now)
+    _baseline(detector, "Ward 12", "Roads", now)
+    assert detector.spike("Ward 12", "Water") == 0.0
+
+    for minutes in range(HOTSPOT_MIN_COUNT + 20):
+        detector.record("Ward 12", "Water", ts=now - timedelta(minutes=minutes % 50))
+    detector.record("Ward 12", "Roads", ts=now)
+
+    [hotspot] = detector.hotspots()
+    assert (hotspot["area"], hotspot["category"], hotspot["count"]) == ("Ward 12", "Water", HOTSPOT_MIN_COUNT + 20)
+    assert hotspot["expected"] == round(22 / 23, 2) and hotspot["spike"] > 0.5  # 22 per 23 hours
+    assert detector.spike("Ward 12", "Water") > 0.5
+    assert detector.spike("ward 12 ", "Water") == detector.spike("Ward 12", "Water")  # name-keyed
+    assert detector.spike("Ward 12", "Roads") == 0.0
+
+
+def test_rebuild_counts_recent_complaints_only(db, unique):
+    area = f"Tondiarpet {unique}"
+    now = datetime.utcnow()
+    db.add_all(
+        [Complaint(text="no water", area=area, category="Water", timestamp=now - timedelta(minutes=i))
+         for i in range(HOTSPOT_MIN_COUNT + 5)]
+        + [Complaint(text="old", area=area, category="Water", timestamp=now - timedelta(days=3))]
+    )
+    db.commit()
+
+    detector = HotspotDetector()
+    assert detector.rebuild(db) >= HOTSPOT_MIN_COUNT + 5
+    [hotspot] = [h for h in detector.hotspots() if h["area"] == area]
+    assert hotspot["count"] == HOTSPOT_MIN_COUNT + 5 and hotspot["expected"] == 0
+
+
+def test_spike_raises_urgency_within_bounds():
+    assert apply_spike(0.5, 0.0) == 0.5
+    assert 0.5 < apply_spike(0.5, 1.0) <= 1.0
+    assert apply_spike(0.95, 1.0) == 1.0
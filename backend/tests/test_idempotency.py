@@ -0,0 +1,40 @@
+import pytest
+
+from db import Complaint, IdempotencyKey
+from idempotency import IdempotencyStore
+
+
+def test_retries_replay_the_stored_response(client, db, unique):
+    body = {"text": f"{unique} no street lights on 3rd cross", "area": "Ward 7"}
+    headers = {"Idempotency-Key": f"key-{unique}"}
+
+    first = client.post("/complaint", json=body, headers=headers)
+    again = client.post("/complaint", json=body, headers=headers)
+    assert again.headers["Idempotent-Replayed"] == "true" and again.json() == first.json()
+    assert db.query(Complaint).filter(Complaint.text == body["text"]).count() == 1
+
+    row = db.get(IdempotencyKey, f"key-{unique}")
+    assert row.complaint_id == first.json()["id"] and row.response is not None
+
+    other = client.post("/complaint", json={**body, "area": "Ward 8"}, headers=headers)
+    assert other.status_code == 422
+
+
+def test_complaint_and_response_commit_together(app_main, client, db, unique, monkeypatch):
+    body = {"text": f"{unique} sewage overflow near the market", "area": "Ward 7"}
+    headers = {"Idempotency-Key": f"key-{unique}"}
+
+    def crash(self, *args):
+        raise RuntimeError("lost the connection")
+
+    monkeypatch.setattr(IdempotencyStore, "record", crash)
+    with pytest.raises(RuntimeError):
+        client.post("/complaint", json=body, headers=headers)
+    # Neither the complaint nor the claim survived, so the retry runs again.
+    assert db.query(Complaint).filter(Complaint.text == body["text"]).count() == 0
+    assert db.get(IdempotencyKey, f"key-{unique}") is None
+
+    monkeypatch.undo()
+    retry = client.post("/complaint", json=body, headers=headers)
+    assert retry.status_code == 200 and "Idempotent-Replayed" not in retry.headers
+    assert db.query(Complaint).filter(Complaint.text == body["text"]).count() == 1
@@ -0,0 +1,81 @@
+from db import ChangeEvent, Complaint
+from priority import population_impact_for_count, rescore_cohort
+
+
+def test_open_cohort_is_lifted_when_it_crosses_a_tier(client, db, unique):
+    area = f"Perambur {unique}"
+    ids = [
+        client.post("/complaint", json={"text": "garbage not collected", "area": area}).json()["id"]
+        for _ in range(3)
+    ]
+    db.query(Complaint).filter(Complaint.id == ids[1]).update({"status": "resolved"})
+    db.commit()
+    closed_before = db.get(Complaint, ids[1]).population_impact
+
+    # Fourth through seventh complaints: the cohort grows past 5 similar ones.
+    for _ in range(4):
+        client.post("/complaint", json={"text": "garbage not collected", "area": area})
+    db.expire_all()
+
+    first = db.get(Complaint, ids[0])
+    assert first.population_impact == population_impact_for_count(6)
+    assert db.get(Complaint, ids[1]).population_impact == closed_before
+    assert db.query(ChangeEvent).filter(
+        ChangeEvent.complaint_id == ids[0], ChangeEvent.kind == "rescored"
+    ).count() >= 1
+
+
+def test_rescore_is_idempotent(client, db, unique):
+    area = f"Tondiarpet {unique}"
+    for _ in range(3):
+        client.post("/complaint", json={"text": "garbage not collected", "area": area})
+    c = db.query(Complaint).filter(Complaint.area == area).first()
+
+    assert rescore_cohort(db, area, c.category, area_id=c.area_id, only_on_crossing=False) == 0
+    db.rollback()
+
+
+def test_applying_weights_spares_gemini_scores_and_is_logged(client, db, unique):
+    from complaint_cache import compact_explanation
+    from priority import DEFAULT_WEIGHTS
+
+    category = f"cat-{unique}"
+    local = Complaint(text="x", category=category, urgency=1.0, population_impact=0.0,
+                      vulnerability=0.0, confidence=0.0, priority_score=0.35, status="new")
+    gemini = Complaint(text="y", category=category, urgency=1.0, population_impact=0.0,
+                       vulnerability=0.0, confidence=0.0, priority_score=0.77, status="new",
+                       explanation=compact_explanation({}, "gemini"))
+    db.add_all([local, gemini])
+    db.commit()
+    assert client.get(f"/complaint/{local.id}").json()["priority_score"] == 0.35  # now cached
+
+    try:
+        r = client.put("/priority/weights", json={"weights": {"urgency": 1, "population_impact": 0,
+                                                               "vulnerability": 0, "confidence": 0}})
+        assert r.status_code == 200
+        db.expire_all()
+        assert db.get(Complaint, local.id).priority_score == 1.0
+        assert db.get(Complaint, gemini.id).priority_score == 0.77
+        logged = db.query(ChangeEvent).filter(ChangeEvent.kind == "rescored",
+                                              ChangeEvent.complaint_id.in_([local.id, gemini.id])).all()
+        assert [(e.complaint_id, e.priority_score) for e in logged] == [(local.id, 1.0)]
+        assert client.get(f"/complaint/{local.id}").json()["priority_score"] == 1.0
+    finally:
+        client.put("/priority/weights", json={"weights": DEFAULT_WEIGHTS})
+
+
+def test_weights_written_by_another_worker_are_reloaded(client):
+    import json
+    import os
+    import time
+
+    from priority import DEFAULT_WEIGHTS, WEIGHTS_PATH, compute_priority_score
+
+    try:
+        with open(WEIGHTS_PATH, "w", encoding="utf-8") as f:
+            json.dump({"urgency": 0.0, "population_impact": 0.0, "vulnerability": 1.0, "confidence": 0.0}, f)
+        os.utime(WEIGHTS_PATH, ns=(time.time_ns(), time.time_ns() + 10**9))
+        assert client.get("/priority/weights").json()["weights"]["vulnerability"] == 1.0
+        assert compute_priority_score(0.9, 0.9, 0.5, 0.9) == 0.5
+    finally:
+        client.put("/priority/weights", json={"weights": DEFAULT_WEIGHTS})
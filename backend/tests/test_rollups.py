@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+from archive import archive_resolved
+from db import ArchivedComplaint, Complaint, HourlyRollup, ResolutionRollup, SessionLocal, create_all
+from rollups import backfill
+from tenancy import tenant_context
+
+
+def test_backfill_keeps_resolution_times_of_archived_complaints(client, db, unique):
+    out = client.post("/complaint", json={"text": f"{unique} broken water pipe", "area": "Ward 5"}).json()
+    assert client.patch(f"/status/{out['id']}", json={"status": "resolved"}).status_code == 200
+
+    old = datetime.utcnow() - timedelta(days=400)
+    complaint = db.get(Complaint, out["id"])
+    complaint.timestamp, complaint.resolved_at = old, old + timedelta(hours=30)
+    db.commit()
+    assert archive_resolved(db, older_than_days=365) >= 1
+    assert db.get(ArchivedComplaint, out["id"]).resolved_at == old + timedelta(hours=30)
+
+    backfill(db)
+    resolved_hour = (old + timedelta(hours=30)).replace(minute=0, second=0, microsecond=0)
+    assert db.query(ResolutionRollup).filter(ResolutionRollup.hour == resolved_hour).count() == 1
+
+
+def test_startup_backfills_when_everything_is_archived(app_main, unique):
+    with tenant_context(f"rollups{unique}"):
+        create_all()
+        db = SessionLocal()
+        try:
+            ts = datetime(2023, 5, 1, 9, 30)
+            db.add(ArchivedComplaint(id=1, text="old", category="Water", status="resolved",
+                                     timestamp=ts, resolved_at=ts + timedelta(hours=3)))
+            db.commit()
+
+            app_main.init_rollups()
+            assert db.query(HourlyRollup.count).filter(HourlyRollup.hour == datetime(2023, 5, 1, 9)).scalar() == 1
+            assert db.query(ResolutionRollup).count() == 1
+        finally:
+            db.close()
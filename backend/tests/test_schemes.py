@@ -0,0 +1,63 @@
+import json
+import os
+
+import schemes
+from schemes import map_scheme, rank_schemes, scheme_index
+
+CATALOGUE = [
+    {"name": "Water Relief", "categories": ["water"], "keywords": ["tanker"]},
+    {"name": "Pipeline Repair", "categories": ["water"], "description": "Repairs burst mains and leaking pipes.",
+     "keywords": []},
+    {"name": "Senior Water Aid", "categories": ["water"], "keywords": ["pipe"], "min_age": 60},
+    {"name": "Road Fund", "categories": ["roads"], "keywords": ["pipe", "pothole"]},
+    {"name": "Grievance Cell", "categories": [], "keywords": ["complaint"]},
+]
+
+
+def _use(monkeypatch, tmp_dir, name, catalogue):
+    path = os.path.join(tmp_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(catalogue, f)
+    monkeypatch.setattr(schemes, "SCHEME_PATH", path)
+    return path
+
+
+def test_hits_are_filtered_by_category_and_eligibility(monkeypatch, tmp_dir, unique):
+    _use(monkeypatch, tmp_dir, f"schemes-{unique}.json", CATALOGUE)
+
+    names = [o["name"] for o in rank_schemes("Water", "leaking pipe, filed a complaint", k=5)]
+    assert sorted(names) == ["Grievance Cell", "Pipeline Repair"]  # Pipeline Repair via its description
+    names = [o["name"] for o in rank_schemes("Water", "leaking pipe, filed a complaint", {"age": 70}, k=5)]
+    assert "Senior Water Aid" in names and "Road Fund" not in names
+    assert len(rank_schemes("Water", "leaking pipe complaint", {"age": 70}, k=1)) == 1
+
+
+def test_no_hit_falls_back_to_the_first_eligible_scheme(monkeypatch, tmp_dir, unique):
+    _use(monkeypatch, tmp_dir, f"schemes-{unique}.json", CATALOGUE)
+
+    assert rank_schemes("Water", "nothing in common") == [
+        {"name": "Water Relief", "score": 0.0, "matched_keywords": []}
+    ]
+    # A hit in another category does not count as a match.
+    assert [o["name"] for o in rank_schemes("Health", "pothole")] == ["Grievance Cell"]
+
+    name, reason, options = map_scheme("Water", "tanker did not come, filed a complaint", area="Ward 2")
+    assert name == "Water Relief" and "keywords: tanker" in reason and "Grievance Cell" in reason
+    assert reason.endswith("Assigned to local authority for 'Ward 2'.") and len(options) == 2
+
+
+def test_index_rebuilds_when_the_file_changes(monkeypatch, tmp_dir, unique):
+    path = _use(monkeypatch, tmp_dir, f"schemes-{unique}.json", CATALOGUE)
+    before = scheme_index()
+    assert scheme_index() is before
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(CATALOGUE + [{"name": "Drain Desk", "categories": ["water"], "keywords": ["drain"]}], f)
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+    assert scheme_index() is not before
+    assert rank_schemes("Water", "blocked drain")[0]["name"] == "Drain Desk"
+
+
+def test_shipped_schemes_have_descriptions():
+    with open(os.path.join(os.path.dirname(schemes.__file__), "schemes.json"), encoding="utf-8") as f:
+        assert all(s.get("description") for s in json.load(f))
@@ -0,0 +1,32 @@
+def _post(client, text, area):
+    r = client.post("/complaint", json={"text": text, "area": area})
+    assert r.status_code == 200
+    return r.json()["id"]
+
+
+def test_search_ranks_matches_and_filters_by_area(client, unique):
+    word = f"zq{unique}"
+    a = _post(client, f"Water {word} burst near school", f"Anna Nagar {unique}")
+    b = _post(client, f"drinking water dirty, {word} {word} leak", f"Velachery {unique}")
+    _post(client, "Streetlight broken on main road", f"Velachery {unique}")
+
+    r = client.get("/complaints/search", params={"q": word}).json()
+    assert {hit["id"] for hit in r["results"]} == {a, b}
+
+    r = client.get("/complaints/search", params={"q": word, "area": f"Velachery {unique}"}).json()
+    assert [hit["id"] for hit in r["results"]] == [b]
+
+
+def test_search_sees_status_updates_and_rejects_empty_queries(client, db, unique):
+    from db import Complaint
+
+    word = f"zq{unique}"
+    cid = _post(client, f"garbage {word} overflowing", f"Mylapore {unique}")
+    db.query(Complaint).filter(Complaint.id == cid).update({"status": "resolved"})
+    db.commit()
+
+    r = client.get("/complaints/search", params={"q": word, "status": "resolved"}).json()
+    assert [hit["id"] for hit in r["results"]] == [cid]
+    assert client.get("/complaints/search", params={"q": "  "}).status_code == 400
+    # Query syntax characters are treated as words, not FTS operators.
+    assert client.get("/complaints/search", params={"q": '"pipe AND OR'}).status_code == 200
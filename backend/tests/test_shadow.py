@@ -0,0 +1,47 @@
+import threading
+
+from db import SessionLocal
+from shadow import ShadowRunner, summary
+
+
+class _Candidate:
+    def __init__(self, version):
+        self.version = version
+        self.release = threading.Event()
+
+    def predict(self, text, area, flags):
+        self.release.wait(5)
+        if "fail" in text:
+            raise RuntimeError("candidate down")
+        return ("Water" if "water" in text else "Roads"), 0.9
+
+
+def test_samples_are_recorded_off_the_request_path_and_summarised(db, unique):
+    candidate = _Candidate(f"cand-{unique}")
+    runner = ShadowRunner(candidate, SessionLocal, sample_rate=1.0, queue_size=1, workers=1)
+    try:
+        assert runner.offer("no water", live_category="Water", live_version="rules")
+        # The only slot is busy (the candidate is blocked), so this one is dropped, not queued.
+        assert not runner.offer("pothole", live_category="Roads", live_version="rules")
+        candidate.release.set()
+        runner._executor.submit(lambda: None).result()  # wait for the pending sample
+        for text, live in (("pothole", "Water"), ("fail", "Roads")):
+            assert runner.offer(text, live_category=live, live_version="rules")
+            runner._executor.submit(lambda: None).result()
+    finally:
+        runner.shutdown()
+
+    assert runner.stats == {"sampled": 3, "dropped": 1, "completed": 2, "failed": 1}
+    report = summary(db, candidate.version)[candidate.version]
+    assert report["samples"] == 3 and report["errors"] == 1
+    assert report["agreement"] == 0.5
+    assert report["top_disagreements"] == [{"live": "Water", "candidate": "Roads", "count": 1}]
+
+
+def test_zero_sample_rate_never_samples():
+    runner = ShadowRunner(_Candidate("never"), SessionLocal, sample_rate=0.0)
+    try:
+        assert not runner.offer("no water", live_category="Water", live_version="rules")
+    finally:
+        runner.shutdown()
+    assert runner.stats["sampled"] == 0
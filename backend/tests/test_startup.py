@@ -0,0 +1,64 @@
+import os
+import threading
+
+from startup import Subsystems
+
+
+def test_tasks_run_after_their_dependencies_and_failures_propagate():
+    subsystems = Subsystems()
+    subsystems.imports.uninstall()
+    order = []
+    release = threading.Event()
+
+    @subsystems.task("database")
+    def database():
+        release.wait(5)
+        order.append("database")
+
+    @subsystems.task("queue", after=("database",))
+    def queue():
+        order.append("queue")
+
+    @subsystems.task("gemini", required=False)
+    def gemini():
+        raise RuntimeError("no key")
+
+    @subsystems.task("search", after=("gemini",), required=False)
+    def search():
+        order.append("search")
+
+    subsystems.start()
+    assert not subsystems.is_ready() and not subsystems.wait(["queue"], timeout=0.05)
+    release.set()
+    assert subsystems.wait(["queue", "search"], timeout=5)
+    subsystems._thread.join(5)
+
+    assert order == ["database", "queue"]
+    status = subsystems.status()
+    assert status["gemini"]["state"] == "failed" and status["search"]["error"] == "dependency 'gemini' failed"
+    assert subsystems.is_ready()  # only optional tasks failed
+    report = subsystems.report()
+    assert report["ready_ms"] is not None and "took_ms" in report["init"]["database"]
+
+
+def test_import_timer_attributes_time_to_top_level_modules(tmp_dir, unique, monkeypatch):
+    name = f"slow_{unique}"
+    with open(os.path.join(tmp_dir, f"{name}.py"), "w") as f:
+        f.write("import time\ntime.sleep(0.05)\n")
+    monkeypatch.syspath_prepend(tmp_dir)
+
+    subsystems = Subsystems()
+    try:
+        __import__(name)
+    finally:
+        subsystems.imports.uninstall()
+    assert subsystems.imports.times[name] >= 0.05
+
+
+def test_liveness_readiness_and_report_endpoints(client):
+    assert client.get("/health").json() == {"status": "alive"}
+    ready = client.get("/ready")
+    assert ready.status_code == 200 and ready.json()["subsystems"]["database"] == "ready"
+    report = client.get("/startup").json()
+    assert set(report) == {"app_import_ms", "ready_ms", "imports_ms", "init"}
+    assert report["init"]["model"]["state"] == "ready"
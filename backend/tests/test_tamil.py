@@ -0,0 +1,32 @@
+import json
+import os
+
+from bulk_import import run_import
+from db import Complaint
+from tamil import has_tamil, normalize, tamil_category
+
+# "Sewage is running on the road because the drain is blocked": the first
+# rule hit on the translated text is "road", the lexicon votes Sanitation.
+DRAIN_ON_ROAD = "சாக்கடை அடைப்பால் கழிவுநீர் சாலையில் ஓடுகிறது"
+
+
+def test_normalize_maps_lexicon_stems_to_rule_keywords():
+    assert has_tamil(DRAIN_ON_ROAD) and not has_tamil("no water since monday")
+    assert "water" in normalize("தண்ணீர் வரவில்லை")
+    assert tamil_category(DRAIN_ON_ROAD) == "Sanitation"
+    assert tamil_category("garbage on the road") is None
+
+
+def test_complaint_uses_the_tamil_category_vote(client, unique):
+    out = client.post("/complaint", json={"text": f"{DRAIN_ON_ROAD} {unique}", "area": "Ward 4"}).json()
+    assert out["category"] == "Sanitation"
+
+
+def test_bulk_import_uses_the_tamil_category_vote(db, tmp_dir, unique):
+    path = os.path.join(tmp_dir, f"tamil-{unique}.ndjson")
+    area = f"Perambur {unique}"
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"text": DRAIN_ON_ROAD, "area": area}, ensure_ascii=False) + "\n")
+
+    assert run_import(path, workers=1, use_gemini=False)["inserted"] == 1
+    assert db.query(Complaint.category).filter(Complaint.area == area).scalar() == "Sanitation"
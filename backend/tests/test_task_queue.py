@@ -0,0 +1,39 @@
+from changes import log_change
+from db import Complaint
+
+
+def _other_worker_creates(db, category, score):
+    """Insert a complaint the way another worker's intake would, bypassing this process's queue."""
+    c = Complaint(text="drain blocked", area="Kodambakkam", category=category, priority_score=score, status="new")
+    db.add(c)
+    log_change(db, c, "created")
+    db.commit()
+    return c.id
+
+
+def test_next_and_claim_follow_priority(client, db, unique):
+    category = f"cat-{unique}"
+    low = _other_worker_creates(db, category, 0.2)
+    high = _other_worker_creates(db, category, 0.9)
+
+    r = client.get("/queue/next", params={"category": category})
+    assert r.status_code == 200 and r.json()["complaint"]["id"] == high
+
+    claimed = client.post("/queue/claim", json={"category": category}).json()["complaint"]
+    assert claimed["id"] == high and claimed["status"] == "assigned"
+    assert client.post("/queue/claim", json={"category": category}).json()["complaint"]["id"] == low
+    assert client.post("/queue/claim", json={"category": category}).status_code == 404
+
+
+def test_queue_sees_changes_made_by_other_workers(client, db, unique):
+    category = f"cat-{unique}"
+    cid = _other_worker_creates(db, category, 0.5)
+    assert client.get("/queue/next", params={"category": category}).json()["complaint"]["id"] == cid
+
+    # Another worker claims it: the change log tells this worker to drop it.
+    c = db.get(Complaint, cid)
+    c.status = "assigned"
+    log_change(db, c, "status", old_status="new")
+    db.commit()
+    assert client.get("/queue/next", params={"category": category}).status_code == 404
+    assert client.get("/queue/depth").json()["by_category"].get(category, 0) == 0
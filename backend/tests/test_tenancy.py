@@ -0,0 +1,67 @@
+import argparse
+import os
+
+import pytest
+
+import online_learning
+import search
+from db import Feedback, SessionLocal
+from nlp import NLPEngine
+from online_learning import OnlineLearner
+from priority import DEFAULT_WEIGHTS, weights_path
+from tenancy import add_tenant_argument, cli_tenant_context, current_tenant, tenant_context
+
+TENANT_B = {"X-Tenant-Id": "tenant_b"}
+
+
+def test_priority_weights_are_per_tenant(client):
+    weights = {"urgency": 0.0, "population_impact": 0.0, "vulnerability": 1.0, "confidence": 0.0}
+    try:
+        assert client.put("/priority/weights", json={"weights": weights}, headers=TENANT_B).status_code == 200
+        assert client.get("/priority/weights", headers=TENANT_B).json()["weights"]["vulnerability"] == 1.0
+        assert client.get("/priority/weights").json()["weights"] == DEFAULT_WEIGHTS
+        assert os.path.basename(weights_path("tenant_b")) == "priority_weights_tenant_b.json"
+    finally:
+        client.put("/priority/weights", json={"weights": DEFAULT_WEIGHTS}, headers=TENANT_B)
+
+
+def test_search_backend_is_per_tenant(client, unique):
+    client.get("/complaints/search", params={"q": "warm up"}, headers=TENANT_B)  # initialises tenant_b
+    assert search._BACKEND["default"] == search._BACKEND["tenant_b"] == "sqlite"
+    with tenant_context(f"never{unique}"):
+        assert search._BACKEND.get(current_tenant.get()) is None  # LIKE fallback until installed
+    params = {"q": f"zq{unique}"}
+    client.post("/complaint", json={"text": f"streetlight zq{unique} dark", "area": "Ward 1"}, headers=TENANT_B)
+    assert len(client.get("/complaints/search", params=params, headers=TENANT_B).json()["results"]) == 1
+    assert client.get("/complaints/search", params=params).json()["results"] == []
+
+
+def test_online_learner_keeps_a_cursor_per_tenant(client, tmp_dir, unique, monkeypatch):
+    monkeypatch.setattr(online_learning, "HOLDOUT_MIN", 10_000)
+    for headers in ({}, TENANT_B):
+        for i in range(2):
+            cid = client.post("/complaint", json={"text": f"{unique} school roof {i}", "area": "Ward 1"},
+                              headers=headers).json()["id"]
+            client.post("/feedback", json={"complaint_id": cid, "correct_category": "Education"}, headers=headers)
+
+    learner = OnlineLearner(NLPEngine(model_path="missing.joblib", use_gemini=False, lazy=True),
+                            model_path=os.path.join(tmp_dir, f"online-{unique}.joblib"))
+    for tenant in ("default", "tenant_b"):
+        with tenant_context(tenant):
+            learner._step_tenant(SessionLocal)
+            db = SessionLocal()
+            try:
+                assert learner.last_feedback_id == db.query(Feedback.id).order_by(Feedback.id.desc()).first()[0]
+            finally:
+                db.close()
+    assert set(learner._cursors) == {"default", "tenant_b"}
+
+
+def test_cli_tenant_option():
+    parser = argparse.ArgumentParser()
+    add_tenant_argument(parser)
+    with cli_tenant_context(parser, parser.parse_args(["--tenant", "Tenant_B"]).tenant):
+        assert current_tenant.get() == "tenant_b"
+    assert parser.parse_args([]).tenant == "default"
+    with pytest.raises(SystemExit):
+        cli_tenant_context(parser, "nowhere")
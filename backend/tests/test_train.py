@@ -0,0 +1,54 @@
+import os
+import sys
+
+from db import ArchivedComplaint, ArchivedFeedback, Complaint, Feedback, SessionLocal, create_all
+from tenancy import tenant_context, tenants
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "ai"))
+
+
+def test_load_from_db_includes_archive_and_corrections(unique):
+    from train import load_from_db
+
+    with tenant_context(f"train{unique}"):
+        create_all()
+        db = SessionLocal()
+        try:
+            hot = Complaint(text="no water since monday", category="Other")
+            db.add(hot)
+            db.flush()
+            db.add(Feedback(complaint_id=hot.id, correct_category="Water"))
+            db.add(ArchivedComplaint(id=hot.id + 100, text="pothole near bus stand", category="Other"))
+            db.add(ArchivedFeedback(id=1, complaint_id=hot.id + 100, correct_category="Roads"))
+            db.add(ArchivedComplaint(id=hot.id + 101, text="street light broken", category="Electricity"))
+            db.commit()
+        finally:
+            db.close()
+        url = str(tenants.engine().url)
+
+    df = load_from_db(url)
+    assert sorted(zip(df["complaint_text"], df["category"])) == [
+        ("no water since monday", "Water"),
+        ("pothole near bus stand", "Roads"),
+        ("street light broken", "Electricity"),
+    ]
+
+
+def test_correction_lookup_uses_the_feedback_index(unique):
+    from sqlalchemy import inspect
+
+    from train import _DB_QUERY
+
+    with tenant_context(f"trainidx{unique}"):
+        create_all()
+        engine = tenants.engine()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_feedback_complaint_id")  # a database from before the index
+        create_all()
+
+        assert "ix_feedback_complaint_id" in {i["name"] for i in inspect(engine).get_indexes("feedback")}
+        with engine.connect() as conn:
+            plan = " ".join(str(row[-1]) for row in conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + _DB_QUERY.format(complaints="complaints", feedback="feedback")
+            ))
+        assert "ix_feedback_complaint_id" in plan
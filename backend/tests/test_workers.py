@@ -0,0 +1,66 @@
+import os
+
+import hotspots
+import online_learning
+from nlp import NLPEngine
+from online_learning import CATEGORIES, OnlineLearner, _new_model
+
+
+def _learner(path):
+    return OnlineLearner(NLPEngine(model_path="missing.joblib", use_gemini=False, lazy=True), model_path=path)
+
+
+def _model(version, last_feedback_id):
+    model = _new_model()
+    X = model["vectorizer"].transform(["no water supply", "pothole on the road"])
+    model["classifier"].partial_fit(X, ["Water", "Roads"], classes=CATEGORIES)
+    return {**model, "version": version, "feedback_cursors": {"default": last_feedback_id}}
+
+
+def test_hotspot_resync_is_on_by_default_in_serve_py_workers(monkeypatch):
+    monkeypatch.setattr(hotspots, "HOTSPOT_RESYNC_SECONDS", None)
+    monkeypatch.delenv("CIVISENSE_WORKER", raising=False)
+    assert hotspots.resync_interval() == 0
+    monkeypatch.setenv("CIVISENSE_WORKER", "2")
+    assert hotspots.resync_interval() == hotspots.MULTI_WORKER_RESYNC_SECONDS
+    monkeypatch.setattr(hotspots, "HOTSPOT_RESYNC_SECONDS", "0")
+    assert hotspots.resync_interval() == 0
+
+
+def test_workers_pick_up_new_models_and_rollbacks(tmp_dir, unique):
+    path = os.path.join(tmp_dir, f"online-{unique}.joblib")
+    leader, other = _learner(path), _learner(path)
+
+    model = _model("online-1", 10)
+    leader._save(model)
+    leader.nlp.swap_model(model, version=model["version"])
+    assert other.sync() and other.nlp.model_version == "online-1" and other.last_feedback_id == 10
+    assert not other.sync()  # unchanged file
+
+    model = _model("online-2", 20)
+    leader._save(model)
+    leader.nlp.swap_model(model, version=model["version"])
+    assert other.sync() and other.nlp.model_version == "online-2"
+
+    # Rolled back on the other worker: the file now holds online-1, and the leader follows.
+    assert other.rollback() == "online-1"
+    assert leader.sync() and leader.nlp.model_version == "online-1"
+    assert leader.last_feedback_id == 20  # the cursor never goes back
+
+    # Rolled back to the startup model: the file is removed everywhere.
+    assert leader.rollback() == "rules" and not os.path.exists(path)
+    assert other.sync() and other.nlp.model_version == "rules"
+
+
+def test_only_the_leader_trains(monkeypatch, tmp_dir, unique):
+    monkeypatch.setenv("CIVISENSE_WORKER", "1")
+    learner = _learner(os.path.join(tmp_dir, f"online-{unique}.joblib"))
+    learner.start(lambda: None, interval=60, sync_interval=0)
+    assert learner._thread is None
+
+    monkeypatch.setattr(online_learning, "is_leader", lambda: True)
+    learner.start(lambda: None, interval=60, sync_interval=0)
+    try:
+        assert learner._thread is not None
+    finally:
+        learner.stop()